@@ -1,14 +1,22 @@
 """Esup-Pod CAS & LDAP authentication backend."""
 
+import logging
+import queue
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
 from django.conf import settings
 from django.contrib.sites.models import Site
+from django.db import transaction
 from pod.authentication.models import (
     Owner,
     AccessGroup,
     DEFAULT_AFFILIATION,
     AFFILIATION_STAFF,
 )
-from ldap3 import Server, Connection
+from ldap3 import Server, Connection, RESTARTABLE
 from ldap3 import ALL as __ALL__
 from ldap3.core.exceptions import (
     LDAPSocketOpenError,
@@ -16,9 +24,6 @@ from ldap3.core.exceptions import (
     LDAPAttributeError,
     LDAPInvalidFilterError,
 )
-from django.core.exceptions import ObjectDoesNotExist
-
-import logging
 
 logger = logging.getLogger(__name__)
 
@@ -49,24 +54,34 @@ USER_LDAP_MAPPING_ATTRIBUTES = getattr(
 )
 
 CAS_FORCE_LOWERCASE_USERNAME = getattr(settings, "CAS_FORCE_LOWERCASE_USERNAME", False)
+LDAP_POOL_SIZE = getattr(settings, "LDAP_POOL_SIZE", 5)
+LDAP_ENTRY_CACHE_TIMEOUT = getattr(settings, "LDAP_ENTRY_CACHE_TIMEOUT", 300)
 
 # search scope
 __BASE__ = "BASE"
 __LEVEL__ = "LEVEL"
 __SUBTREE__ = "SUBTREE"
 
+# bound LDAP connections, reused by the logins of the process
+__LDAP_POOL__ = queue.LifoQueue()
+# LDAP entries of the last logged in users: {username: (time, entry)}
+__LDAP_ENTRIES__ = OrderedDict()
+__LDAP_ENTRIES_MAX__ = 1000
+__LDAP_ENTRIES_LOCK__ = threading.Lock()
+
 
 def populateUser(user, cas_attributes) -> None:
     """Populate user form CAS or LDAP attributes."""
     owner, owner_created = Owner.objects.get_or_create(user=user)
     owner.auth_type = "CAS"
-    delete_synchronized_access_group(owner)
 
     POPULATE_USER = getattr(settings, "POPULATE_USER", None)
     if POPULATE_USER == "CAS":
         populateUserFromCAS(user, owner, cas_attributes)
-    if POPULATE_USER == "LDAP" and LDAP_SERVER["url"] != "":
+    elif POPULATE_USER == "LDAP" and LDAP_SERVER["url"] != "":
         populateUserFromLDAP(user, owner)
+    else:
+        delete_synchronized_access_group(owner)
 
     owner.save()
     user.save()
@@ -80,46 +95,87 @@ def populateUserFromCAS(user, owner, attributes) -> None:
         else DEFAULT_AFFILIATION
     )
 
+    accessgroup_ids = set()
     if "affiliation" in attributes:
-        CREATE_GROUP_FROM_AFFILIATION = getattr(
-            settings, "CREATE_GROUP_FROM_AFFILIATION", False
-        )
-        for affiliation in attributes["affiliation"]:
-            if affiliation in AFFILIATION_STAFF:
-                user.is_staff = True
-            if CREATE_GROUP_FROM_AFFILIATION:
-                # Creating access groups from CAS affiliations
-                accessgroup, group_created = AccessGroup.objects.get_or_create(
-                    code_name=affiliation
-                )
-                if group_created:
-                    accessgroup.display_name = affiliation
-                    accessgroup.auto_sync = True
-                accessgroup.sites.add(Site.objects.get_current())
-                accessgroup.save()
-                user.owner.accessgroup_set.add(accessgroup)
-
+        accessgroup_ids |= get_affiliations_accessgroups(attributes["affiliation"], user)
         if "groups" in attributes:
-            assign_accessgroups(attributes["groups"], user)
+            accessgroup_ids |= get_groups_accessgroups(attributes["groups"], user)
+    set_synchronized_access_groups(owner, accessgroup_ids)
 
 
 def populateUserFromLDAP(user, owner) -> None:
     """Populate user and owner objects from LDAP."""
-    list_value = []
-    for val in USER_LDAP_MAPPING_ATTRIBUTES.values():
-        list_value.append(str(val))
-    conn = get_ldap_conn()
-    if conn is not None:
-        entry = get_entry(conn, user.username, list_value)
-        if entry is not None:
-            populate_user_from_entry(user, owner, entry)
+    entry = get_user_entry(user.username)
+    if entry is not None:
+        populate_user_from_entry(user, owner, entry)
+    else:
+        delete_synchronized_access_group(owner)
 
 
 def delete_synchronized_access_group(owner) -> None:
     """Delete synchronized access groups."""
-    groups_to_sync = AccessGroup.objects.filter(auto_sync=True)
-    for group_to_sync in groups_to_sync:
-        owner.accessgroup_set.remove(group_to_sync)
+    Owner.accessgroups.through.objects.filter(
+        owner=owner, accessgroup__auto_sync=True
+    ).delete()
+
+
+def set_synchronized_access_groups(owner, accessgroup_ids) -> None:
+    """
+    Set the access groups of the owner, replacing its synchronized access groups.
+
+    Only the differences with its current access groups are added and deleted.
+    """
+    through = Owner.accessgroups.through
+    with transaction.atomic():
+        current_groups = dict(
+            through.objects.filter(owner=owner).values_list(
+                "accessgroup_id", "accessgroup__auto_sync"
+            )
+        )
+        through.objects.filter(
+            owner=owner,
+            accessgroup_id__in=[
+                accessgroup_id
+                for accessgroup_id, auto_sync in current_groups.items()
+                if auto_sync and accessgroup_id not in accessgroup_ids
+            ],
+        ).delete()
+        through.objects.bulk_create(
+            [
+                through(owner=owner, accessgroup_id=accessgroup_id)
+                for accessgroup_id in accessgroup_ids - current_groups.keys()
+            ],
+            ignore_conflicts=True,
+        )
+
+
+def get_accessgroup_ids(code_names, create) -> set:
+    """Get the ids of the access groups of the code names, created if create."""
+    code_names = set(code_names)
+    if not code_names:
+        return set()
+    if create:
+        AccessGroup.objects.bulk_create(
+            [
+                AccessGroup(code_name=code_name, display_name=code_name, auto_sync=True)
+                for code_name in code_names
+            ],
+            ignore_conflicts=True,
+        )
+    accessgroup_ids = set(
+        AccessGroup.objects.filter(code_name__in=code_names).values_list("id", flat=True)
+    )
+    if create:
+        through = AccessGroup.sites.through
+        site = Site.objects.get_current()
+        through.objects.bulk_create(
+            [
+                through(accessgroup_id=accessgroup_id, site=site)
+                for accessgroup_id in accessgroup_ids
+            ],
+            ignore_conflicts=True,
+        )
+    return accessgroup_ids
 
 
 def get_server() -> Server:
@@ -151,7 +207,11 @@ def get_ldap_conn():
     try:
         server = get_server()
         conn = Connection(
-            server, AUTH_LDAP_BIND_DN, AUTH_LDAP_BIND_PASSWORD, auto_bind=True
+            server,
+            AUTH_LDAP_BIND_DN,
+            AUTH_LDAP_BIND_PASSWORD,
+            auto_bind=True,
+            client_strategy=RESTARTABLE,
         )
         return conn
     except LDAPBindError as err:
@@ -162,6 +222,47 @@ def get_ldap_conn():
         return None
 
 
+@contextmanager
+def pooled_ldap_conn():
+    """Get a bound LDAP connexion of the pool, opened if none is free."""
+    try:
+        conn = __LDAP_POOL__.get_nowait()
+    except queue.Empty:
+        conn = get_ldap_conn()
+    try:
+        yield conn
+    except Exception:
+        # the connexion may be in an unknown state
+        if conn is not None:
+            conn.unbind()
+        raise
+    if conn is not None:
+        if not conn.closed and __LDAP_POOL__.qsize() < LDAP_POOL_SIZE:
+            __LDAP_POOL__.put(conn)
+        else:
+            conn.unbind()
+
+
+def get_user_entry(username):
+    """Get the LDAP entry of a user, kept LDAP_ENTRY_CACHE_TIMEOUT seconds."""
+    with __LDAP_ENTRIES_LOCK__:
+        cached = __LDAP_ENTRIES__.get(username)
+    if cached and time.monotonic() - cached[0] < LDAP_ENTRY_CACHE_TIMEOUT:
+        return cached[1]
+    list_value = [str(val) for val in USER_LDAP_MAPPING_ATTRIBUTES.values()]
+    with pooled_ldap_conn() as conn:
+        if conn is None:
+            return None
+        entry = get_entry(conn, username, list_value)
+    if entry is not None and LDAP_ENTRY_CACHE_TIMEOUT:
+        with __LDAP_ENTRIES_LOCK__:
+            __LDAP_ENTRIES__.pop(username, None)
+            __LDAP_ENTRIES__[username] = (time.monotonic(), entry)
+            if len(__LDAP_ENTRIES__) > __LDAP_ENTRIES_MAX__:
+                __LDAP_ENTRIES__.popitem(last=False)
+    return entry
+
+
 def get_entry(conn, username, list_value):
     """Get LDAP entries."""
     try:
@@ -181,34 +282,28 @@ def get_entry(conn, username, list_value):
         return None
 
 
-def assign_accessgroups(groups_element, user) -> None:
-    """Assign access groups to the user."""
-    # print("assign_accessgroups / groups_element : %s " % groups_element)
-    CREATE_GROUP_FROM_GROUPS = getattr(settings, "CREATE_GROUP_FROM_GROUPS", False)
-    for group in groups_element:
+def get_affiliations_accessgroups(affiliations, user) -> set:
+    """Get the access groups of the affiliations, and set the staff users."""
+    for affiliation in affiliations:
+        if affiliation in AFFILIATION_STAFF:
+            user.is_staff = True
+    if not getattr(settings, "CREATE_GROUP_FROM_AFFILIATION", False):
+        return set()
+    # Creating access groups from affiliations
+    return get_accessgroup_ids(affiliations, create=True)
+
 
+def get_groups_accessgroups(groups_element, user) -> set:
+    """Get the access groups of the groups, and set the staff users."""
+    for group in groups_element:
         if group in GROUP_STAFF:
             user.is_staff = True
-        if CREATE_GROUP_FROM_GROUPS:
-            accessgroup, group_created = AccessGroup.objects.get_or_create(
-                code_name=group
-            )
-            if group_created:
-                accessgroup.display_name = group
-                accessgroup.auto_sync = True
-            accessgroup.sites.add(Site.objects.get_current())
-            accessgroup.save()
-            user.owner.accessgroup_set.add(accessgroup)
-        else:
-            try:
-                accessgroup = AccessGroup.objects.get(code_name=group)
-                user.owner.accessgroup_set.add(accessgroup)
-            except ObjectDoesNotExist:
-                pass
+    CREATE_GROUP_FROM_GROUPS = getattr(settings, "CREATE_GROUP_FROM_GROUPS", False)
+    return get_accessgroup_ids(groups_element, create=CREATE_GROUP_FROM_GROUPS)
 
 
-def create_accessgroups(user, tree_or_entry, auth_type) -> None:
-    """Create access groups from LDAP entry or CAS tree."""
+def create_accessgroups(user, tree_or_entry, auth_type) -> set:
+    """Get the access groups from LDAP entry or CAS tree."""
     groups_element = []
     if auth_type == "ldap":
         groups_element = (
@@ -220,8 +315,8 @@ def create_accessgroups(user, tree_or_entry, auth_type) -> None:
             else []
         )
     else:
-        return
-    assign_accessgroups(groups_element, user)
+        return set()
+    return get_groups_accessgroups(groups_element, user)
 
 
 def get_entry_value(entry, attribute, default):
@@ -252,24 +347,9 @@ def populate_user_from_entry(user, owner, entry) -> None:
     owner.establishment = get_entry_value(entry, "establishment", "")
     owner.save()
     affiliations = get_entry_value(entry, attribute="affiliations", default=[])
-    CREATE_GROUP_FROM_AFFILIATION = getattr(
-        settings, "CREATE_GROUP_FROM_AFFILIATION", False
-    )
-    for affiliation in affiliations:
-        if affiliation in AFFILIATION_STAFF:
-            user.is_staff = True
-        if CREATE_GROUP_FROM_AFFILIATION:
-            accessgroup, group_created = AccessGroup.objects.get_or_create(
-                code_name=affiliation
-            )
-            if group_created:
-                accessgroup.display_name = affiliation
-                accessgroup.auto_sync = True
-            accessgroup.sites.add(Site.objects.get_current())
-            accessgroup.save()
-            # group.groupsite.sites.add(Site.objects.get_current())
-            user.owner.accessgroup_set.add(accessgroup)
-    create_accessgroups(user, entry, "ldap")
+    accessgroup_ids = get_affiliations_accessgroups(affiliations, user)
+    accessgroup_ids |= create_accessgroups(user, entry, "ldap")
+    set_synchronized_access_groups(owner, accessgroup_ids)
     user.save()
     owner.save()
 
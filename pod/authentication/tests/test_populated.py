@@ -294,6 +294,24 @@ class PopulatedCASTestCase(TestCase):
         )
         print(" --->  test_delete_synchronized_access_group of PopulatedCASTestCase: OK!")
 
+    def test_set_synchronized_access_groups(self) -> None:
+        """Test if only the synchronized access groups of the user are replaced."""
+        user = User.objects.create(username="pod", password=PWD)
+        group1 = AccessGroup.objects.get(code_name="groupTest1")
+        group2 = AccessGroup.objects.get(code_name="groupTest2")
+        group3 = AccessGroup.objects.create(code_name="groupTest3", auto_sync=True)
+        user.owner.accessgroup_set.add(group1, group2)
+        populatedCASbackend.set_synchronized_access_groups(user.owner, {group3.id})
+        self.assertEqual(
+            set(user.owner.accessgroup_set.values_list("id", flat=True)),
+            {group1.id, group3.id},
+        )
+        populatedCASbackend.set_synchronized_access_groups(user.owner, set())
+        self.assertEqual(
+            set(user.owner.accessgroup_set.values_list("id", flat=True)), {group1.id}
+        )
+        print(" --->  test_set_synchronized_access_groups of PopulatedCASTestCase: OK!")
+
 
 @override_settings(
     CAS_VERSION=3,
@@ -405,6 +423,24 @@ class PopulatedLDAPTestCase(TestCase):
             " of PopulatedLDAPTestCase: OK!"
         )
 
+    def test_get_user_entry(self) -> None:
+        """Test if the LDAP entry is read once, with a pooled connection."""
+        fake_connection = Connection(Server("my_fake_server"), client_strategy=MOCK_SYNC)
+        fake_connection.strategy.add_entry("uid=pod,ou=people,dc=univ,dc=fr", self.attrs)
+        fake_connection.bind()
+        reload(populatedCASbackend)
+        with mock.patch.object(
+            populatedCASbackend, "get_ldap_conn", return_value=fake_connection
+        ) as get_ldap_conn:
+            entry = populatedCASbackend.get_user_entry("pod")
+            self.assertEqual(entry["mail"].value, "pod@univ.fr")
+            self.assertEqual(populatedCASbackend.get_user_entry("pod"), entry)
+            self.assertIsNone(populatedCASbackend.get_user_entry("nobody"))
+        # the connection is opened once, then taken from the pool
+        get_ldap_conn.assert_called_once()
+        fake_connection.unbind()
+        print(" --->  test_get_user_entry of PopulatedLDAPTestCase: OK!")
+
 
 class PopulatedShibTestCase(TestCase):
     def setUp(self) -> None:
@@ -0,0 +1,98 @@
+"""
+Unit tests for the duplication of the video files.
+
+*  run with `python manage.py test pod.duplicate.tests.test_utils`
+"""
+
+import filecmp
+import os
+import shutil
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files.temp import NamedTemporaryFile
+from django.test import TestCase
+
+from pod.duplicate import utils
+from pod.video.models import Type, Video
+from pod.video_encode_transcript.models import EncodingStep
+
+VIDEO_TEST = getattr(settings, "VIDEO_TEST", "pod/main/static/video_test/pod.mp4")
+
+
+class DuplicateUtilsTestCase(TestCase):
+    """Test case for the duplication of the video files."""
+
+    fixtures = [
+        "initial_data.json",
+    ]
+
+    def setUp(self) -> None:
+        """Set up the original and duplicated videos."""
+        user = User.objects.create(username="pod", password="pod1234pod")
+        self.original = Video.objects.create(
+            title="Original Video",
+            owner=user,
+            video="test.mp4",
+            type=Type.objects.get(id=1),
+        )
+        tempfile = NamedTemporaryFile(delete=True)
+        self.original.video.save("test.mp4", tempfile)
+        shutil.copyfile(VIDEO_TEST, self.original.video.path)
+        self.duplicated = Video.objects.create(
+            title="Copy of Original Video",
+            owner=user,
+            video=self.original.video.name,
+            type=Type.objects.get(id=1),
+        )
+        self.duplicated.video.name = utils.get_duplicate_source_name(
+            self.duplicated.id, self.original.video.name
+        )
+        self.duplicated.save()
+        print(" --->  SetUp of DuplicateUtilsTestCase: OK!")
+
+    def test_get_duplicate_source_name(self) -> None:
+        """Test the source name of the duplicated video."""
+        self.assertEqual(
+            utils.get_duplicate_source_name(12, "videos/abcd/test.mp4"),
+            "videos/abcd/test_12.mp4",
+        )
+        print(" --->  test_get_duplicate_source_name of DuplicateUtilsTestCase: OK!")
+
+    def test_duplicate_not_encoded_video(self) -> None:
+        """Test that the source is cloned and encoded if the original is not."""
+        with mock.patch.object(utils.encode, utils.ENCODE_VIDEO) as start_encode:
+            utils.start_duplicate(self.original, self.duplicated, threaded=False)
+        self.assertTrue(
+            filecmp.cmp(self.original.video.path, self.duplicated.video.path, False)
+        )
+        start_encode.assert_called_once_with(self.duplicated.id)
+        self.assertEqual(
+            EncodingStep.objects.get(video=self.duplicated).desc_step,
+            "duplicate source file",
+        )
+        os.remove(self.duplicated.video.path)
+        print(" --->  test_duplicate_not_encoded_video of DuplicateUtilsTestCase: OK!")
+
+    def test_duplicate_missing_source(self) -> None:
+        """Test that a missing source file is not duplicated."""
+        os.remove(self.original.video.path)
+        with self.assertRaises(ValueError):
+            utils.start_duplicate(self.original, self.duplicated, threaded=False)
+        self.assertFalse(Video.objects.get(id=self.duplicated.id).encoding_in_progress)
+        print(" --->  test_duplicate_missing_source of DuplicateUtilsTestCase: OK!")
+
+    def test_duplicate_failure(self) -> None:
+        """Test that a failed duplication is reported and not left in progress."""
+        with mock.patch.object(
+            utils, "duplicate_encoding", side_effect=RuntimeError("disk full")
+        ), mock.patch.object(utils, "send_email") as send_email:
+            utils.start_duplicate(self.original, self.duplicated, threaded=False)
+        self.assertFalse(Video.objects.get(id=self.duplicated.id).encoding_in_progress)
+        encoding_step = EncodingStep.objects.get(video=self.duplicated)
+        self.assertEqual(encoding_step.num_step, -1)
+        self.assertIn("disk full", encoding_step.desc_step)
+        send_email.assert_called_once()
+        os.remove(self.duplicated.video.path)
+        print(" --->  test_duplicate_failure of DuplicateUtilsTestCase: OK!")
@@ -0,0 +1,139 @@
+"""
+Esup-Pod duplication of the video files.
+
+The files of a duplicated video are cloned in the background: its source file
+and, when the original video is encoded, its encoded files, overview and
+subtitles, so the duplicated video is not encoded again. The files are cloned
+copy-on-write (reflink) or hard linked when the filesystem allows it, and
+copied otherwise. The progress is shown as the encoding steps of the video.
+"""
+
+import logging
+import os
+import threading
+
+from django.conf import settings
+from django.utils import timezone
+
+from pod.completion.models import Track
+from pod.video.models import Video
+from pod.video_encode_transcript import encode
+from pod.video_encode_transcript.encode import get_encoding_video, store_encoding_info
+from pod.video_encode_transcript.encoding_cache import has_encoding_files
+from pod.video_encode_transcript.models import EncodingCache
+from pod.video_encode_transcript.utils import (
+    change_encoding_step,
+    check_file,
+    link_file,
+    send_email,
+)
+
+log = logging.getLogger(__name__)
+
+ENCODE_VIDEO = getattr(settings, "ENCODE_VIDEO", "start_encode")
+
+
+def get_duplicate_source_name(new_id: int, source_name: str) -> str:
+    """
+    Get the source file name of a duplicated video.
+
+    Args:
+        new_id (int): The id of the duplicated video.
+        source_name (str): The source name of the initial video.
+    Returns:
+        str: The source name for the duplicated video.
+    """
+    # Ex: videos/xxxx/video.mp4 -> videos/xxxx/video_12.mp4
+    name, extension = os.path.splitext(os.path.basename(source_name))
+    return os.path.join(os.path.dirname(source_name), f"{name}_{new_id}{extension}")
+
+
+def copy_encoding_cache(original: Video, duplicated: Video) -> None:
+    """Copy the source hash and encoding key, to not read the source file again."""
+    cache = EncodingCache.objects.filter(video=original).exclude(source_hash="").first()
+    if cache is None:
+        return
+    stat = os.stat(duplicated.video.path)
+    EncodingCache.objects.update_or_create(
+        video=duplicated,
+        defaults={
+            "source_hash": cache.source_hash,
+            "source_size": stat.st_size,
+            "source_mtime": stat.st_mtime,
+            "key": cache.key,
+        },
+    )
+
+
+def duplicate_tracks(original: Video, duplicated: Video) -> None:
+    """Copy the tracks of the original video missing from the duplicated one."""
+    for track in Track.objects.filter(video=original):
+        if not Track.objects.filter(
+            video=duplicated, kind=track.kind, lang=track.lang
+        ).exists():
+            Track.objects.create(
+                video=duplicated,
+                kind=track.kind,
+                lang=track.lang,
+                src=track.src,
+                enrich_ready=track.enrich_ready,
+            )
+
+
+def duplicate_encoding(original: Video, duplicated: Video) -> bool:
+    """Clone the encoded files of the original video, False if it is not encoded."""
+    if original.encoding_in_progress or not has_encoding_files(original):
+        return False
+    change_encoding_step(
+        duplicated.id, 2, "duplicate encoded files of video %s" % original.id
+    )
+    copy_encoding_cache(original, duplicated)
+    encoding_video = get_encoding_video(duplicated)
+    encoding_video.store_cached_encoding(original)
+    final_video = store_encoding_info(duplicated.id, encoding_video)
+    final_video.thumbnail = original.thumbnail
+    final_video.save()
+    return True
+
+
+def duplicate_video_files(original_id: int, duplicated_id: int) -> None:
+    """Clone the files of the original video, or encode the duplicated one."""
+    try:
+        original = Video.objects.get(id=original_id)
+        duplicated = Video.objects.get(id=duplicated_id)
+        change_encoding_step(duplicated_id, 1, "duplicate source file")
+        link_file(original.video.path, duplicated.video.path)
+        encoded = duplicate_encoding(original, duplicated)
+        duplicate_tracks(original, duplicated)
+        if encoded:
+            change_encoding_step(duplicated_id, 0, "end of duplication")
+        else:
+            # as a new video, with the encoding function set in ENCODE_VIDEO
+            encode_video = getattr(encode, ENCODE_VIDEO)
+            encode_video(duplicated_id)
+    except Exception as err:
+        msg = "Unable to duplicate the files of video %s:\n%s" % (original_id, err)
+        log.exception(msg)
+        Video.objects.filter(id=duplicated_id).update(
+            encoding_in_progress=False, date_modified=timezone.now()
+        )
+        change_encoding_step(duplicated_id, -1, msg)
+        send_email(msg, duplicated_id)
+
+
+def start_duplicate(original: Video, duplicated: Video, threaded=True) -> None:
+    """Start the duplication of the files of a video."""
+    if not check_file(original.video.path):
+        raise ValueError("Wrong file or path:\n%s" % original.video.path)
+    Video.objects.filter(id=duplicated.id).update(
+        encoding_in_progress=True, date_modified=timezone.now()
+    )
+    if threaded:
+        log.info("START DUPLICATE VIDEO ID %s" % original.id)
+        t = threading.Thread(
+            target=duplicate_video_files, args=[original.id, duplicated.id]
+        )
+        t.daemon = True
+        t.start()
+    else:
+        duplicate_video_files(original.id, duplicated.id)
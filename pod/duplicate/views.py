@@ -1,6 +1,3 @@
-import os
-import shutil
-
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import get_object_or_404, redirect
@@ -8,10 +5,13 @@ from django.urls import reverse
 from django.utils.text import slugify
 from django.utils.translation import gettext as _
 from pod.completion.models import Contributor, Document
+from pod.cut.models import CutVideo
 from pod.main.utils import display_message_with_icon
 from pod.speaker.models import JobVideo
 from pod.video.models import Video
 
+from .utils import get_duplicate_source_name, start_duplicate
+
 
 def generate_unique_slug(base_slug: str) -> str:
     """
@@ -29,34 +29,6 @@ def generate_unique_slug(base_slug: str) -> str:
     return slug
 
 
-def duplicate_source_file(new_id: int, source_path: str, source_name: str) -> str:
-    """
-    Copies the source video file and returns the new file name.
-    Args:
-        new_id (int): The id of the duplicated video.
-        source_path (str): The source path of the initial video.
-        source_name (str): The source name of the initial video.
-    Returns:
-        str: The source name for the duplicated video.
-    """
-    try:
-        # Source path (Ex: /usr/local/media/videos/xxx/video.mp4)
-        name, extension = os.path.splitext(os.path.basename(source_path))
-        # Generate a new file name to avoid conflicts
-        new_name = f"{name}_{new_id}{extension}"
-        # New source path (Ex: /usr/local/media/videos/xxx/video_lqweSNT.mp4)
-        new_source_path = os.path.join(os.path.dirname(source_path), new_name)
-        # New file name (Ex: videos/xxxx/video_lqweSNT.mp4)
-        new_source_name = os.path.join(os.path.dirname(source_name), new_name)
-        # Copy the source file
-        shutil.copyfile(source_path, new_source_path)
-
-        # Return the new file name
-        return new_source_name
-    except Exception as exc:
-        raise ValueError(str(exc))
-
-
 @login_required
 def video_duplicate(request, slug):
     """
@@ -69,7 +41,7 @@ def video_duplicate(request, slug):
     The duplicated video will have the following properties copied from the original video:
         - title (prefixed with "Copy of ")
         - slug (suffixed with "-copy")
-        - source file (a copy of the source video file)
+        - source file (a clone of the source video file)
         - type
         - owner (set to the current user)
         - description, description_fr, description_en
@@ -97,6 +69,10 @@ def video_duplicate(request, slug):
         - Contributors
         - JobVideo (speakers)
         - Documents
+        - Cut and dressing
+    The files are then cloned in the background: the source file and, if the
+    original video is encoded, its encoded files and tracks, else the
+    duplicated video is encoded.
     """
 
     try:
@@ -129,9 +105,9 @@ def video_duplicate(request, slug):
             disable_comment=original_video.disable_comment,
             tags=original_video.tags.get_tag_list(),
         )
-        # Duplicate the source file and assign it to the duplicated video
-        duplicated_video.video.name = duplicate_source_file(
-            duplicated_video.id, duplicated_video.video.path, duplicated_video.video.name
+        # The source file of the duplicated video, cloned in the background
+        duplicated_video.video.name = get_duplicate_source_name(
+            duplicated_video.id, original_video.video.name
         )
 
         # Many-to-Many Relations
@@ -168,9 +144,20 @@ def video_duplicate(request, slug):
                 private=document.private,
             )
 
-        # Save and encode
-        duplicated_video.launch_encode = True
+        # Copying cut and dressing, to reuse the encoded files
+        for cut in CutVideo.objects.filter(video=original_video):
+            CutVideo.objects.create(
+                video=duplicated_video,
+                start=cut.start,
+                end=cut.end,
+                duration=cut.duration,
+            )
+        for dressing in original_video.videos_dressing.all():
+            dressing.videos.add(duplicated_video)
+
+        # Save and duplicate the files
         duplicated_video.save()
+        start_duplicate(original_video, duplicated_video)
     except ValueError as exc:
         display_message_with_icon(request, messages.ERROR, str(exc))
 
@@ -0,0 +1,19 @@
+"""Esup-Pod command to rebuild the enrichment WebVTT files left to rebuild."""
+
+from django.core.management.base import BaseCommand
+
+from pod.enrichment.models import rebuild_late_enrichment_vtt
+
+
+class Command(BaseCommand):
+    """Rebuild the enrichment WebVTT files whose rebuild is late."""
+
+    help = (
+        "Rebuild the enrichment WebVTT files changed more than twice "
+        + "ENRICHMENT_VTT_DELAY ago and not rebuilt, e.g. after a restart"
+    )
+
+    def handle(self, *args, **options) -> None:
+        """Handle the rebuild_enrichment_vtt command call."""
+        nb_vtt = rebuild_late_enrichment_vtt()
+        self.stdout.write(self.style.SUCCESS("%s WebVTT file(s) rebuilt." % nb_vtt))
@@ -3,10 +3,12 @@
 from django.conf import settings
 from django.contrib.auth.models import Group
 from django.core.exceptions import ValidationError
-from django.core.files import File
-from django.db import models
+from django.core.files.base import ContentFile
+from django.db import connection, models, transaction
+from django.db.models import Q
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
+from django.utils import timezone
 from django.utils.translation import gettext as _
 from django.template.defaultfilters import slugify
 
@@ -19,6 +21,7 @@ from pod.main.models import get_nextautoincrement
 
 import os
 import datetime
+import threading
 
 if getattr(settings, "USE_PODFILE", False):
     __FILEPICKER__ = True
@@ -30,11 +33,14 @@ else:
     from pod.main.models import CustomFileModel
 
 FILES_DIR = getattr(settings, "FILES_DIR", "files")
+# with a delay, the enrichment WebVTT is rebuilt once per burst of changes
+ENRICHMENT_VTT_DELAY = getattr(settings, "ENRICHMENT_VTT_DELAY", 0)
 
 __NAME__ = _("Enrichment")
 
 
-def enrichment_to_vtt(list_enrichment, video) -> str:
+def get_enrichment_vtt_content(list_enrichment) -> str:
+    """Get the WebVTT content of a list of enrichments."""
     webvtt = WebVTT()
     for enrich in list_enrichment:
         start = datetime.datetime.fromtimestamp(
@@ -58,9 +64,26 @@ def enrichment_to_vtt(list_enrichment, video) -> str:
         )
         caption.identifier = enrich.slug
         webvtt.captions.append(caption)
-    temp_vtt_file = NamedTemporaryFile(suffix=".vtt")
-    with open(temp_vtt_file.name, "w") as f:
-        webvtt.write(f)
+    return webvtt.content
+
+
+def write_enrichment_file(path, content) -> bool:
+    """Replace atomically the content of a file, only if it changed."""
+    data = content.encode("utf-8")
+    with open(path, "rb") as f:
+        if f.read() == data:
+            return False
+    with NamedTemporaryFile(
+        dir=os.path.dirname(path), suffix=".vtt", delete=False
+    ) as temp_vtt_file:
+        temp_vtt_file.write(data)
+    os.chmod(temp_vtt_file.name, os.stat(path).st_mode)
+    os.replace(temp_vtt_file.name, path)
+    return True
+
+
+def create_enrichment_file(video, content):
+    """Create the file of the enrichment WebVTT of a video."""
     if __FILEPICKER__:
         video_folder = video.get_or_create_video_folder()
         previous_enrichment_file = CustomFileModel.objects.filter(
@@ -70,21 +93,112 @@ def enrichment_to_vtt(list_enrichment, video) -> str:
         )
         for enr in previous_enrichment_file:
             enr.delete()  # do it like this to delete file
-        enrichment_file, created = CustomFileModel.objects.get_or_create(
-            name="enrichment", folder=video_folder, created_by=video.owner
-        )
-
-        if enrichment_file.file and os.path.isfile(enrichment_file.file.path):
-            os.remove(enrichment_file.file.path)
+        enrichment_file = CustomFileModel(folder=video_folder, created_by=video.owner)
     else:
-        enrichment_file, created = CustomFileModel.objects.get_or_create()
-    enrichment_file.file.save("enrichment.vtt", File(temp_vtt_file))
-    enrichment_vtt, created = EnrichmentVtt.objects.get_or_create(video=video)
-    enrichment_vtt.src = enrichment_file
-    enrichment_vtt.save()
+        enrichment_file = CustomFileModel()
+    enrichment_file.file.save("enrichment.vtt", ContentFile(content.encode("utf-8")))
+    return enrichment_file
+
+
+def enrichment_to_vtt(list_enrichment, video) -> str:
+    """
+    Write the enrichment WebVTT file of a video and return its path.
+
+    The existing file is kept and its content replaced, only if it changed.
+    """
+    content = get_enrichment_vtt_content(list_enrichment)
+    enrichment_vtt = EnrichmentVtt.objects.filter(video=video).first()
+    enrichment_file = enrichment_vtt.src if enrichment_vtt else None
+    if (
+        enrichment_file
+        and enrichment_file.file
+        and os.path.isfile(enrichment_file.file.path)
+    ):
+        write_enrichment_file(enrichment_file.file.path, content)
+        return enrichment_file.file.path
+    enrichment_file = create_enrichment_file(video, content)
+    EnrichmentVtt.objects.update_or_create(video=video, defaults={"src": enrichment_file})
     return enrichment_file.file.path
 
 
+def update_enrichment_vtt(video_id) -> None:
+    """Rebuild the enrichment WebVTT of a video from its enrichments."""
+    # the changes made from now are rebuilt again
+    EnrichmentVtt.objects.filter(video_id=video_id).update(date_dirty=None)
+    video = Video.objects.filter(id=video_id).first()
+    if video is None:
+        return
+    list_enrichment = video.enrichment_set.all()
+    if list_enrichment.count() > 0:
+        enrichment_to_vtt(list_enrichment, video)
+    else:
+        EnrichmentVtt.objects.filter(video=video).delete()
+
+
+def run_update_enrichment_vtt(video_id) -> None:
+    """Rebuild the enrichment WebVTT of a video, in a thread."""
+    try:
+        update_enrichment_vtt(video_id)
+    finally:
+        connection.close()
+
+
+def mark_enrichment_vtt_dirty(video_id) -> bool:
+    """
+    Mark the enrichment WebVTT of a video to rebuild.
+
+    Return True for the first change of a burst, or if the rebuild of the
+    previous burst is late, its process having exited before it.
+    """
+    now = timezone.now()
+    late = now - datetime.timedelta(seconds=ENRICHMENT_VTT_DELAY * 2)
+    return bool(
+        EnrichmentVtt.objects.filter(video_id=video_id)
+        .filter(Q(date_dirty__isnull=True) | Q(date_dirty__lt=late))
+        .update(date_dirty=now)
+    )
+
+
+def rebuild_late_enrichment_vtt() -> int:
+    """Rebuild the enrichment WebVTT whose rebuild is late, return their number."""
+    late = timezone.now() - datetime.timedelta(seconds=ENRICHMENT_VTT_DELAY * 2)
+    video_ids = list(
+        EnrichmentVtt.objects.filter(date_dirty__lte=late).values_list(
+            "video_id", flat=True
+        )
+    )
+    for video_id in video_ids:
+        update_enrichment_vtt(video_id)
+    return len(video_ids)
+
+
+def schedule_enrichment_vtt(video_id) -> None:
+    """
+    Rebuild the enrichment WebVTT of a video after its enrichments changed.
+
+    With ENRICHMENT_VTT_DELAY, the first change marks the WebVTT to rebuild
+    in database and it is rebuilt in the background after the delay, once for
+    all the changes made meanwhile. The rebuild_enrichment_vtt command rebuilds
+    the ones whose process exited before the delay.
+    """
+    if not ENRICHMENT_VTT_DELAY:
+        update_enrichment_vtt(video_id)
+        return
+
+    def start_timer():
+        if not EnrichmentVtt.objects.filter(video_id=video_id).exists():
+            # the first WebVTT of a video is created at once
+            update_enrichment_vtt(video_id)
+        elif mark_enrichment_vtt_dirty(video_id):
+            timer = threading.Timer(
+                ENRICHMENT_VTT_DELAY, run_update_enrichment_vtt, args=[video_id]
+            )
+            timer.daemon = True
+            timer.start()
+
+    transaction.on_commit(start_timer)
+
+
 def enrichment_to_vtt_type(enrich):
     """Return enrichment content."""
     if enrich.type == "image":
@@ -300,17 +414,12 @@ class Enrichment(models.Model):
 
 @receiver(post_save, sender=Enrichment)
 def update_vtt(sender, instance=None, created=False, **kwargs) -> None:
-    list_enrichment = instance.video.enrichment_set.all()
-    enrichment_to_vtt(list_enrichment, instance.video)
+    schedule_enrichment_vtt(instance.video_id)
 
 
 @receiver(post_delete, sender=Enrichment)
 def delete_vtt(sender, instance=None, created=False, **kwargs) -> None:
-    list_enrichment = instance.video.enrichment_set.all()
-    if list_enrichment.count() > 0:
-        enrichment_to_vtt(list_enrichment, instance.video)
-    else:
-        EnrichmentVtt.objects.filter(video=instance.video).delete()
+    schedule_enrichment_vtt(instance.video_id)
 
 
 class EnrichmentVtt(models.Model):
@@ -328,6 +437,9 @@ class EnrichmentVtt(models.Model):
         on_delete=models.CASCADE,
         verbose_name=_("Subtitle file"),
     )
+    date_dirty = models.DateTimeField(
+        _("Date of the changes to rebuild"), null=True, blank=True, editable=False
+    )
 
     @property
     def sites(self):
@@ -8,9 +8,13 @@ from django.core.exceptions import ValidationError
 from django.conf import settings
 from django.core.exceptions import ObjectDoesNotExist
 from django.db.utils import IntegrityError
+from django.utils import timezone
+from datetime import timedelta
+from unittest import mock
 
 from pod.video.models import Video
 from pod.video.models import Type
+from .. import models as enrichment_models
 from ..models import Enrichment, EnrichmentVtt, EnrichmentGroup
 
 import os
@@ -223,6 +227,70 @@ class EnrichmentModelTestCase(TestCase):
         self.assertEqual(EnrichmentVtt.objects.filter(video=video).count(), 0)
         print(" ---> test_delete: OK! --- EnrichmentModel")
 
+    def test_enrichment_vtt_file(self):
+        """Test that the WebVTT file is kept and written only if it changed."""
+        video = Video.objects.get(id=1)
+        enrichment_vtt = EnrichmentVtt.objects.get(video=video)
+        path = enrichment_vtt.src.file.path
+        with open(path, "r") as f:
+            content = f.read()
+        self.assertIn('"title": "testlink",', content)
+        self.assertFalse(enrichment_models.write_enrichment_file(path, content))
+        enrichment = Enrichment.objects.get(id=2)
+        enrichment.title = "newlink"
+        enrichment.save()
+        self.assertEqual(EnrichmentVtt.objects.get(video=video).src, enrichment_vtt.src)
+        with open(path, "r") as f:
+            self.assertIn('"title": "newlink",', f.read())
+        print(" ---> test_enrichment_vtt_file: OK! --- EnrichmentModel")
+
+    def test_schedule_enrichment_vtt(self):
+        """Test that a burst of changes rebuilds the WebVTT once, after a delay."""
+        enrichment = Enrichment.objects.get(id=2)
+        with mock.patch.object(
+            enrichment_models, "ENRICHMENT_VTT_DELAY", 5
+        ), mock.patch.object(enrichment_models.threading, "Timer") as timer:
+            with self.captureOnCommitCallbacks(execute=True):
+                enrichment.save()
+                enrichment.save()
+        timer.assert_called_once_with(
+            5, enrichment_models.run_update_enrichment_vtt, args=[enrichment.video_id]
+        )
+        self.assertIsNotNone(
+            EnrichmentVtt.objects.get(video_id=enrichment.video_id).date_dirty
+        )
+        enrichment_models.update_enrichment_vtt(enrichment.video_id)
+        self.assertIsNone(
+            EnrichmentVtt.objects.get(video_id=enrichment.video_id).date_dirty
+        )
+        print(" ---> test_schedule_enrichment_vtt: OK! --- EnrichmentModel")
+
+    def test_rebuild_late_enrichment_vtt(self):
+        """Test that the WebVTT not rebuilt before the exit of its process is rebuilt."""
+        enrichment = Enrichment.objects.get(id=2)
+        enrichment_vtt = EnrichmentVtt.objects.get(video_id=enrichment.video_id)
+        with mock.patch.object(
+            enrichment_models, "ENRICHMENT_VTT_DELAY", 5
+        ), mock.patch.object(enrichment_models.threading, "Timer") as timer:
+            with self.captureOnCommitCallbacks(execute=True):
+                enrichment.title = "newlink"
+                enrichment.save()
+            # the timer is lost, the rebuild is not late yet
+            self.assertEqual(enrichment_models.rebuild_late_enrichment_vtt(), 0)
+            late = timezone.now() - timedelta(seconds=10)
+            EnrichmentVtt.objects.filter(id=enrichment_vtt.id).update(date_dirty=late)
+            # a new change starts the rebuild again
+            with self.captureOnCommitCallbacks(execute=True):
+                enrichment.save()
+            self.assertEqual(timer.call_count, 2)
+            # the timer is lost again, the command rebuilds the late WebVTT
+            EnrichmentVtt.objects.filter(id=enrichment_vtt.id).update(date_dirty=late)
+            self.assertEqual(enrichment_models.rebuild_late_enrichment_vtt(), 1)
+        with open(enrichment_vtt.src.file.path, "r") as f:
+            self.assertIn('"title": "newlink",', f.read())
+        self.assertIsNone(EnrichmentVtt.objects.get(id=enrichment_vtt.id).date_dirty)
+        print(" ---> test_rebuild_late_enrichment_vtt: OK! --- EnrichmentModel")
+
     def test_sites_property__not_empty(self):
         """Test the sites property of the Enrichment model when the video has site."""
         video = Video.objects.get(id=1)
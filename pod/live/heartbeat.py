@@ -0,0 +1,208 @@
+"""
+Esup-Pod live heartbeat backends.
+
+The heartbeats of the viewers of an event are stored by a backend chosen
+with the LIVE_HEARTBEAT_BACKEND setting:
+ - "database": in the HeartBeat model,
+ - "redis": in Redis sorted sets, with the connection of the default cache,
+ - "memory": in the memory of the process, for a single process server.
+Event viewers and max viewers are saved in database by the live_viewcounter
+command, not at each heartbeat. With "memory", they are saved by the process
+itself and the live_viewcounter command, run in another process, does nothing.
+"""
+
+import threading
+import time
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Event, HeartBeat
+
+LIVE_HEARTBEAT_BACKEND = getattr(settings, "LIVE_HEARTBEAT_BACKEND", "database")
+LIVE_HEARTBEAT_CACHE = getattr(settings, "LIVE_HEARTBEAT_CACHE", "default")
+VIEW_EXPIRATION_DELAY = getattr(settings, "VIEW_EXPIRATION_DELAY", 60)
+
+__HEARTBEAT_BACKEND__ = None
+
+
+class HeartBeatBackend:
+    """Base class of the heartbeat backends."""
+
+    def add_heartbeat(self, event_id, key, user_id=None) -> None:
+        """Save the heartbeat of the viewer identified by key."""
+        raise NotImplementedError
+
+    def get_viewers_count(self, event_id) -> int:
+        """Get the number of viewers of an event."""
+        raise NotImplementedError
+
+    def get_viewers_user_ids(self, event_id) -> set:
+        """Get the ids of the logged-in viewers of an event."""
+        raise NotImplementedError
+
+    def remove_expired(self) -> None:
+        """Remove the heartbeats older than VIEW_EXPIRATION_DELAY."""
+        raise NotImplementedError
+
+
+class DatabaseHeartBeatBackend(HeartBeatBackend):
+    """Heartbeats saved in the HeartBeat model."""
+
+    def add_heartbeat(self, event_id, key, user_id=None) -> None:
+        viewer_heartbeat, created = HeartBeat.objects.get_or_create(
+            viewkey=key, event_id=event_id
+        )
+        if created and user_id is not None:
+            viewer_heartbeat.user_id = user_id
+        viewer_heartbeat.last_heartbeat = timezone.now()
+        viewer_heartbeat.save()
+
+    def get_viewers_count(self, event_id) -> int:
+        return HeartBeat.objects.filter(event_id=event_id).count()
+
+    def get_viewers_user_ids(self, event_id) -> set:
+        return set(
+            HeartBeat.objects.filter(event_id=event_id)
+            .exclude(user=None)
+            .values_list("user_id", flat=True)
+        )
+
+    def remove_expired(self) -> None:
+        accepted_time = timezone.now() - timezone.timedelta(seconds=VIEW_EXPIRATION_DELAY)
+        HeartBeat.objects.filter(last_heartbeat__lt=accepted_time).delete()
+
+
+class MemoryHeartBeatBackend(HeartBeatBackend):
+    """Heartbeats kept in the memory of the current process."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # {event_id: {key: (time, user_id)}}
+        self.heartbeats = {}
+        self.last_update = time.time()
+
+    def add_heartbeat(self, event_id, key, user_id=None) -> None:
+        now = time.time()
+        with self.lock:
+            viewers = self.heartbeats.setdefault(int(event_id), {})
+            if key in viewers:
+                # the user of a viewer is the one of its first heartbeat
+                user_id = viewers[key][1]
+            viewers[key] = (now, user_id)
+            update = now - self.last_update > VIEW_EXPIRATION_DELAY
+            if update:
+                self.last_update = now
+        if update:
+            # the heartbeats are not seen by the live_viewcounter command
+            update_events_viewers()
+
+    def get_viewers_count(self, event_id) -> int:
+        return len(self.heartbeats.get(int(event_id), {}))
+
+    def get_viewers_user_ids(self, event_id) -> set:
+        with self.lock:
+            viewers = list(self.heartbeats.get(int(event_id), {}).values())
+        return set(user_id for last, user_id in viewers if user_id is not None)
+
+    def remove_expired(self) -> None:
+        accepted_time = time.time() - VIEW_EXPIRATION_DELAY
+        with self.lock:
+            for event_id, viewers in list(self.heartbeats.items()):
+                for key, (last, user_id) in list(viewers.items()):
+                    if last < accepted_time:
+                        del viewers[key]
+                if not viewers:
+                    del self.heartbeats[event_id]
+
+
+class RedisHeartBeatBackend(HeartBeatBackend):
+    """
+    Heartbeats saved in Redis.
+
+    The viewer keys of an event are in a sorted set, scored by the time of
+    their last heartbeat, and their user ids in a hash.
+    """
+
+    def __init__(self):
+        from django_redis import get_redis_connection
+
+        self.redis = get_redis_connection(LIVE_HEARTBEAT_CACHE)
+
+    def get_keys(self, event_id) -> tuple:
+        """Get the Redis keys of the heartbeats of an event."""
+        key = "live:heartbeat:%s" % event_id
+        return key, key + ":users"
+
+    def add_heartbeat(self, event_id, key, user_id=None) -> None:
+        viewers_key, users_key = self.get_keys(event_id)
+        pipe = self.redis.pipeline()
+        pipe.zadd(viewers_key, {key: time.time()})
+        if user_id is not None:
+            pipe.hsetnx(users_key, key, user_id)
+        # the heartbeats of an event without viewer expire with their keys
+        pipe.expire(viewers_key, VIEW_EXPIRATION_DELAY)
+        pipe.expire(users_key, VIEW_EXPIRATION_DELAY)
+        pipe.sadd("live:heartbeat:events", event_id)
+        pipe.execute()
+
+    def get_viewers_count(self, event_id) -> int:
+        # the expired heartbeats not removed yet are not counted
+        accepted_time = time.time() - VIEW_EXPIRATION_DELAY
+        return self.redis.zcount(self.get_keys(event_id)[0], accepted_time, "+inf")
+
+    def get_viewers_user_ids(self, event_id) -> set:
+        viewers_key, users_key = self.get_keys(event_id)
+        accepted_time = time.time() - VIEW_EXPIRATION_DELAY
+        keys = self.redis.zrangebyscore(viewers_key, accepted_time, "+inf")
+        if not keys:
+            return set()
+        return set(
+            int(user_id) for user_id in self.redis.hmget(users_key, keys) if user_id
+        )
+
+    def remove_expired(self) -> None:
+        accepted_time = time.time() - VIEW_EXPIRATION_DELAY
+        for event_id in self.redis.smembers("live:heartbeat:events"):
+            viewers_key, users_key = self.get_keys(int(event_id))
+            expired = self.redis.zrangebyscore(viewers_key, "-inf", accepted_time)
+            if expired:
+                pipe = self.redis.pipeline()
+                pipe.zrem(viewers_key, *expired)
+                pipe.hdel(users_key, *expired)
+                pipe.execute()
+            if not self.redis.exists(viewers_key):
+                self.redis.srem("live:heartbeat:events", event_id)
+
+
+def get_heartbeat_backend() -> HeartBeatBackend:
+    """Get the heartbeat backend set in LIVE_HEARTBEAT_BACKEND."""
+    global __HEARTBEAT_BACKEND__
+    if __HEARTBEAT_BACKEND__ is None:
+        if LIVE_HEARTBEAT_BACKEND == "redis":
+            __HEARTBEAT_BACKEND__ = RedisHeartBeatBackend()
+        elif LIVE_HEARTBEAT_BACKEND == "memory":
+            __HEARTBEAT_BACKEND__ = MemoryHeartBeatBackend()
+        else:
+            __HEARTBEAT_BACKEND__ = DatabaseHeartBeatBackend()
+    return __HEARTBEAT_BACKEND__
+
+
+def update_events_viewers() -> None:
+    """Remove the expired heartbeats and save the viewers of the current events."""
+    backend = get_heartbeat_backend()
+    backend.remove_expired()
+    now = timezone.now()
+    # remove the viewers of the finished events of the day
+    finished_events = Event.objects.filter(
+        start_date__date=now.date(),
+        end_date__lt=now,
+        broadcaster__enable_viewer_count=True,
+    )
+    for finished_event in finished_events:
+        finished_event.viewers.set([])
+    for event in Event.objects.filter(start_date__lte=now, end_date__gte=now):
+        event.viewers.set(backend.get_viewers_user_ids(event.id))
+        viewers_count = backend.get_viewers_count(event.id)
+        if viewers_count > event.max_viewers:
+            Event.objects.filter(id=event.id).update(max_viewers=viewers_count)
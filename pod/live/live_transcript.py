@@ -4,6 +4,8 @@ from django.conf import settings
 from vosk import Model, KaldiRecognizer, SetLogLevel
 from webvtt import WebVTT, Caption
 from pod.main.tasks import task_end_live_transcription, task_start_live_transcription
+from collections import deque
+import os
 import threading
 import time
 import json
@@ -12,6 +14,14 @@ import subprocess
 LIVE_CELERY_TRANSCRIPTION = getattr(settings, "LIVE_CELERY_TRANSCRIPTION ", False)
 LIVE_VOSK_MODEL = getattr(settings, "LIVE_VOSK_MODEL", None)
 __SAMPLE_RATE__ = 16000
+# 1/8 second of 16 bits mono audio
+__CHUNK_SIZE__ = 4000
+# 10 seconds of audio
+__BUFFER_CHUNKS__ = 80
+__CAPTION_WORDS__ = 20
+__RECONNECT_DELAY__ = 2
+__MODELS__ = {}
+__MODELS_LOCK__ = threading.Lock()
 threads = {}
 threads_to_stop = []
 SetLogLevel(-1)
@@ -26,110 +36,143 @@ def timestring(seconds: int) -> str:
     return "%i:%02i:%06.3f" % (hours, minutes, seconds)
 
 
-def transcribe(url, slug, model, filepath) -> None:
-    """Transcribe a live video."""
-    # if url.endswith(".m3u8"):
-    #    url = url.split(".m3u8")[0] + "_mid/index.m3u8"
-    trans_model = Model(model)
-    rec = KaldiRecognizer(trans_model, __SAMPLE_RATE__)
-    rec.SetWords(True)
-    last_caption = None
-    thread_id = threading.get_ident()
-    while LIVE_CELERY_TRANSCRIPTION or thread_id not in threads_to_stop:
-        start = time.time()
-        command = [
-            "ffmpeg",
-            "-y",
-            "-loglevel",
-            "quiet",
-            "-i",
-            url,
-            "-ss",
-            "00:00:00.005",
-            "-t",
-            "00:00:05",
-            "-acodec",
-            "pcm_s16le",
-            "-ac",
-            "1",
-            "-ar",
-            str(__SAMPLE_RATE__),
-            "-f",
-            "s16le",
-            "-",
-        ]
-        with subprocess.Popen(
-            command, stdout=subprocess.PIPE, stderr=subprocess.PIPE
-        ) as process:
-            results = []
-            data = process.stdout.read(4000)
-            while True:
-                if len(data) == 0:
+def get_model(model):
+    """Get the Vosk model of a path, loaded once and shared by the lives."""
+    with __MODELS_LOCK__:
+        if model not in __MODELS__:
+            __MODELS__[model] = Model(model)
+        return __MODELS__[model]
+
+
+def is_running(thread_id) -> bool:
+    """Check if the transcription of a thread has not been stopped."""
+    return LIVE_CELERY_TRANSCRIPTION or thread_id not in threads_to_stop
+
+
+class AudioRingBuffer:
+    """Decoded audio waiting to be transcribed, the oldest is dropped when full."""
+
+    def __init__(self):
+        self.chunks = deque(maxlen=__BUFFER_CHUNKS__)
+        self.condition = threading.Condition()
+        self.closed = False
+
+    def write(self, data) -> None:
+        """Add a chunk of audio."""
+        with self.condition:
+            self.chunks.append(data)
+            self.condition.notify()
+
+    def close(self) -> None:
+        """Mark the end of the audio."""
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+
+    def read(self, timeout):
+        """Get all the audio waiting, None at the end of the audio."""
+        with self.condition:
+            self.condition.wait_for(lambda: self.chunks or self.closed, timeout)
+            if not self.chunks:
+                return None if self.closed else b""
+            data = b"".join(self.chunks)
+            self.chunks.clear()
+        return data
+
+
+class LiveCaption:
+    """Last words transcribed, saved as a WebVTT caption when they change."""
+
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self.words = []
+        self.text = ""
+
+    def update(self, result="", partial="") -> None:
+        """Add the words of a final result, then show the partial result after."""
+        self.words = (self.words + result.split())[-__CAPTION_WORDS__:]
+        text = " ".join((self.words + partial.split())[-__CAPTION_WORDS__:])
+        if text and text != self.text:
+            self.text = text
+            self.save()
+
+    def save(self) -> None:
+        """Replace the WebVTT file, so the players never read it partially written."""
+        vtt = WebVTT()
+        vtt.captions.append(Caption(timestring(0), timestring(86400), self.text))
+        tmp_filepath = "%s.tmp" % self.filepath
+        with open(tmp_filepath, "w", encoding="utf-8") as f:
+            f.write(vtt.content)
+        os.replace(tmp_filepath, self.filepath)
+
+
+def read_audio(stdout, buffer) -> None:
+    """Read the audio decoded by ffmpeg into the buffer."""
+    data = stdout.read(__CHUNK_SIZE__)
+    while data:
+        buffer.write(data)
+        data = stdout.read(__CHUNK_SIZE__)
+    buffer.close()
+
+
+def transcribe_stream(url, rec, caption, thread_id) -> None:
+    """Transcribe the audio of a live, decoded by one ffmpeg until the stream ends."""
+    command = [
+        "ffmpeg",
+        "-loglevel",
+        "quiet",
+        "-i",
+        url,
+        "-acodec",
+        "pcm_s16le",
+        "-ac",
+        "1",
+        "-ar",
+        str(__SAMPLE_RATE__),
+        "-f",
+        "s16le",
+        "-",
+    ]
+    buffer = AudioRingBuffer()
+    with subprocess.Popen(
+        command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+    ) as process:
+        reader = threading.Thread(target=read_audio, args=(process.stdout, buffer))
+        reader.daemon = True
+        reader.start()
+        try:
+            while is_running(thread_id):
+                data = buffer.read(timeout=1)
+                if data is None:
                     break
-                else:
-                    data = process.stdout.read(4000)
-                if rec.AcceptWaveform(data):
-                    results.append(rec.Result())
-            results.append(rec.FinalResult())
-            vtt = WebVTT()
-            caption_text = ""
-            for _, res in enumerate(results):
-                words = json.loads(res).get("result")
-                if not words:
+                if not data:
                     continue
-                # start = timestring(words[0]["start"])
-                # end = timestring(words[-1]["end"])
-                content = " ".join([w["word"] for w in words])
-                caption_text += content + " "
-
-            caption_text = handle_last_caption(last_caption, caption_text)
-
-            current_start = timestring(0)
-            current_end = timestring(86400)
-            if caption_text != "":
-                caption = Caption(current_start, current_end, caption_text)
-                last_caption = caption
-                # print(caption_text)
-                vtt.captions.append(caption)
-                # save or return webvtt
-                vtt.save(filepath)
+                if rec.AcceptWaveform(data):
+                    caption.update(result=json.loads(rec.Result()).get("text", ""))
+                else:
+                    caption.update(
+                        partial=json.loads(rec.PartialResult()).get("partial", "")
+                    )
+        finally:
+            process.kill()
+
 
-        now = time.time() - start
-        if now < 5:
-            time.sleep(5 - now)
+def transcribe(url, slug, model, filepath) -> None:
+    """Transcribe a live video."""
+    rec = KaldiRecognizer(get_model(model), __SAMPLE_RATE__)
+    caption = LiveCaption(filepath)
+    thread_id = threading.get_ident()
+    while is_running(thread_id):
+        transcribe_stream(url, rec, caption, thread_id)
+        if is_running(thread_id):
+            # the stream is interrupted, wait before reconnecting
+            time.sleep(__RECONNECT_DELAY__)
     # print("stopped transcription")
     threads_to_stop.remove(thread_id)
     vtt = WebVTT()
     vtt.save(filepath)
 
 
-def handle_last_caption(last_caption, caption_text) -> None:
-    """Handle the last caption."""
-
-    if last_caption:
-        last_caption_text, current_caption_text = (
-            last_caption.text.strip(),
-            caption_text.strip(),
-        )
-        last_caption_words, current_caption_words = last_caption_text.split(
-            " "
-        ), current_caption_text.split(" ")
-        current_caption_words1 = current_caption_words[1 : len(current_caption_words)]
-
-        for i in range(len(last_caption_words) - 1, 0, -1):
-            if (
-                last_caption_words[-i:] == current_caption_words[:i]
-                or last_caption_words[-i:] == current_caption_words1[:i]
-            ):
-                caption_text = " ".join(current_caption_words[i:])
-                break
-        if last_caption_text in caption_text:
-            caption_text = caption_text.replace(last_caption_text, "").strip()
-        if caption_text in last_caption_text:
-            caption_text = caption_text.replace(caption_text, "").strip()
-    return caption_text
-
-
 def transcribe_live(url, slug, status, lang, filepath) -> None:
     if LIVE_VOSK_MODEL and LIVE_VOSK_MODEL.get(lang):
         model = LIVE_VOSK_MODEL.get(lang).get("model")
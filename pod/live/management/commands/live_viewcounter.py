@@ -1,11 +1,11 @@
 """Update viewcounter for live events."""
 
+import logging
+
 from django.core.management.base import BaseCommand
-from pod.live.models import HeartBeat, Event
-from django.utils import timezone
-from django.conf import settings
+from pod.live.heartbeat import LIVE_HEARTBEAT_BACKEND, update_events_viewers
 
-VIEW_EXPIRATION_DELAY = getattr(settings, "VIEW_EXPIRATION_DELAY", 60)
+logger = logging.getLogger(__name__)
 
 
 class Command(BaseCommand):
@@ -13,29 +13,11 @@ class Command(BaseCommand):
 
     def handle(self, *args, **options):
         """Handle the live_viewcounter command call."""
-        # Suppression des Heartbeat trop anciens
-        accepted_time = timezone.now() - timezone.timedelta(seconds=VIEW_EXPIRATION_DELAY)
-        HeartBeat.objects.filter(last_heartbeat__lt=accepted_time).delete()
-
-        # Suppression des viewers des events finis de la journée
-        q = Event.objects.filter(
-            start_date__date=timezone.now().date(),
-            end_date__lt=timezone.now(),
-            broadcaster__enable_viewer_count=True,
-        )
-        for finished_event in q.all():
-            finished_event.viewers.set([])
-
-        # Maj des viewers des events en cours
-        events = Event.objects.all()
-
-        for event in events:
-            if event.is_current():
-                hbs = HeartBeat.objects.filter(event=event)
-                hbs = hbs.exclude(user=None)
-                users = []
-                for hb in hbs:
-                    if hb.user not in users:
-                        users.append(hb.user)
-                event.viewers.set(users)
-                event.save()
+        if LIVE_HEARTBEAT_BACKEND == "memory":
+            # the heartbeats are in the memory of the web server process,
+            # which saves the viewers itself: none are seen from here
+            logger.warning(
+                "live_viewcounter does nothing with the memory heartbeat backend"
+            )
+            return
+        update_events_viewers()
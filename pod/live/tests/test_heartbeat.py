@@ -0,0 +1,83 @@
+"""
+Unit tests for the live heartbeat backends.
+
+*  run with `python manage.py test pod.live.tests.test_heartbeat`
+"""
+
+import time
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import SimpleTestCase
+
+from pod.live.heartbeat import MemoryHeartBeatBackend, RedisHeartBeatBackend
+from pod.live.heartbeat import VIEW_EXPIRATION_DELAY
+from pod.live.management.commands import live_viewcounter
+
+
+class MemoryHeartBeatBackendTestCase(SimpleTestCase):
+    """Tests of the in-memory heartbeat backend."""
+
+    def test_viewers(self):
+        """Check the viewers count and the logged-in viewers of an event."""
+        backend = MemoryHeartBeatBackend()
+        backend.add_heartbeat(1, "anonymous_key")
+        backend.add_heartbeat(1, "logged_user_key", 10)
+        backend.add_heartbeat(1, "logged_user_key")
+        backend.add_heartbeat(2, "other_key", 11)
+        self.assertEqual(backend.get_viewers_count(1), 2)
+        self.assertEqual(backend.get_viewers_user_ids(1), {10})
+        self.assertEqual(backend.get_viewers_count(3), 0)
+        print(" --->  test_viewers of MemoryHeartBeatBackendTestCase: OK!")
+
+    def test_remove_expired(self):
+        """Check that the expired heartbeats are removed."""
+        backend = MemoryHeartBeatBackend()
+        backend.add_heartbeat(1, "anonymous_key")
+        backend.add_heartbeat(1, "logged_user_key", 10)
+        backend.heartbeats[1]["logged_user_key"] = (time.time() - 3600, 10)
+        backend.remove_expired()
+        self.assertEqual(backend.get_viewers_count(1), 1)
+        self.assertEqual(backend.get_viewers_user_ids(1), set())
+        backend.heartbeats[1]["anonymous_key"] = (time.time() - 3600, None)
+        backend.remove_expired()
+        self.assertEqual(backend.heartbeats, {})
+        print(" --->  test_remove_expired of MemoryHeartBeatBackendTestCase: OK!")
+
+
+class RedisHeartBeatBackendTestCase(SimpleTestCase):
+    """Tests of the Redis heartbeat backend."""
+
+    def test_viewers_not_expired(self):
+        """Check that the expired heartbeats not removed yet are not counted."""
+        backend = RedisHeartBeatBackend.__new__(RedisHeartBeatBackend)
+        backend.redis = mock.Mock()
+        backend.redis.zcount.return_value = 1
+        backend.redis.zrangebyscore.return_value = [b"logged_user_key"]
+        backend.redis.hmget.return_value = [b"10"]
+        self.assertEqual(backend.get_viewers_count(1), 1)
+        key, accepted_time, maximum = backend.redis.zcount.call_args.args
+        self.assertEqual(key, "live:heartbeat:1")
+        self.assertAlmostEqual(
+            accepted_time, time.time() - VIEW_EXPIRATION_DELAY, delta=5
+        )
+        self.assertEqual(maximum, "+inf")
+        self.assertEqual(backend.get_viewers_user_ids(1), {10})
+        key, accepted_time, maximum = backend.redis.zrangebyscore.call_args.args
+        self.assertAlmostEqual(
+            accepted_time, time.time() - VIEW_EXPIRATION_DELAY, delta=5
+        )
+        print(" --->  test_viewers_not_expired of RedisHeartBeatBackendTestCase: OK!")
+
+
+class LiveViewcounterTestCase(SimpleTestCase):
+    """Tests of the live_viewcounter command."""
+
+    @mock.patch.object(live_viewcounter, "LIVE_HEARTBEAT_BACKEND", "memory")
+    @mock.patch.object(live_viewcounter, "update_events_viewers")
+    def test_memory_backend(self, update_events_viewers):
+        """Check that the viewers are not saved from another process with memory."""
+        with self.assertLogs(live_viewcounter.logger, "WARNING"):
+            call_command("live_viewcounter")
+        update_events_viewers.assert_not_called()
+        print(" --->  test_memory_backend of LiveViewcounterTestCase: OK!")
@@ -0,0 +1,142 @@
+"""
+Unit tests for the live transcription.
+
+*  run with `python manage.py test pod.live.tests.test_live_transcript`
+"""
+
+import importlib.util
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+# vosk is only installed with the transcription requirements, and not used here
+VOSK_MISSING = importlib.util.find_spec("vosk") is None
+if VOSK_MISSING:
+    sys.modules["vosk"] = mock.MagicMock()
+try:
+    from pod.live import live_transcript
+finally:
+    if VOSK_MISSING:
+        del sys.modules["vosk"]
+
+
+class AudioRingBufferTestCase(SimpleTestCase):
+    """Tests of the buffer of the decoded audio."""
+
+    def test_drop_oldest(self):
+        """Check that the oldest audio is dropped when the buffer is full."""
+        buffer = live_transcript.AudioRingBuffer()
+        for index in range(live_transcript.__BUFFER_CHUNKS__ + 2):
+            buffer.write(b"%03d" % index)
+        data = buffer.read(timeout=0)
+        self.assertEqual(len(data), 3 * live_transcript.__BUFFER_CHUNKS__)
+        self.assertTrue(data.startswith(b"002"))
+        self.assertTrue(data.endswith(b"%03d" % (live_transcript.__BUFFER_CHUNKS__ + 1)))
+        print(" --->  test_drop_oldest of AudioRingBufferTestCase: OK!")
+
+    def test_close(self):
+        """Check that the audio waiting is read before the end of the audio."""
+        buffer = live_transcript.AudioRingBuffer()
+        buffer.write(b"audio")
+        buffer.close()
+        self.assertEqual(buffer.read(timeout=0), b"audio")
+        self.assertIsNone(buffer.read(timeout=0))
+        print(" --->  test_close of AudioRingBufferTestCase: OK!")
+
+    def test_timeout(self):
+        """Check that a read without audio waits until the timeout."""
+        buffer = live_transcript.AudioRingBuffer()
+        start = time.monotonic()
+        self.assertEqual(buffer.read(timeout=0.2), b"")
+        self.assertGreaterEqual(time.monotonic() - start, 0.2)
+        # a read is woken up by the audio written meanwhile
+        writer = threading.Timer(0.1, buffer.write, args=[b"audio"])
+        writer.start()
+        self.assertEqual(buffer.read(timeout=5), b"audio")
+        writer.join()
+        print(" --->  test_timeout of AudioRingBufferTestCase: OK!")
+
+
+class LiveCaptionTestCase(SimpleTestCase):
+    """Tests of the caption of the last transcribed words."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filepath = os.path.join(self.directory, "live.vtt")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def read_caption(self):
+        with open(self.filepath, encoding="utf-8") as f:
+            return f.read().strip().split("\n")[-1]
+
+    def test_update(self):
+        """Check the words of the caption, final results then partial result."""
+        caption = live_transcript.LiveCaption(self.filepath)
+        caption.update(result="bonjour à tous")
+        self.assertEqual(self.read_caption(), "bonjour à tous")
+        caption.update(partial="et bienvenue")
+        self.assertEqual(self.read_caption(), "bonjour à tous et bienvenue")
+        # the partial result is replaced by the next one
+        caption.update(partial="et merci")
+        self.assertEqual(caption.words, ["bonjour", "à", "tous"])
+        self.assertEqual(self.read_caption(), "bonjour à tous et merci")
+        print(" --->  test_update of LiveCaptionTestCase: OK!")
+
+    def test_words_window(self):
+        """Check that only the last words are kept in the caption."""
+        caption = live_transcript.LiveCaption(self.filepath)
+        words = ["word%s" % index for index in range(30)]
+        caption.update(result=" ".join(words[:25]), partial=" ".join(words[25:]))
+        self.assertEqual(len(caption.words), live_transcript.__CAPTION_WORDS__)
+        self.assertEqual(
+            self.read_caption(), " ".join(words[-live_transcript.__CAPTION_WORDS__ :])
+        )
+        print(" --->  test_words_window of LiveCaptionTestCase: OK!")
+
+    def test_save(self):
+        """Check that the file is replaced, and not written when unchanged."""
+        caption = live_transcript.LiveCaption(self.filepath)
+        with mock.patch.object(
+            live_transcript.os, "replace", wraps=os.replace
+        ) as mock_replace:
+            caption.update(result="bonjour")
+            mock_replace.assert_called_once_with("%s.tmp" % self.filepath, self.filepath)
+            caption.update(partial="")
+            caption.update()
+            self.assertEqual(mock_replace.call_count, 1)
+        self.assertEqual(os.listdir(self.directory), ["live.vtt"])
+        print(" --->  test_save of LiveCaptionTestCase: OK!")
+
+
+class TranscribeStreamTestCase(SimpleTestCase):
+    """Tests of the transcription of the audio decoded by ffmpeg."""
+
+    def test_transcribe_stream(self):
+        """Check that the decoded audio is transcribed until the stream ends."""
+        process = mock.MagicMock()
+        process.stdout = io.BytesIO(b"\0" * live_transcript.__CHUNK_SIZE__ * 3)
+        rec = mock.Mock()
+        rec.AcceptWaveform.return_value = True
+        rec.Result.return_value = json.dumps({"text": "bonjour"})
+        caption = mock.Mock()
+        with mock.patch.object(live_transcript.subprocess, "Popen") as mock_popen:
+            mock_popen.return_value.__enter__.return_value = process
+            live_transcript.transcribe_stream("rtmp://live/stream", rec, caption, 1)
+        command = mock_popen.call_args.args[0]
+        self.assertIn("rtmp://live/stream", command)
+        self.assertEqual(command[-1], "-")
+        audio = b"".join(call.args[0] for call in rec.AcceptWaveform.call_args_list)
+        self.assertEqual(len(audio), live_transcript.__CHUNK_SIZE__ * 3)
+        caption.update.assert_called_with(result="bonjour")
+        process.kill.assert_called_once()
+        print(" --->  test_transcribe_stream of TranscribeStreamTestCase: OK!")
@@ -37,10 +37,10 @@ from .forms import EventPasswordForm, EventForm, EventDeleteForm, EventImmediate
 from .models import (
     Building,
     Broadcaster,
-    HeartBeat,
     Event,
     get_available_broadcasters_of_building,
 )
+from .heartbeat import get_heartbeat_backend
 from .pilotingInterface import (
     get_piloting_implementation,
     CREATE_VIDEO_FROM_FTP,
@@ -205,13 +205,11 @@ def manage_heartbeat(broadcaster_id, event_id, key, current_user):
     # save viewer's heartbeat
     if event_id is not None:
         current_event = get_object_or_404(Event, id=event_id)
-        viewer_heartbeat, created = HeartBeat.objects.get_or_create(
-            viewkey=key, event_id=event_id
+        get_heartbeat_backend().add_heartbeat(
+            current_event.id,
+            key,
+            None if current_user.is_anonymous else current_user.id,
         )
-        if created and not current_user.is_anonymous:
-            viewer_heartbeat.user = current_user
-        viewer_heartbeat.last_heartbeat = timezone.now()
-        viewer_heartbeat.save()
 
     viewers = current_event.viewers.values("first_name", "last_name", "is_superuser")
 
@@ -221,11 +219,8 @@ def manage_heartbeat(broadcaster_id, event_id, key, current_user):
         or current_user in current_event.additional_owners.all()
     )
 
-    heartbeats_count = HeartBeat.objects.filter(event_id=current_event.id).count()
-
-    if current_event.max_viewers < heartbeats_count:
-        current_event.max_viewers = heartbeats_count
-        current_event.save()
+    # max viewers are saved by the live_viewcounter command
+    heartbeats_count = get_heartbeat_backend().get_viewers_count(current_event.id)
 
     return HttpResponse(
         json.dumps(
@@ -0,0 +1,122 @@
+"""
+Esup-Pod rankings of the videos shown by the edito blocks.
+
+The most viewed and the last videos of a site are computed once for every
+combination of the filters of the blocks (restricted, passworded and videos of
+non visible channels), and kept in cache, so the blocks are rendered without
+aggregate query. The update_edito_rankings command computes them again, to be
+run periodically, more often than EDITO_RANKING_TIMEOUT.
+"""
+
+from datetime import date
+from itertools import product
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import BooleanField, Case, Exists, ExpressionWrapper, Max
+from django.db.models import OuterRef, Q, Sum, When
+from django.utils import timezone
+
+from pod.main.models import Block
+from pod.video.models import Video
+
+EDITO_RANKING_SIZE = getattr(settings, "EDITO_RANKING_SIZE", 20)
+EDITO_RANKING_TIMEOUT = getattr(settings, "EDITO_RANKING_TIMEOUT", 3600)
+VIDEO_RECENT_VIEWCOUNT = getattr(settings, "VIDEO_RECENT_VIEWCOUNT", 180)
+
+RANKING_TYPES = ("most_views", "last_videos")
+# show restricted, show videos of non visible channels, show passworded
+RANKING_FILTERS = list(product((False, True), repeat=3))
+
+
+def get_ranking_size() -> int:
+    """Get the number of videos to rank, enough for every block."""
+    nb_element = Block.objects.filter(data_type__in=RANKING_TYPES).aggregate(
+        nb_element=Max("nb_element")
+    )["nb_element"]
+    return max(EDITO_RANKING_SIZE, nb_element or 0)
+
+
+def get_ranking_videos(site, data_type):
+    """Get the available videos of a site in ranking order, with their filters."""
+    videos = Video.objects.filter(
+        encoding_in_progress=False, is_draft=False, sites=site
+    ).annotate(
+        passworded=ExpressionWrapper(
+            ~(Q(password="") | Q(password__isnull=True)), output_field=BooleanField()
+        ),
+        in_hidden_channel=Exists(
+            Video.channel.through.objects.filter(
+                video_id=OuterRef("pk"), channel__visible=False
+            )
+        ),
+    )
+    if data_type == "most_views":
+        d = date.today() - timezone.timedelta(days=VIDEO_RECENT_VIEWCOUNT)
+        videos = (
+            videos.filter(viewcount__date__gte=d)
+            .annotate(nb_views=Sum("viewcount__count"))
+            .order_by("-nb_views", "-id")
+        )
+    return videos.values_list(
+        "id", "is_restricted", "in_hidden_channel", "passworded"
+    ).iterator()
+
+
+def rank_videos(videos, size) -> dict:
+    """Get the first videos for each combination of the filters of the blocks."""
+    rankings = {filters: [] for filters in RANKING_FILTERS}
+    for video_id, *video_filters in videos:
+        if all(len(ids) >= size for ids in rankings.values()):
+            break
+        for filters, ids in rankings.items():
+            # a video is shown if each of its filters is allowed
+            if len(ids) < size and all(
+                show or not value for show, value in zip(filters, video_filters)
+            ):
+                ids.append(video_id)
+    return rankings
+
+
+def update_edito_rankings(site) -> dict:
+    """Compute the rankings of the videos of a site and save them in cache."""
+    size = get_ranking_size()
+    rankings = {
+        data_type: rank_videos(get_ranking_videos(site, data_type), size)
+        for data_type in RANKING_TYPES
+    }
+    cache.set("edito_rankings_%s" % site.id, rankings, EDITO_RANKING_TIMEOUT)
+    return rankings
+
+
+def get_ranked_videos(site, data_type, params):
+    """Get the ranked videos of a block, from the rankings in cache."""
+    rankings = cache.get("edito_rankings_%s" % site.id)
+    if rankings is None:
+        rankings = update_edito_rankings(site)
+    ids = rankings[data_type][
+        (
+            params["show-restricted"],
+            params["view-videos-from-non-visible-channels"],
+            params["show-passworded"],
+        )
+    ][: params["nb-element"]]
+    if not ids:
+        return Video.objects.none()
+    # the videos changed since the ranking are not shown anymore
+    videos = Video.objects.filter(
+        id__in=ids, encoding_in_progress=False, is_draft=False, sites=site
+    )
+    # as the add_filter of the edito blocks
+    if not params["show-restricted"]:
+        videos = videos.filter(is_restricted=False)
+    if not params["view-videos-from-non-visible-channels"]:
+        videos = videos.exclude(channel__visible=False)
+    if not params["show-passworded"]:
+        videos = videos.filter(Q(password="") | Q(password__isnull=True))
+    videos = videos.order_by(
+        Case(*[When(id=video_id, then=index) for index, video_id in enumerate(ids)])
+    )
+    # evaluated once, the blocks templates use their count
+    len(videos)
+    return videos
@@ -0,0 +1,21 @@
+"""Esup-Pod command to compute the rankings of the videos of the edito blocks."""
+
+from django.contrib.sites.models import Site
+from django.core.management.base import BaseCommand
+
+from pod.main.edito_rankings import update_edito_rankings
+
+
+class Command(BaseCommand):
+    """Compute the most viewed and the last videos of each site."""
+
+    help = (
+        "Compute the most viewed and the last videos shown by the edito blocks, "
+        + "to be run more often than EDITO_RANKING_TIMEOUT"
+    )
+
+    def handle(self, *args, **options) -> None:
+        """Handle the update_edito_rankings command call."""
+        for site in Site.objects.all():
+            update_edito_rankings(site)
+            self.stdout.write(self.style.SUCCESS("Rankings of %s updated." % site))
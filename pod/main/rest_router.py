@@ -82,6 +82,11 @@ urlpatterns = [
         encode_views.launch_encode_view,
         name="launch_encode_view",
     ),
+    path(
+        "encoding_queue/",
+        encode_views.encoding_queue_view,
+        name="encoding_queue",
+    ),
     path(
         "store_remote_encoded_video/",
         encode_views.store_remote_encoded_video,
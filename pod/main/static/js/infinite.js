@@ -78,11 +78,11 @@ const isElementXPercentInViewport = function () {
  * @param {Function} callBackBeforeLoad - Callback function executed before loading new content.
  * @param {Function} callBackAfterLoad - Callback function executed after new content is loaded.
  * @param {boolean} [nextPage=true] - Indicates if there is a next page to load.
- * @param {number} [page=2] - The initial page number to start loading from.
+ * @param {number|string} [page=2] - The initial page number (or cursor) to start loading from.
  *
  * @property {HTMLElement} infinite_loading - The loader element shown during loading.
  * @property {HTMLElement} videos_list - The container element for the loaded content.
- * @property {number} next_page_number - The next page number to load.
+ * @property {number|string} next_page_number - The next page number (or cursor) to load.
  * @property {number} current_page_number - The current page number loaded.
  * @property {boolean|string} nextPage - Indicates if there is a next page to load.
  * @property {Function} callBackBeforeLoad - Callback before loading new content.
@@ -115,7 +115,7 @@ class InfiniteLoader {
         if (isElementXPercentInViewport()) {
           if (
             this.nextPage &&
-            this.next_page_number > this.current_page_number
+            this.next_page_number !== this.current_page_number
           ) {
             this.current_page_number = this.next_page_number;
             this.initMore();
@@ -143,7 +143,13 @@ class InfiniteLoader {
         let element = this.videos_list;
 
         element.innerHTML += html.getElementById("videos_list").innerHTML;
-        this.next_page_number += 1;
+        const moreLink = html.querySelector("a.infinite-more-link");
+        if (moreLink) {
+          // The next page can be a cursor instead of a number
+          this.next_page_number = moreLink.dataset.nextpagenumber;
+        } else {
+          this.next_page_number += 1;
+        }
         const favoritesButtons =
           document.getElementsByClassName("favorite-btn-link");
         for (let btn of favoritesButtons) {
@@ -8,9 +8,9 @@ from pod.live.models import LiveTranscriptRunningTask, Broadcaster
 def task_start_encode(self, video_id: int) -> None:
     """Start video encoding with Celery."""
     print("CELERY START ENCODE VIDEO ID %s" % video_id)
-    from pod.video_encode_transcript.encode import encode_video
+    from pod.video_encode_transcript.encoding_scheduler import run_encoding_job
 
-    encode_video(video_id)
+    run_encoding_job(video_id)
 
 
 @app.task(bind=True)
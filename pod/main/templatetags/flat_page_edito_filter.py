@@ -4,19 +4,19 @@ import hashlib
 import html
 import random
 import string
-from datetime import date, datetime
+from datetime import datetime
 from html.parser import HTMLParser
 
 from django import template
 from django.conf import settings
 from django.contrib.sites.shortcuts import get_current_site
 from django.core.cache import cache
-from django.db.models import Q, Sum
+from django.db.models import Q
 from django.template import loader
-from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 from pod.live.models import Event
+from pod.main.edito_rankings import get_ranked_videos
 from pod.video.models import Video
 from pod.playlist.models import PlaylistContent
 
@@ -28,7 +28,6 @@ __DEFAULT_NB_ELEMENT__ = 5
 __DEFAULT_NB_CARD__ = 5
 __DEFAULT_TITLE__ = ""
 
-VIDEO_RECENT_VIEWCOUNT = getattr(settings, "VIDEO_RECENT_VIEWCOUNT", 180)
 EDITO_CACHE_TIMEOUT = getattr(settings, "EDITO_CACHE_TIMEOUT", 300)
 EDITO_CACHE_PREFIX = getattr(settings, "EDITO_CACHE_PREFIX", "edito_cache_")
 
@@ -235,30 +234,15 @@ def render_most_view(uniq_id, params, current_site, debug_elts):
     """Render block with most view videos."""
     debug_elts.append("Call function render_most_view")
 
-    d = date.today() - timezone.timedelta(days=VIDEO_RECENT_VIEWCOUNT)
-    query = Video.objects.filter(
-        Q(encoding_in_progress=False)
-        & Q(is_draft=False)
-        & Q(viewcount__date__gte=d)
-        & Q(sites=current_site)
-    ).annotate(nombre=Sum("viewcount"))
-
-    query = add_filter(params, debug_elts, query)
-
-    most_viewed_videos = query.all().order_by("-nombre")[: int(params["nb-element"])]
-
-    debug_elts.append(f"Database query '{str(most_viewed_videos.query)}'")
+    most_viewed_videos = get_ranked_videos(current_site, "most_views", params)
 
     debug_elts.append("Found videos in container:")
 
     for video in most_viewed_videos:
-        debug_elts.append(
-            f" - Video informations: "
-            f"[ID:{video.id}] [SLUG:{video.slug}] [RECENT_VIW_COUNT:{video.recentViewcount}]"
-        )
+        debug_elts.append(f" - Video informations: [ID:{video.id}] [SLUG:{video.slug}]")
 
-    if most_viewed_videos.count() < params["multi-carousel-nb-card"]:
-        params["multi-carousel-nb-card"] = most_viewed_videos.count()
+    if len(most_viewed_videos) < params["multi-carousel-nb-card"]:
+        params["multi-carousel-nb-card"] = len(most_viewed_videos)
 
     if params["title"] == "":
         title = _("Most views")
@@ -337,26 +321,15 @@ def render_last_view(uniq_id, params, current_site, debug_elts):
     """Render block with last view videos."""
     debug_elts.append("Call function render_last_view")
 
-    query = Video.objects.filter(
-        Q(encoding_in_progress=False) & Q(is_draft=False) & Q(sites=current_site)
-    )
-
-    query = add_filter(params, debug_elts, query)
-
-    last_viewed_videos = query.all()[: int(params["nb-element"])]
-
-    debug_elts.append(f"Database query '{str(last_viewed_videos.query)}'")
+    last_viewed_videos = get_ranked_videos(current_site, "last_videos", params)
 
     debug_elts.append("Found videos in container:")
 
     for video in last_viewed_videos:
-        debug_elts.append(
-            f" - Video informations: "
-            f"[ID:{video.id}] [SLUG:{video.slug}] [RECENT_VIW_COUNT:{video.recentViewcount}]"
-        )
+        debug_elts.append(f" - Video informations: [ID:{video.id}] [SLUG:{video.slug}]")
 
-    if last_viewed_videos.count() < params["multi-carousel-nb-card"]:
-        params["multi-carousel-nb-card"] = last_viewed_videos.count()
+    if len(last_viewed_videos) < params["multi-carousel-nb-card"]:
+        params["multi-carousel-nb-card"] = len(last_viewed_videos)
 
     if params["title"] == "":
         title = _("Last videos")
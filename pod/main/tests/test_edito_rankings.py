@@ -0,0 +1,94 @@
+"""Unit tests for the rankings of the videos of the edito blocks.
+
+*  run with 'python manage.py test pod.main.tests.test_edito_rankings'
+"""
+
+from datetime import date
+
+from django.contrib.auth.models import User
+from django.contrib.sites.models import Site
+from django.core.cache import cache
+from django.test import TestCase
+
+from pod.main import edito_rankings
+from pod.video.models import Channel, Type, Video, ViewCount
+
+
+class EditoRankingsTestCase(TestCase):
+    """Test the most viewed and the last videos of the edito blocks."""
+
+    fixtures = [
+        "initial_data.json",
+    ]
+
+    def setUp(self) -> None:
+        """Set up required objects for next tests."""
+        cache.clear()
+        self.site = Site.objects.get_current()
+        user = User.objects.create(username="pod", password="pod1234pod")
+        self.videos = []
+        for i in range(3):
+            video = Video.objects.create(
+                title="Video%s" % i,
+                owner=user,
+                video="test%s.mp4" % i,
+                type=Type.objects.get(id=1),
+                is_draft=False,
+            )
+            ViewCount.objects.create(video=video, date=date.today(), count=i + 1)
+            self.videos.append(video)
+        self.videos[2].is_restricted = True
+        self.videos[2].save()
+        channel = Channel.objects.create(title="ChannelTest", visible=False)
+        self.videos[1].channel.set([channel])
+        self.params = {
+            "show-restricted": False,
+            "view-videos-from-non-visible-channels": True,
+            "show-passworded": False,
+            "nb-element": 5,
+        }
+        print(" --->  SetUp of EditoRankingsTestCase: OK!")
+
+    def test_get_ranked_videos(self) -> None:
+        """Check the ranked videos of the blocks, with their filters."""
+        videos = edito_rankings.get_ranked_videos(self.site, "most_views", self.params)
+        self.assertEqual(list(videos), [self.videos[1], self.videos[0]])
+        self.params["show-restricted"] = True
+        self.params["view-videos-from-non-visible-channels"] = False
+        videos = edito_rankings.get_ranked_videos(self.site, "most_views", self.params)
+        self.assertEqual(list(videos), [self.videos[2], self.videos[0]])
+        self.params["nb-element"] = 1
+        videos = edito_rankings.get_ranked_videos(self.site, "last_videos", self.params)
+        self.assertEqual(list(videos), [self.videos[2]])
+        print(" --->  test_get_ranked_videos of EditoRankingsTestCase: OK!")
+
+    def test_rankings_in_cache(self) -> None:
+        """Check that the blocks are rendered from the rankings in cache."""
+        edito_rankings.update_edito_rankings(self.site)
+        ViewCount.objects.filter(video=self.videos[0]).update(count=10)
+        # only the videos of the ranking are read
+        with self.assertNumQueries(1):
+            videos = edito_rankings.get_ranked_videos(
+                self.site, "most_views", self.params
+            )
+        self.assertEqual(list(videos), [self.videos[1], self.videos[0]])
+        edito_rankings.update_edito_rankings(self.site)
+        videos = edito_rankings.get_ranked_videos(self.site, "most_views", self.params)
+        self.assertEqual(list(videos), [self.videos[0], self.videos[1]])
+        print(" --->  test_rankings_in_cache of EditoRankingsTestCase: OK!")
+
+    def test_filters_changed_since_ranking(self) -> None:
+        """Check that the filters of a block apply to the videos changed since."""
+        edito_rankings.update_edito_rankings(self.site)
+        Video.objects.filter(id=self.videos[1].id).update(password="secret")
+        Video.objects.filter(id=self.videos[0].id).update(is_restricted=True)
+        videos = edito_rankings.get_ranked_videos(self.site, "most_views", self.params)
+        self.assertEqual(list(videos), [])
+        self.params["show-restricted"] = True
+        self.params["view-videos-from-non-visible-channels"] = False
+        videos = edito_rankings.get_ranked_videos(self.site, "most_views", self.params)
+        self.assertEqual(list(videos), [self.videos[2], self.videos[0]])
+        self.videos[0].channel.set(self.videos[1].channel.all())
+        videos = edito_rankings.get_ranked_videos(self.site, "most_views", self.params)
+        self.assertEqual(list(videos), [self.videos[2]])
+        print(" --->  test_filters_changed_since_ranking of EditoRankingsTestCase: OK!")
@@ -0,0 +1,154 @@
+"""
+Esup-Pod client of the BigBlueButton API.
+
+The calls share a pooled HTTP session, with a timeout. The responses of the
+calls reading the meetings and their recordings are cached for
+BBB_API_CACHE_TIMEOUT seconds, and the concurrent identical calls of a process
+wait for a single call to the BBB server. The running status of the meetings
+is read from a single getMeetings call for all of them.
+"""
+
+import hashlib
+import threading
+import xml.etree.ElementTree as et
+from urllib.parse import urlencode
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from requests.adapters import HTTPAdapter
+
+from .utils import api_call, slash_join
+
+BBB_API_URL = getattr(settings, "BBB_API_URL", "")
+BBB_API_TIMEOUT = getattr(settings, "BBB_API_TIMEOUT", 10)
+BBB_API_CACHE_TIMEOUT = getattr(settings, "BBB_API_CACHE_TIMEOUT", 5)
+
+__POOL_SIZE__ = 10
+__SESSION__ = None
+__SESSION_LOCK__ = threading.Lock()
+# the identical calls wait for the same lock
+__CALL_LOCKS__ = [threading.Lock() for i in range(64)]
+
+
+def get_session() -> requests.Session:
+    """Get the HTTP session shared by the calls to the BBB server."""
+    global __SESSION__
+    with __SESSION_LOCK__:
+        if __SESSION__ is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=__POOL_SIZE__, pool_maxsize=__POOL_SIZE__
+            )
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            __SESSION__ = session
+    return __SESSION__
+
+
+def get_api_url(action, parameters=None) -> str:
+    """Get the url of a call to the BBB API, with its checksum."""
+    hashed = api_call(urlencode(parameters or {}), action)
+    return slash_join(BBB_API_URL, action, "?%s" % hashed)
+
+
+def get_api_error(error, meeting_json) -> dict:
+    """Get the error message of a failed call to the BBB API."""
+    return {
+        "error": error,
+        "returncode": meeting_json.get("returncode", ""),
+        "messageKey": meeting_json.get("messageKey", ""),
+        "message": meeting_json.get("message", ""),
+    }
+
+
+def request_api(url, data=None, headers=None) -> str:
+    """Call the BBB server in GET, or in POST with data, and get its response."""
+    try:
+        if data is None:
+            response = get_session().get(url, timeout=BBB_API_TIMEOUT)
+        else:
+            response = get_session().post(
+                url, data=data, headers=headers, timeout=BBB_API_TIMEOUT
+            )
+    except requests.RequestException as e:
+        raise ValueError(
+            {"error": _("Unable to call BBB server."), "returncode": "", "message": e}
+        )
+    if response.status_code != 200:
+        msg = {}
+        msg["error"] = _("Unable to call BBB server.")
+        msg["returncode"] = response.status_code
+        msg["message"] = response.content.decode("utf-8")
+        raise ValueError(msg)
+    return response.content.decode("utf-8")
+
+
+def call_api(action, parameters=None):
+    """Call the BBB API and get the XML document of its response."""
+    return et.fromstring(request_api(get_api_url(action, parameters)))
+
+
+def get_cache_key(action, parameters=None) -> str:
+    """Get the cache key of the response of a call to the BBB API."""
+    query = urlencode(sorted((parameters or {}).items()))
+    return "bbb_api:%s" % hashlib.sha1(("%s?%s" % (action, query)).encode()).hexdigest()
+
+
+def get_cached(key, compute):
+    """Get a value from cache, computed once for the concurrent calls if missing."""
+    value = cache.get(key)
+    if value is None:
+        with __CALL_LOCKS__[hash(key) % len(__CALL_LOCKS__)]:
+            value = cache.get(key)
+            if value is None:
+                value = compute()
+                cache.set(key, value, BBB_API_CACHE_TIMEOUT)
+    return value
+
+
+def get_api(action, parameters=None):
+    """Call a read action of the BBB API, with the response cached."""
+    content = get_cached(
+        get_cache_key(action, parameters),
+        lambda: request_api(get_api_url(action, parameters)),
+    )
+    return et.fromstring(content)
+
+
+def clear_api_cache(action, parameters=None) -> None:
+    """Remove a cached response, when the meeting or its recordings change."""
+    cache.delete(get_cache_key(action, parameters))
+
+
+def get_running_meetings() -> dict:
+    """Get the running status of all the meetings of the BBB server."""
+
+    def get_meetings_status():
+        xmldoc = call_api("getMeetings")
+        if xmldoc.findtext("returncode") != "SUCCESS":
+            raise ValueError(
+                get_api_error(
+                    "Unable to get meeting status ! ",
+                    {elt.tag: elt.text for elt in xmldoc},
+                )
+            )
+        return {
+            meeting.findtext("meetingID"): meeting.findtext("running") == "true"
+            for meeting in xmldoc.iter("meeting")
+        }
+
+    return get_cached(get_cache_key("getMeetings", {"status": 1}), get_meetings_status)
+
+
+def is_meeting_running(meeting_id) -> bool:
+    """Check if a meeting is running on the BBB server."""
+    return get_running_meetings().get(meeting_id, False)
+
+
+def clear_meeting_cache(meeting_id) -> None:
+    """Remove the cached status and info of a meeting, when it is created or ended."""
+    clear_api_cache("getMeetings", {"status": 1})
+    clear_api_cache("getMeetings")
+    clear_api_cache("getMeetingInfo", {"meetingID": meeting_id})
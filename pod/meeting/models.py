@@ -2,14 +2,12 @@
 
 import hashlib
 import random
-import requests
 import os
 import json
 import base64
 
 from datetime import timedelta, datetime as dt
 
-from urllib.parse import urlencode
 import xml.etree.ElementTree as et
 
 from django.db import models
@@ -38,10 +36,10 @@ from pod.authentication.models import AccessGroup
 from pod.main.models import get_nextautoincrement
 from pod.live.models import Broadcaster, Event
 
+from .bbb import call_api, clear_api_cache, clear_meeting_cache, get_api
+from .bbb import get_api_error, get_api_url, is_meeting_running, request_api
 from .utils import (
-    api_call,
     parseXmlToJson,
-    slash_join,
     get_nth_week_number,
     get_weekday_in_nth_week,
 )
@@ -695,17 +693,9 @@ class Meeting(models.Model):
                 ]
             )
             parameters["meta_bbb-recording-ready-url"] = recordingReadyUrl
-        query = urlencode(parameters)
-        hashed = api_call(query, action)
-        url = slash_join(BBB_API_URL, action, "?%s" % hashed)
-        response = self.get_create_response(url)
-        if response.status_code != 200:
-            msg = {}
-            msg["error"] = _("Unable to call BBB server.")
-            msg["returncode"] = response.status_code
-            msg["message"] = response.content.decode("utf-8")
-            raise ValueError(msg)
-        result = response.content.decode("utf-8")
+        url = get_api_url(action, parameters)
+        result = self.get_create_response(url)
+        clear_meeting_cache(self.meeting_id)
         xmldoc = et.fromstring(result)
         meeting_json = {}
         for elt in xmldoc:
@@ -726,13 +716,13 @@ class Meeting(models.Model):
             return True
 
     def get_create_response(self, url):
-        """Call BBB server in POST or GET."""
+        """Call BBB server in POST or GET, and get its response."""
         if self.slides:
             slides_path = self.slides.file.path
         elif MEETING_PRE_UPLOAD_SLIDES != "":
             slides_path = os.path.join(STATIC_ROOT, MEETING_PRE_UPLOAD_SLIDES)
         else:
-            return requests.get(url)
+            return request_api(url)
         doc_str = ""
         if os.path.getsize(slides_path) > 1000000:  # more than 1MO
             doc_url = self.get_doc_url()
@@ -748,10 +738,9 @@ class Meeting(models.Model):
                 "file": base64_str
             }
         headers = {"Content-Type": "application/xml"}
-        response = requests.post(
+        return request_api(
             url, data=__MEETING_SLIDES_DOCUMENT__ % {"document": doc_str}, headers=headers
         )
-        return response
 
     def get_doc_url(self):
         """Return the url of slides to preload."""
@@ -809,10 +798,7 @@ class Meeting(models.Model):
             parameters["userID"] = userID
         if self.bbb_create_time:
             parameters["createTime"] = self.bbb_create_time
-        query = urlencode(parameters)
-        hashed = api_call(query, action)
-        url = slash_join(BBB_API_URL, action, "?%s" % hashed)
-        return url
+        return get_api_url(action, parameters)
 
     def update_data_from_bbb(self, meeting_json):
         for key in meeting_json:
@@ -829,212 +815,86 @@ class Meeting(models.Model):
         self.save()
 
     def get_is_meeting_running(self):
+        """Get the running status of the meeting, from the status of all meetings."""
         if TEST_SETTINGS:
             return self.is_running
-        action = "isMeetingRunning"
-        parameters = {}
-        parameters["meetingID"] = self.meeting_id
-        query = urlencode(parameters)
-        hashed = api_call(query, action)
-        url = slash_join(BBB_API_URL, action, "?%s" % hashed)
-        response = requests.get(url)
-        if response.status_code != 200:
-            msg = {}
-            msg["error"] = _("Unable to call BBB server.")
-            msg["returncode"] = response.status_code
-            msg["message"] = response.content.decode("utf-8")
-            raise ValueError(msg)
-        result = response.content.decode("utf-8")
-        xmldoc = et.fromstring(result)
-        meeting_json = {}
-        for elt in xmldoc:
-            meeting_json[elt.tag] = elt.text
-        if meeting_json.get("returncode", "") != "SUCCESS":
-            # force end of meeting if create failed
-            # due to issue bigbluebutton/bigbluebutton#18913
-            if self.end():
-                return False
-            msg = {}
-            msg["error"] = "Unable to get meeting status ! "
-            msg["returncode"] = meeting_json.get("returncode", "")
-            msg["messageKey"] = meeting_json.get("messageKey", "")
-            msg["message"] = meeting_json.get("message", "")
-            raise ValueError(msg)
-        else:
-            status = True if meeting_json.get("running", False) == "true" else False
+        status = is_meeting_running(self.meeting_id)
+        if status != self.is_running:
             self.is_running = status
             self.save()
-            return status
+        return status
 
     def get_meeting_info(self):
-        action = "getMeetingInfo"
-        parameters = {}
-        parameters["meetingID"] = self.meeting_id
-        query = urlencode(parameters)
-        hashed = api_call(query, action)
-        url = slash_join(BBB_API_URL, action, "?%s" % hashed)
-        response = requests.get(url)
-        if response.status_code != 200:
-            msg = {}
-            msg["error"] = _("Unable to call BBB server.")
-            msg["returncode"] = response.status_code
-            msg["message"] = response.content.decode("utf-8")
-            raise ValueError(msg)
-        result = response.content.decode("utf-8")
-        xmldoc = et.fromstring(result)
-        meeting_json = parseXmlToJson(xmldoc)
+        meeting_json = parseXmlToJson(
+            get_api("getMeetingInfo", {"meetingID": self.meeting_id})
+        )
         if meeting_json.get("returncode", "") != "SUCCESS":
-            msg = {}
-            msg["error"] = "Unable to get meeting info! "
-            msg["returncode"] = meeting_json.get("returncode", "")
-            msg["messageKey"] = meeting_json.get("messageKey", "")
-            msg["message"] = meeting_json.get("message", "")
-            raise ValueError(msg)
+            raise ValueError(get_api_error("Unable to get meeting info! ", meeting_json))
         else:
             return meeting_json
 
     def end(self):
-        action = "end"
         parameters = {}
         parameters["meetingID"] = self.meeting_id
         parameters["password"] = self.moderator_password
-        query = urlencode(parameters)
-        hashed = api_call(query, action)
-        url = slash_join(BBB_API_URL, action, "?%s" % hashed)
-        response = requests.get(url)
-        if response.status_code != 200:
-            msg = {}
-            msg["error"] = _("Unable to call BBB server.")
-            msg["returncode"] = response.status_code
-            msg["message"] = response.content.decode("utf-8")
-            raise ValueError(msg)
-        result = response.content.decode("utf-8")
-        xmldoc = et.fromstring(result)
+        xmldoc = call_api("end", parameters)
+        clear_meeting_cache(self.meeting_id)
         meeting_json = {}
         for elt in xmldoc:
             meeting_json[elt.tag] = elt.text
         if meeting_json.get("returncode", "") != "SUCCESS":
-            msg = {}
-            msg["error"] = _("Unable to end meeting!")
-            msg["returncode"] = meeting_json.get("returncode", "")
-            msg["messageKey"] = meeting_json.get("messageKey", "")
-            msg["message"] = meeting_json.get("message", "")
-            raise ValueError(msg)
+            raise ValueError(get_api_error(_("Unable to end meeting!"), meeting_json))
         else:
             return True
 
     def get_recordings(self):
         """Get recordings for a meeting."""
-        action = "getRecordings"
-        parameters = {}
-        parameters["meetingID"] = self.meeting_id
-        query = urlencode(parameters)
-        hashed = api_call(query, action)
-        url = slash_join(BBB_API_URL, action, "?%s" % hashed)
-        response = requests.get(url)
-        if response.status_code != 200:
-            msg = {}
-            msg["error"] = _("Unable to call BBB server.")
-            msg["returncode"] = response.status_code
-            msg["message"] = response.content.decode("utf-8")
-            raise ValueError(msg)
-        result = response.content.decode("utf-8")
-        xmldoc = et.fromstring(result)
-        meeting_json = parseXmlToJson(xmldoc)
+        meeting_json = parseXmlToJson(
+            get_api("getRecordings", {"meetingID": self.meeting_id})
+        )
         if meeting_json.get("returncode", "") != "SUCCESS":
-            msg = {}
-            msg["error"] = _("Unable to get meeting recordings!")
-            msg["returncode"] = meeting_json.get("returncode", "")
-            msg["messageKey"] = meeting_json.get("messageKey", "")
-            msg["message"] = meeting_json.get("message", "")
-            raise ValueError(msg)
+            raise ValueError(
+                get_api_error(_("Unable to get meeting recordings!"), meeting_json)
+            )
         else:
             return meeting_json
 
     def get_recording(self, record_id):
         """Get a specific recording."""
-        action = "getRecordings"
         parameters = {}
         parameters["meetingID"] = self.meeting_id
         parameters["recordID"] = record_id
-        query = urlencode(parameters)
-        hashed = api_call(query, action)
-        url = slash_join(BBB_API_URL, action, "?%s" % hashed)
-        response = requests.get(url)
-        if response.status_code != 200:
-            msg = {}
-            msg["error"] = _("Unable to call BBB server.")
-            msg["returncode"] = response.status_code
-            msg["message"] = response.content.decode("utf-8")
-            raise ValueError(msg)
-        result = response.content.decode("utf-8")
-        xmldoc = et.fromstring(result)
-        recording_json = parseXmlToJson(xmldoc)
+        recording_json = parseXmlToJson(get_api("getRecordings", parameters))
         if recording_json.get("returncode", "") != "SUCCESS":
-            msg = {}
-            msg["error"] = _("Unable to get recording!")
-            msg["returncode"] = recording_json.get("returncode", "")
-            msg["messageKey"] = recording_json.get("messageKey", "")
-            msg["message"] = recording_json.get("message", "")
-            raise ValueError(msg)
+            raise ValueError(get_api_error(_("Unable to get recording!"), recording_json))
         else:
             return recording_json
 
     def delete_recording(self, record_id):
         """Delete a BBB recording."""
-        action = "deleteRecordings"
-        parameters = {}
-        parameters["recordID"] = record_id
-        query = urlencode(parameters)
-        hashed = api_call(query, action)
-        url = slash_join(BBB_API_URL, action, "?%s" % hashed)
-        response = requests.get(url)
-        if response.status_code != 200:
-            msg = {}
-            msg["error"] = _("Unable to call BBB server.")
-            msg["returncode"] = response.status_code
-            msg["message"] = response.content.decode("utf-8")
-            raise ValueError(msg)
-        result = response.content.decode("utf-8")
-        xmldoc = et.fromstring(result)
+        xmldoc = call_api("deleteRecordings", {"recordID": record_id})
+        clear_api_cache("getRecordings", {"meetingID": self.meeting_id})
+        clear_api_cache(
+            "getRecordings", {"meetingID": self.meeting_id, "recordID": record_id}
+        )
         meeting_json = {}
         for elt in xmldoc:
             meeting_json[elt.tag] = elt.text
         if meeting_json.get("returncode", "") != "SUCCESS":
-            msg = {}
-            msg["error"] = _("Unable to delete recording!")
-            msg["returncode"] = meeting_json.get("returncode", "")
-            msg["messageKey"] = meeting_json.get("messageKey", "")
-            msg["message"] = meeting_json.get("message", "")
-            raise ValueError(msg)
+            raise ValueError(
+                get_api_error(_("Unable to delete recording!"), meeting_json)
+            )
         else:
             return True
 
     @staticmethod
     def get_all_meetings():
         """Get all meetings, in JSON format."""
-        action = "getMeetings"
-        parameters = {}
-        query = urlencode(parameters)
-        hashed = api_call(query, action)
-        url = slash_join(BBB_API_URL, action, "?%s" % hashed)
-        response = requests.get(url)
-        if response.status_code != 200:
-            msg = {}
-            msg["error"] = _("Unable to call BBB server.")
-            msg["returncode"] = response.status_code
-            msg["message"] = response.content.decode("utf-8")
-            raise ValueError(msg)
-        result = response.content.decode("utf-8")
-        xmldoc = et.fromstring(result)
-        meeting_json = parseXmlToJson(xmldoc)
+        meeting_json = parseXmlToJson(get_api("getMeetings"))
         if meeting_json.get("returncode", "") != "SUCCESS":
-            msg = {}
-            msg["error"] = _("Unable to get meeting recordings!")
-            msg["returncode"] = meeting_json.get("returncode", "")
-            msg["messageKey"] = meeting_json.get("messageKey", "")
-            msg["message"] = meeting_json.get("message", "")
-            raise ValueError(msg)
+            raise ValueError(
+                get_api_error(_("Unable to get meeting recordings!"), meeting_json)
+            )
         else:
             return meeting_json
 
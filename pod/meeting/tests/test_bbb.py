@@ -0,0 +1,59 @@
+"""Unit tests for the client of the BigBlueButton API.
+
+*  run with 'python manage.py test pod.meeting.tests.test_bbb'
+"""
+
+from unittest import mock
+
+import requests
+from django.core.cache import cache
+from django.test import TestCase
+
+from pod.meeting import bbb
+
+GET_MEETINGS_RESPONSE = b"""<response>
+<returncode>SUCCESS</returncode>
+<meetings>
+<meeting><meetingID>meeting1</meetingID><running>true</running></meeting>
+<meeting><meetingID>meeting2</meetingID><running>false</running></meeting>
+</meetings>
+</response>"""
+
+
+class BBBClientTestCase(TestCase):
+    """Test the calls to the BBB server."""
+
+    def setUp(self) -> None:
+        """Set up required objects for next tests."""
+        cache.clear()
+        print(" --->  SetUp of BBBClientTestCase: OK!")
+
+    @mock.patch.object(bbb, "get_session")
+    def test_is_meeting_running(self, mock_get_session) -> None:
+        """Check that the status of the meetings is read from a single call."""
+        session = mock_get_session.return_value
+        session.get.return_value = mock.Mock(
+            status_code=200, content=GET_MEETINGS_RESPONSE
+        )
+        self.assertTrue(bbb.is_meeting_running("meeting1"))
+        self.assertFalse(bbb.is_meeting_running("meeting2"))
+        self.assertFalse(bbb.is_meeting_running("meeting3"))
+        self.assertEqual(session.get.call_count, 1)
+        self.assertEqual(session.get.call_args.kwargs["timeout"], bbb.BBB_API_TIMEOUT)
+        # the status is read again once a meeting is created or ended
+        bbb.clear_meeting_cache("meeting1")
+        self.assertTrue(bbb.is_meeting_running("meeting1"))
+        self.assertEqual(session.get.call_count, 2)
+        print(" --->  test_is_meeting_running of BBBClientTestCase: OK!")
+
+    @mock.patch.object(bbb, "get_session")
+    def test_request_api_error(self, mock_get_session) -> None:
+        """Check that the errors of the BBB server raise a ValueError."""
+        session = mock_get_session.return_value
+        session.get.return_value = mock.Mock(status_code=500, content=b"error")
+        with self.assertRaises(ValueError):
+            bbb.get_api("getMeetingInfo", {"meetingID": "meeting1"})
+        session.get.side_effect = requests.Timeout()
+        with self.assertRaises(ValueError):
+            bbb.get_api("getMeetingInfo", {"meetingID": "meeting1"})
+        print(" --->  test_request_api_error of BBBClientTestCase: OK!")
@@ -1,14 +1,15 @@
 """Esup-Pod playlists signals."""
 
 from django.contrib.sites.models import Site
-from django.db.models.signals import m2m_changed
+from django.db.models.signals import m2m_changed, post_save, pre_delete
 from django.dispatch import receiver
 from django.utils.translation import gettext_lazy as _
 
 from pod.authentication.models import Owner
+from pod.video.stats_rollup import add_playlist_content_stats
 
 from .apps import FAVORITE_PLAYLIST_NAME
-from .models import Playlist
+from .models import Playlist, PlaylistContent
 
 
 @receiver(m2m_changed, sender=Owner.sites.through)
@@ -33,3 +34,16 @@ def update_favorite_playlist(sender, instance, action, reverse, model, pk_set, *
                     editable=False,
                     site=site,
                 )
+
+
+@receiver(post_save, sender=PlaylistContent)
+def add_playlist_content_to_stats(sender, instance, created, **kwargs):
+    """Add a playlist addition to the statistics totals."""
+    if created:
+        add_playlist_content_stats(instance)
+
+
+@receiver(pre_delete, sender=PlaylistContent)
+def remove_playlist_content_from_stats(sender, instance, **kwargs):
+    """Remove a playlist addition from the statistics totals."""
+    add_playlist_content_stats(instance, -1)
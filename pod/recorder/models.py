@@ -437,6 +437,23 @@ class RecordingFileTreatment(models.Model):
         verbose_name_plural = _("Recording file treatments")
 
 
+class RecorderDirectoryIndex(models.Model):
+    """Index of a directory of the recorders, to scan only its changes."""
+
+    path = models.CharField(_("Path"), max_length=255, unique=True)
+    mtime = models.FloatField(_("Modification time"), default=0)
+    # {name: [size, modification time, state]}
+    files = models.JSONField(_("Files"), default=dict)
+    subdirs = models.JSONField(_("Subdirectories"), default=list)
+
+    class Meta:
+        verbose_name = _("Recorder directory index")
+        verbose_name_plural = _("Recorder directory indexes")
+
+    def __str__(self) -> str:
+        return "%s" % self.path
+
+
 class RecordingFile(models.Model):
     file = models.FileField(upload_to="uploads/")
     recorder = models.ForeignKey(
@@ -12,6 +12,8 @@ from django.template.defaultfilters import slugify
 from django.core.files.base import ContentFile
 from pod.video.models import Video
 from pod.video_encode_transcript import encode
+from pod.video_encode_transcript.models import ENCODING_PRIORITY_BATCH
+from pod.video_encode_transcript.encoding_scheduler import call_encode
 from pod.enrichment.models import Enrichment
 from ..utils import add_comment
 
@@ -91,7 +93,7 @@ def save_video(recording, video_data, video_src) -> Video:
 
     video.save()
     encode_video = getattr(encode, ENCODE_VIDEO)
-    encode_video(video.id)
+    call_encode(encode_video, video.id, ENCODING_PRIORITY_BATCH)
     return video
 
 
@@ -13,6 +13,8 @@ from django.template.defaultfilters import slugify
 
 from pod.video.models import Video, get_storage_path_video
 from pod.video_encode_transcript import encode
+from pod.video_encode_transcript.models import ENCODING_PRIORITY_BATCH
+from pod.video_encode_transcript.encoding_scheduler import call_encode
 from ..utils import add_comment, studio_clean_old_entries
 from ...live.models import Event
 from ...settings import BASE_DIR
@@ -172,7 +174,7 @@ def encode_recording(recording):
 
         # encode the video
         encode_video = getattr(encode, ENCODE_VIDEO)
-        encode_video(video.id)
+        call_encode(encode_video, video.id, ENCODING_PRIORITY_BATCH)
 
 
 def extract_infos_from_catalog(catalogs, recording):
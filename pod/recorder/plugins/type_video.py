@@ -8,6 +8,8 @@ import shutil
 from django.conf import settings
 from pod.video.models import Video, get_storage_path_video
 from pod.video_encode_transcript import encode
+from pod.video_encode_transcript.models import ENCODING_PRIORITY_BATCH
+from pod.video_encode_transcript.encoding_scheduler import call_encode
 
 DEFAULT_RECORDER_TYPE_ID = getattr(settings, "DEFAULT_RECORDER_TYPE_ID", 1)
 ENCODE_VIDEO = getattr(settings, "ENCODE_VIDEO", "start_encode")
@@ -75,4 +77,4 @@ def encode_recording(recording) -> None:
     video.save()
 
     encode_video = getattr(encode, ENCODE_VIDEO)
-    encode_video(video.id)
+    call_encode(encode_video, video.id, ENCODING_PRIORITY_BATCH)
@@ -0,0 +1,167 @@
+"""
+Esup-Pod incremental scan of the recorders directories.
+
+A directory is listed again only if its modification time changed since the
+last scan. The index of each directory is saved in database, with the size,
+modification time and state of its files, so the files of the unchanged
+directories are read from the index and only the files not processed yet are
+checked again. The DirectoryWatcher waits for the changes of the directories
+with the inotify API of Linux, to scan them as soon as a file is published.
+"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import time
+
+from .models import RecorderDirectoryIndex
+
+FILE_DONE = "done"
+FILE_PENDING = "pending"
+# a directory modified recently can change again within its mtime resolution
+RECENT_MTIME = 60
+
+# inotify events of a directory: a file added, removed or written
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+
+class DirectoryIndex:
+    """Index of the recorders directories, loaded and saved once per scan."""
+
+    def __init__(self) -> None:
+        self.entries = {
+            index.path: index for index in RecorderDirectoryIndex.objects.all()
+        }
+        self.changed = set()
+        self.seen = set()
+
+    def update(self, entry) -> None:
+        """Set the index of a directory, saved at the end of the scan."""
+        self.entries[entry.path] = entry
+        self.changed.add(entry.path)
+
+    def save(self, root) -> None:
+        """Save the changed directories and remove the ones not found in root."""
+        changed = [self.entries[path] for path in self.changed]
+        RecorderDirectoryIndex.objects.bulk_create(
+            [entry for entry in changed if entry.pk is None]
+        )
+        RecorderDirectoryIndex.objects.bulk_update(
+            [entry for entry in changed if entry.pk is not None],
+            ["mtime", "files", "subdirs"],
+        )
+        removed = [
+            path
+            for path in self.entries
+            if path not in self.seen
+            and (path == root or path.startswith(os.path.join(root, "")))
+        ]
+        RecorderDirectoryIndex.objects.filter(path__in=removed).delete()
+        self.changed = set()
+
+
+def list_directory(path, mtime, entry, is_done) -> RecorderDirectoryIndex:
+    """List the files and subdirectories of a directory."""
+    previous = entry.files if entry else {}
+    files = {}
+    subdirs = []
+    with os.scandir(path) as dir_entries:
+        for dir_entry in dir_entries:
+            if dir_entry.is_dir():
+                # as os.walk, the symbolic links to directories are not followed
+                if not dir_entry.is_symlink():
+                    subdirs.append(dir_entry.name)
+                continue
+            file_info = previous.get(dir_entry.name)
+            # the files already processed are not read again
+            if not (file_info and file_info[2] == FILE_DONE and is_done(dir_entry.path)):
+                try:
+                    stat = dir_entry.stat()
+                except OSError:
+                    continue
+                file_info = [stat.st_size, stat.st_mtime, FILE_PENDING]
+            files[dir_entry.name] = file_info
+    if entry is None:
+        entry = RecorderDirectoryIndex(path=path)
+    # listed again at the next scan if it may still change within the same mtime
+    entry.mtime = mtime if time.time() - mtime > RECENT_MTIME else 0
+    entry.files = files
+    entry.subdirs = sorted(subdirs)
+    return entry
+
+
+def scan_directory(path, index, is_done, pending) -> None:
+    """Add the files to process of a directory and its subdirectories to pending."""
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        return
+    index.seen.add(path)
+    entry = index.entries.get(path)
+    if entry is None or entry.mtime != mtime:
+        entry = list_directory(path, mtime, entry, is_done)
+        index.update(entry)
+    files = []
+    for name, file_info in sorted(entry.files.items()):
+        state = FILE_DONE if is_done(os.path.join(path, name)) else FILE_PENDING
+        if state != file_info[2]:
+            file_info[2] = state
+            index.update(entry)
+        if state == FILE_PENDING:
+            files.append(name)
+    if files:
+        pending.append((path, files))
+    for name in entry.subdirs:
+        scan_directory(os.path.join(path, name), index, is_done, pending)
+
+
+def scan(root, is_done) -> list:
+    """
+    Get the files to process under root, as (directory, filenames) tuples.
+
+    is_done tells if the file of a path was already processed.
+    """
+    index = DirectoryIndex()
+    pending = []
+    # the paths are joined to root as os.walk does
+    scan_directory(root, index, is_done, pending)
+    index.save(root)
+    return pending
+
+
+def get_indexed_directories() -> list:
+    """Get the paths of the indexed directories."""
+    return list(RecorderDirectoryIndex.objects.values_list("path", flat=True))
+
+
+class DirectoryWatcher:
+    """Wait for the changes of directories, with the inotify API of Linux."""
+
+    def __init__(self) -> None:
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = self.libc.inotify_init1(os.O_CLOEXEC)
+        if self.fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+
+    def watch(self, paths) -> None:
+        """Watch directories, an already watched directory is kept."""
+        for path in paths:
+            self.libc.inotify_add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+
+    def wait(self, timeout) -> bool:
+        """Wait for a change until timeout, return True if there was one."""
+        readable, writable, error = select.select([self.fd], [], [], timeout)
+        if readable:
+            # the events are discarded, the directories are scanned again
+            os.read(self.fd, 64 * 1024)
+        return bool(readable)
+
+    def close(self) -> None:
+        os.close(self.fd)
@@ -0,0 +1,81 @@
+"""
+Unit tests for the incremental scan of the recorders directories.
+
+*  run with `python manage.py test pod.recorder.tests.test_scanner`
+"""
+
+import os
+import shutil
+import tempfile
+import time
+from unittest import mock
+
+from django.test import TestCase
+
+from pod.recorder import scanner
+from pod.recorder.models import RecorderDirectoryIndex
+
+
+class ScannerTestCase(TestCase):
+    """Test case for the incremental scan of the recorders directories."""
+
+    def setUp(self) -> None:
+        """Create a recorder directory with two files, modified an hour ago."""
+        self.root = tempfile.mkdtemp()
+        self.recorder_dir = os.path.join(self.root, "recorder1")
+        os.mkdir(self.recorder_dir)
+        for name in ("video1.mp4", "video2.mp4"):
+            with open(os.path.join(self.recorder_dir, name), "wb") as f:
+                f.write(b"video")
+        self.set_old_mtime()
+        self.done = set()
+        print(" --->  SetUp of ScannerTestCase: OK!")
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.root)
+
+    def set_old_mtime(self) -> None:
+        """Set the modification time of the directories an hour ago."""
+        past = time.time() - 3600
+        for path in (self.root, self.recorder_dir):
+            os.utime(path, (past, past))
+
+    def scan(self) -> list:
+        return scanner.scan(self.root, lambda path: path in self.done)
+
+    def test_scan(self) -> None:
+        """Test that the files not processed are found in the directories."""
+        self.assertEqual(self.scan(), [(self.recorder_dir, ["video1.mp4", "video2.mp4"])])
+        index = RecorderDirectoryIndex.objects.get(path=self.recorder_dir)
+        self.assertEqual(index.files["video1.mp4"][0], 5)
+        self.assertEqual(index.files["video1.mp4"][2], scanner.FILE_PENDING)
+        self.assertEqual(
+            RecorderDirectoryIndex.objects.get(path=self.root).subdirs, ["recorder1"]
+        )
+        print(" --->  test_scan of ScannerTestCase: OK!")
+
+    def test_scan_unchanged_directory(self) -> None:
+        """Test that the unchanged directories are read from the index."""
+        self.scan()
+        self.done.add(os.path.join(self.recorder_dir, "video1.mp4"))
+        with mock.patch.object(scanner.os, "scandir") as scandir:
+            self.assertEqual(self.scan(), [(self.recorder_dir, ["video2.mp4"])])
+        scandir.assert_not_called()
+        index = RecorderDirectoryIndex.objects.get(path=self.recorder_dir)
+        self.assertEqual(index.files["video1.mp4"][2], scanner.FILE_DONE)
+        print(" --->  test_scan_unchanged_directory of ScannerTestCase: OK!")
+
+    def test_scan_changed_directory(self) -> None:
+        """Test that the modified and removed directories are listed again."""
+        self.scan()
+        os.remove(os.path.join(self.recorder_dir, "video2.mp4"))
+        with open(os.path.join(self.recorder_dir, "video3.mp4"), "wb") as f:
+            f.write(b"video")
+        self.set_old_mtime()
+        self.assertEqual(self.scan(), [(self.recorder_dir, ["video1.mp4", "video3.mp4"])])
+        shutil.rmtree(self.recorder_dir)
+        self.assertEqual(self.scan(), [])
+        self.assertFalse(
+            RecorderDirectoryIndex.objects.filter(path=self.recorder_dir).exists()
+        )
+        print(" --->  test_scan_changed_directory of ScannerTestCase: OK!")
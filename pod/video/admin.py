@@ -11,6 +11,7 @@ from django.utils.translation import gettext_lazy as _
 from modeltranslation.admin import TranslationAdmin
 
 from .models import Video
+from .models import ENCODED_VIDEO_FILTER
 from .models import UpdateOwner
 from .models import Channel
 from .models import Theme
@@ -78,13 +79,9 @@ class EncodedFilter(admin.SimpleListFilter):
     def queryset(self, request, queryset):
         value = self.value()
         if value == "Yes":
-            queryset = queryset.exclude(
-                pk__in=[vid.id for vid in queryset if not vid.encoded]
-            )
+            queryset = queryset.filter(ENCODED_VIDEO_FILTER)
         elif value == "No":
-            queryset = queryset.exclude(
-                pk__in=[vid.id for vid in queryset if vid.encoded]
-            )
+            queryset = queryset.exclude(ENCODED_VIDEO_FILTER)
         return queryset
 
 
@@ -64,6 +64,37 @@ def fix_transcript(sender, **kwargs) -> None:
     print("fix_transcript --> OK")
 
 
+def set_media_flags(sender, **kwargs) -> None:
+    """Set the media availability flags of the videos from their encodings."""
+    from pod.video.models import Video
+    from pod.video_encode_transcript.models import EncodingAudio
+    from pod.video_encode_transcript.models import EncodingVideo
+    from pod.video_encode_transcript.models import PlaylistVideo
+    from django.db.models import Exists, OuterRef
+
+    print("Start set_media_flags")
+    Video.objects.update(
+        has_mp4=Exists(
+            EncodingVideo.objects.filter(
+                video=OuterRef("pk"), encoding_format="video/mp4"
+            )
+        ),
+        has_hls=Exists(
+            PlaylistVideo.objects.filter(
+                video=OuterRef("pk"),
+                name="playlist",
+                encoding_format="application/x-mpegURL",
+            )
+        ),
+        has_audio=Exists(
+            EncodingAudio.objects.filter(
+                video=OuterRef("pk"), name="audio", encoding_format="video/mp4"
+            )
+        ),
+    )
+    print("set_media_flags --> OK")
+
+
 def update_video_passwords(sender, **kwargs) -> None:
     """Encrypt all video passwords."""
     from pod.video.models import Video
@@ -93,11 +124,21 @@ class VideoConfig(AppConfig):
     verbose_name = _("Videos")
 
     def ready(self) -> None:
+        from . import signals  # noqa: F401
+
         pre_migrate.connect(self.save_previous_data, sender=self)
         post_migrate.connect(set_default_site, sender=self)
         post_migrate.connect(self.send_previous_data, sender=self)
         post_migrate.connect(fix_transcript, sender=self)
+        post_migrate.connect(set_media_flags, sender=self)
         # post_migrate.connect(update_video_passwords, sender=self)
+        from .stats_rollup import USE_STATS_ROLLUP
+
+        if USE_STATS_ROLLUP:
+            from .viewcount import get_view_count_buffer
+
+            # fail at start if the views of the rollups can not be buffered in Redis
+            get_view_count_buffer()
 
     def execute_query(self, query, mapping_dict) -> None:
         """
@@ -6,20 +6,18 @@ from django.utils.translation import gettext_lazy as _
 from pod.video.models import Type
 from pod.video.models import Discipline
 from pod.video.models import Video
+from pod.video.models import ENCODED_VIDEO_FILTER
 
 from pod.video.utils import get_tag_cloud
 
 from django.db.models import Count, Sum
-from django.db.models import Q
-from django.db.models import Exists
-from django.db.models import OuterRef
 
+import threading
+import uuid
 from datetime import timedelta
 from django.core.cache import cache
+from django.db import connection
 from django.contrib.sites.shortcuts import get_current_site
-from pod.video_encode_transcript.models import EncodingVideo
-from pod.video_encode_transcript.models import PlaylistVideo
-from pod.video_encode_transcript.models import EncodingAudio
 
 CHUNK_SIZE = getattr(django_settings, "CHUNK_SIZE", 100000)
 HIDE_USER_FILTER = getattr(django_settings, "HIDE_USER_FILTER", False)
@@ -27,6 +25,8 @@ OEMBED = getattr(django_settings, "OEMBED", False)
 USE_STATS_VIEW = getattr(django_settings, "USE_STATS_VIEW", False)
 CACHE_VIDEO_DEFAULT_TIMEOUT = getattr(django_settings, "CACHE_VIDEO_DEFAULT_TIMEOUT", 600)
 SITE_ID = getattr(django_settings, "SITE_ID", 1)
+# time after which a failed background refresh of the video data is retried
+VIDEO_DATA_REFRESH_LOCK_TIMEOUT = 60
 __AVAILABLE_VIDEO_FILTER__ = {
     "encoding_in_progress": False,
     "is_draft": False,
@@ -43,31 +43,7 @@ def get_available_videos_filter(request=None):
     return (
         Video.objects.filter(**__AVAILABLE_VIDEO_FILTER__)
         .defer("video", "slug", "owner", "additional_owners", "description")
-        .filter(
-            Q(
-                Exists(
-                    EncodingVideo.objects.filter(
-                        video=OuterRef("pk"), encoding_format="video/mp4"
-                    )
-                )
-            )
-            | Q(
-                Exists(
-                    PlaylistVideo.objects.filter(
-                        video=OuterRef("pk"),
-                        name="playlist",
-                        encoding_format="application/x-mpegURL",
-                    )
-                )
-            )
-            | Q(
-                Exists(
-                    EncodingAudio.objects.filter(
-                        video=OuterRef("pk"), name="audio", encoding_format="video/mp4"
-                    )
-                )
-            )
-        )
+        .filter(ENCODED_VIDEO_FILTER)
     )
 
 
@@ -85,73 +61,127 @@ def context_video_settings(request):
     return new_settings
 
 
-def context_video_data(request):
-    """Get video data in cache, if not, create and add it in cache."""
+def get_video_data_keys(name, request, scope="") -> tuple:
+    """Get the cache keys of a video data and of its version."""
+    version_key = "video_data_version:%s:%s" % (name, scope)
+    key = "video_data:%s:%s:%s" % (name, get_current_site(request).id, scope)
+    return key, version_key
 
-    from pod.video.views import get_videos_categories_list
 
-    category = cache.get("CATEGORY")
-    if category is None:
-        category = get_videos_categories_list(request)
-        cache.set("CATEGORY", category, timeout=CACHE_VIDEO_DEFAULT_TIMEOUT)
-
-    types = cache.get("TYPES")
-    if types is None:
-        types = (
-            Type.objects.filter(
-                sites=get_current_site(request),
-                video__is_draft=False,
-                video__sites=get_current_site(request),
-            )
-            .distinct()
-            .annotate(video_count=Count("video", distinct=True))
-        )
-        cache.set("TYPES", types, timeout=CACHE_VIDEO_DEFAULT_TIMEOUT)
-
-    tags = cache.get("TAGS")
-    if tags is None:
-        tags = get_tag_cloud()
-        cache.set("TAGS", tags, timeout=CACHE_VIDEO_DEFAULT_TIMEOUT)
-
-    disciplines = cache.get("DISCIPLINES")
-    if disciplines is None:
-        disciplines = (
-            Discipline.objects.filter(
-                site=get_current_site(request),
-                video__is_draft=False,
-                video__sites=get_current_site(request),
-            )
-            .distinct()
-            .annotate(video_count=Count("video", distinct=True))
+def clear_video_data(*names, scope="") -> None:
+    """Mark video data as stale, they are computed again on their next use."""
+    cache.set_many(
+        {"video_data_version:%s:%s" % (name, scope): uuid.uuid4().hex for name in names},
+        None,
+    )
+
+
+def refresh_video_data(key, version, compute, request, timeout) -> None:
+    """Compute a video data and save it in cache with its version."""
+    try:
+        cache.set(key, (version, compute(request)), timeout)
+    finally:
+        cache.delete(key + ":refresh")
+        connection.close()
+
+
+def get_video_data(name, compute, request, scope="", timeout=None):
+    """
+    Get a video data from cache.
+
+    The data is computed when missing. When stale, it is still returned while a
+    single background thread computes it again.
+    """
+    key, version_key = get_video_data_keys(name, request, scope)
+    cached = cache.get_many([key, version_key])
+    version = cached.get(version_key, "")
+    if key not in cached:
+        data = compute(request)
+        cache.set(key, (version, data), timeout)
+        return data
+    data_version, data = cached[key]
+    if data_version != version and cache.add(
+        key + ":refresh", 1, VIDEO_DATA_REFRESH_LOCK_TIMEOUT
+    ):
+        t = threading.Thread(
+            target=refresh_video_data, args=[key, version, compute, request, timeout]
         )
-        cache.set("DISCIPLINES", disciplines, timeout=CACHE_VIDEO_DEFAULT_TIMEOUT)
-
-    VIDEOS_COUNT = cache.get("VIDEOS_COUNT")
-    VIDEOS_DURATION = cache.get("VIDEOS_DURATION")
-    if VIDEOS_COUNT is None:
-        v_filter = get_available_videos_filter(request)
-        aggregate_videos = v_filter.aggregate(
-            duration=Sum("duration"), number=Count("id")
+        t.daemon = True
+        t.start()
+    return data
+
+
+def get_types(request):
+    """Get the types of the videos of the site, with their number of videos."""
+    return (
+        Type.objects.filter(
+            sites=get_current_site(request),
+            video__is_draft=False,
+            video__sites=get_current_site(request),
         )
-        VIDEOS_COUNT = aggregate_videos["number"]
-        cache.set("VIDEOS_COUNT", VIDEOS_COUNT, timeout=CACHE_VIDEO_DEFAULT_TIMEOUT)
-        VIDEOS_DURATION = (
-            str(timedelta(seconds=aggregate_videos["duration"]))
-            if aggregate_videos["duration"]
-            else "0"
+        .distinct()
+        .annotate(video_count=Count("video", distinct=True))
+    )
+
+
+def get_disciplines(request):
+    """Get the disciplines of the videos of the site, with their number of videos."""
+    return (
+        Discipline.objects.filter(
+            site=get_current_site(request),
+            video__is_draft=False,
+            video__sites=get_current_site(request),
         )
-        VIDEOS_DURATION_TR = VIDEOS_DURATION.replace("days", str(_("days")))
+        .distinct()
+        .annotate(video_count=Count("video", distinct=True))
+    )
 
-        cache.set(
-            "VIDEOS_DURATION", VIDEOS_DURATION_TR, timeout=CACHE_VIDEO_DEFAULT_TIMEOUT
+
+def get_tags(request) -> list:
+    """Get the most popular tags."""
+    return get_tag_cloud()
+
+
+def get_videos_stats(request) -> tuple:
+    """Get the number and the total duration of the available videos."""
+    aggregate_videos = get_available_videos_filter(request).aggregate(
+        duration=Sum("duration"), number=Count("id")
+    )
+    videos_duration = (
+        str(timedelta(seconds=aggregate_videos["duration"]))
+        if aggregate_videos["duration"]
+        else "0"
+    )
+    return (
+        aggregate_videos["number"],
+        videos_duration.replace("days", str(_("days"))),
+    )
+
+
+def context_video_data(request):
+    """Get video data in cache, if not, create and add it in cache."""
+
+    from pod.video.views import get_videos_categories_list
+
+    category = {}
+    if request is not None and request.user.is_authenticated:
+        category = get_video_data(
+            "CATEGORY",
+            get_videos_categories_list,
+            request,
+            scope=request.user.id,
+            timeout=CACHE_VIDEO_DEFAULT_TIMEOUT,
         )
+    VIDEOS_COUNT, VIDEOS_DURATION = get_video_data(
+        "VIDEOS_COUNT", get_videos_stats, request
+    )
 
     return {
-        "TYPES": types,
-        "DISCIPLINES": disciplines,
+        "TYPES": get_video_data("TYPES", get_types, request),
+        "DISCIPLINES": get_video_data("DISCIPLINES", get_disciplines, request),
         "CATEGORY": category,
         "VIDEOS_COUNT": VIDEOS_COUNT,
         "VIDEOS_DURATION": VIDEOS_DURATION,
         "CHANNELS_PER_BATCH": CHANNELS_PER_BATCH,
-        "TAGS": tags,
+        "TAGS": get_video_data("TAGS", get_tags, request),
     }
@@ -2,7 +2,7 @@
 
 from django.core.management.base import BaseCommand
 from django.core.cache import cache
-from pod.video.context_processors import context_video_data
+from pod.video.context_processors import context_video_data, get_video_data_keys
 from django.core import serializers
 import json
 
@@ -18,7 +18,10 @@ class Command(BaseCommand):
     def handle(self, *args, **options) -> None:
         """Store video data in cache."""
         cache.delete_many(
-            ["DISCIPLINES", "VIDEOS_COUNT", "VIDEOS_DURATION", "TYPES", "TAGS"]
+            [
+                get_video_data_keys(name, None)[0]
+                for name in ("DISCIPLINES", "VIDEOS_COUNT", "TYPES", "TAGS")
+            ]
         )
         video_data = context_video_data(request=None)
         msg = "Successfully store video data in cache"
@@ -0,0 +1,29 @@
+"""Esup-Pod Django command to save the buffered view counts of the videos.
+
+Useful with USE_VIEW_COUNT_BUFFER and a Redis buffer, e.g. in a crontab, to save
+the views counted since the last automatic flush. Without Redis, the views are
+buffered in the memory of each web process, which saves them itself: the command
+has then nothing to save.
+"""
+
+from django.core.management.base import BaseCommand
+from pod.video.viewcount import flush_view_counts, is_buffer_in_memory
+
+
+class Command(BaseCommand):
+    """Save the buffered view counts in database."""
+
+    help = "Save the buffered view counts of the videos in database"
+
+    def handle(self, *args, **options) -> None:
+        """Handle the flush_view_counts command call."""
+        if is_buffer_in_memory():
+            self.stdout.write(
+                self.style.WARNING(
+                    "The view counts are buffered in the memory of each process, "
+                    "and saved by it: nothing to save."
+                )
+            )
+            return
+        nb_views = flush_view_counts()
+        self.stdout.write(self.style.SUCCESS("%s view(s) saved." % nb_views))
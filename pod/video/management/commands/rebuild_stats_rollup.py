@@ -0,0 +1,19 @@
+"""Esup-Pod Django command to compute the statistics rollups again.
+
+To run once when USE_STATS_ROLLUP is activated: the totals are then
+kept up to date at each view and playlist addition.
+"""
+
+from django.core.management.base import BaseCommand
+from pod.video.stats_rollup import rebuild_stats_rollup
+
+
+class Command(BaseCommand):
+    """Compute the statistics totals of the videos, channels and themes."""
+
+    help = "Compute the statistics totals of the videos, channels and themes again"
+
+    def handle(self, *args, **options) -> None:
+        """Handle the rebuild_stats_rollup command call."""
+        nb_totals = rebuild_stats_rollup()
+        self.stdout.write(self.style.SUCCESS("%s total(s) computed." % nb_totals))
@@ -30,6 +30,11 @@ export VIRTUALENVWRAPPER_PYTHON=/usr/bin/python3.10;
 cd /data/www/%userpod%/django_projects/podv4;
 source /usr/bin/virtualenvwrapper.sh; workon django_pod;
 python manage.py recorder checkDirectory'
+Only the directories modified since the previous check are listed again
+(see pod/recorder/scanner.py).
+Instead of the CRON task, the command can run as a daemon with the task
+watchDirectory: the directories are checked as soon as they change (with inotify,
+on a local filesystem), and every --interval seconds.
 """
 
 import os
@@ -37,8 +42,10 @@ import shutil
 from django.utils import translation
 from django.core.management.base import BaseCommand
 from django.conf import settings
+from django.db import close_old_connections
 from django.urls import reverse
 from pod.recorder.models import Recorder, Recording, RecordingFileTreatment
+from pod.recorder.scanner import DirectoryWatcher, get_indexed_directories, scan
 from pod.recorder.utils import add_comment
 import hashlib
 import requests
@@ -47,6 +54,8 @@ from django.utils import timezone
 from django.contrib.sites.shortcuts import get_current_site
 from pod.video.models import Video, get_storage_path_video
 from pod.video_encode_transcript import encode
+from pod.video_encode_transcript.models import ENCODING_PRIORITY_BATCH
+from pod.video_encode_transcript.encoding_scheduler import call_encode
 import datetime
 
 LANGUAGE_CODE = getattr(settings, "LANGUAGE_CODE", "fr")
@@ -369,7 +378,7 @@ def case_studio_recording(
 
         # Encode
         encode_video = getattr(encode, ENCODE_VIDEO)
-        encode_video(video.id)
+        call_encode(encode_video, video.id, ENCODING_PRIORITY_BATCH)
     else:
         # Data seems to be deleted from Pod database
         print_if_debug(
@@ -423,7 +432,7 @@ def file_exist(
     return html_message_error, message_error
 
 
-def recorder_exist(recorder, filename, message_error, html_message_error):
+def recorder_exist(recorder, filename, message_error, html_message_error, data):
     # There is a connection between the directory and a recorder
     print_if_debug(" - This video was published by '" + recorder.name + "' recorder.")
 
@@ -435,9 +444,9 @@ def recorder_exist(recorder, filename, message_error, html_message_error):
     else:
         source_file = os.path.join(DEFAULT_RECORDER_PATH, recorder.directory, filename)
     # Check if this video was already processed
-    recording = Recording.objects.filter(source_file=source_file).first()
+    recording = source_file in data["recordings"]
     # Check if a job was created for this file (need at least 2 pass)
-    file = RecordingFileTreatment.objects.filter(file=source_file).first()
+    file = data["treatments"].get(source_file)
 
     if recorder.recording_type != "studio" and recording:
         # This video was already processed
@@ -471,7 +480,30 @@ def recorder_exist(recorder, filename, message_error, html_message_error):
     return html_message_error, message_error
 
 
-def process_directory(html_message_error, message_error, files, root, studio):
+def get_recorder_data() -> dict:
+    """Load once the recorders, recordings and file treatments used by a check."""
+    recorders = {}
+    for recorder in Recorder.objects.filter(sites=get_current_site(None)):
+        recorders.setdefault(recorder.directory, recorder)
+    return {
+        "recorders": recorders,
+        "recordings": set(Recording.objects.values_list("source_file", flat=True)),
+        "treatments": {
+            treatment.file: treatment
+            for treatment in RecordingFileTreatment.objects.all()
+        },
+    }
+
+
+def is_file_done(source_file, data) -> bool:
+    """Check if a file was already processed, to not check it again."""
+    file = data["treatments"].get(source_file)
+    return source_file in data["recordings"] or (
+        file is not None and (file.email_sent or file.require_manual_claim)
+    )
+
+
+def process_directory(html_message_error, message_error, files, root, studio, data):
     for filename in files:
         # Check if extension is a good extension (videos extensions + zip)
         extension = filename.split(".")[-1]
@@ -517,12 +549,10 @@ def process_directory(html_message_error, message_error, files, root, studio):
             )
             continue
         # Search for the recorder corresponding to this directory
-        recorder = Recorder.objects.filter(
-            directory=dirname, sites=get_current_site(None)
-        ).first()
+        recorder = data["recorders"].get(dirname)
         if recorder:
             html_message_error, message_error = recorder_exist(
-                recorder, filename, message_error, html_message_error
+                recorder, filename, message_error, html_message_error, data
             )
         else:
             # There isn't a connection between the directory and a recorder
@@ -544,49 +574,91 @@ def process_directory(html_message_error, message_error, files, root, studio):
     return html_message_error, message_error
 
 
+def check_directories() -> None:
+    """Check the recorders directories and process their new files."""
+    html_message_error = ""
+    message_error = ""
+    data = get_recorder_data()
+    # Path the tree, only the modified directories are listed
+    pending = scan(
+        DEFAULT_RECORDER_PATH, lambda source_file: is_file_done(source_file, data)
+    )
+    for root, files in pending:
+        # For standard recorders, video files are in directories/subdirectories
+        html_message_error, message_error = process_directory(
+            html_message_error, message_error, files, root, False, data
+        )
+    # Path the Studio tree
+    if USE_OPENCAST_STUDIO:
+        # For Studio recorder, video files are only in the 1st level directory
+        for root, dirs, files in os.walk(opencastMediaDir):
+            html_message_error, message_error = process_directory(
+                html_message_error, message_error, files, root, True, data
+            )
+            # Only 1 level
+            break
+    # If there was at least one error, send an email to Pod admins
+    if message_error != "":
+        print_if_debug(
+            "\n\n*** An email Mediacourse recorder job [Error(s) "
+            "encountered] was sent to Pod admins, with message: "
+            "***" + message_error
+        )
+        mail_admins(
+            "Mediacourse job [Error(s) encountered]",
+            message_error,
+            fail_silently=False,
+            html_message=html_message_error,
+        )
+
+
+def watch_directories(interval, settle) -> None:
+    """Check the recorders directories when they change, and every interval."""
+    watcher = DirectoryWatcher()
+    try:
+        while True:
+            close_old_connections()
+            check_directories()
+            watcher.watch(get_indexed_directories())
+            if USE_OPENCAST_STUDIO:
+                watcher.watch([opencastMediaDir])
+            if watcher.wait(interval):
+                # wait for the end of the burst of changes
+                while watcher.wait(settle):
+                    pass
+    finally:
+        watcher.close()
+
+
 class Command(BaseCommand):
     # First possible argument: checkDirectory
     args = "checkDirectory"
     help = "Check the directory and subdirectories if they contain videos "
     "published by the recorders. "
-    valid_args = ["checkDirectory"]
+    valid_args = ["checkDirectory", "watchDirectory"]
 
     def add_arguments(self, parser):
         parser.add_argument("task")
+        parser.add_argument(
+            "--interval",
+            type=int,
+            default=60,
+            help="watchDirectory: seconds between two checks without change.",
+        )
+        parser.add_argument(
+            "--settle",
+            type=int,
+            default=5,
+            help="watchDirectory: seconds without change before a check.",
+        )
 
     def handle(self, *args, **options):
         # Activate a fixed locale fr
         translation.activate(LANGUAGE_CODE)
         if options["task"] and options["task"] in self.valid_args:
-            html_message_error = ""
-            message_error = ""
-            # Path the tree
-            for root, dirs, files in os.walk(DEFAULT_RECORDER_PATH):
-                # For standard recorders, video files are in directories/subdirectories
-                html_message_error, message_error = process_directory(
-                    html_message_error, message_error, files, root, False
-                )
-            # Path the Studio tree
-            if USE_OPENCAST_STUDIO:
-                # For Studio recorder, video files are only in the 1st level directory
-                for root, dirs, files in os.walk(opencastMediaDir):
-                    html_message_error, message_error = process_directory(
-                        html_message_error, message_error, files, root, True
-                    )
-                    # Only 1 level
-                    break
-            # If there was at least one error, send an email to Pod admins
-            if message_error != "":
-                print_if_debug(
-                    "\n\n*** An email Mediacourse recorder job [Error(s) "
-                    "encountered] was sent to Pod admins, with message: "
-                    "***" + message_error
-                )
-                mail_admins(
-                    "Mediacourse job [Error(s) encountered]",
-                    message_error,
-                    fail_silently=False,
-                    html_message=html_message_error,
-                )
+            if options["task"] == "watchDirectory":
+                watch_directories(options["interval"], options["settle"])
+            else:
+                check_directories()
         else:
             print("*** Warning: you must give some arguments: %s ***" % self.valid_args)
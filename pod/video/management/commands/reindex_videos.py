@@ -2,20 +2,20 @@
 
 from django.core.management.base import BaseCommand
 from pod.video.models import Video
-from pod.video_search.models import index_video
+from pod.video_search.utils import ES_INDEX, reindex_es
 
 
 def reindex_all_videos(dry_run: bool) -> int:
     """Reindex all videos."""
     print("\nReindexing all videos...")
-    videos = Video.objects.all()
-    nb_videos = 0
-    for vid in videos:
-        print(".", end="")
-        if not dry_run:
-            index_video(vid)
-        nb_videos += 1
-    print("")
+    videos = Video.objects.filter(is_draft=False, encoding_in_progress=False)
+    if dry_run:
+        return videos.count()
+    # the videos are indexed in a new index, then the ES_INDEX alias switched to it
+    index, nb_videos, errors = reindex_es(videos)
+    print("Alias %s switched to the index %s." % (ES_INDEX, index))
+    if errors:
+        print("%i video(s) not reindexed." % len(errors))
     return nb_videos
 
 
@@ -0,0 +1,36 @@
+"""Esup-Pod Django command to generate the sizes of the video thumbnails.
+
+To run once for the existing videos: the sizes are then generated in the
+background each time the thumbnail of a video changes.
+"""
+
+from django.core.management.base import BaseCommand
+from pod.video.models import Video
+
+
+class Command(BaseCommand):
+    """Generate the sizes of the thumbnails used by the video lists."""
+
+    help = "Generate the sizes of the video thumbnails and save their urls"
+
+    def add_arguments(self, parser) -> None:
+        """Allow arguments to be used with the command."""
+        parser.add_argument(
+            "--force",
+            help="Generate them again for all videos, not only the missing ones.",
+            action="store_true",
+            default=False,
+        )
+
+    def handle(self, *args, **options) -> None:
+        """Handle the update_thumbnail_urls command call."""
+        nb_videos = 0
+        videos = Video.objects.exclude(thumbnail=None).select_related("thumbnail")
+        for video in videos.iterator():
+            if (
+                options["force"]
+                or video.thumbnail_urls.get("thumbnail_id") != video.thumbnail_id
+            ):
+                video.update_thumbnail_urls()
+                nb_videos += 1
+        self.stdout.write(self.style.SUCCESS("%s video(s) updated." % nb_videos))
@@ -147,6 +147,12 @@ ENCODING_CHOICES = getattr(
     ),
 )
 DEFAULT_THUMBNAIL = getattr(settings, "DEFAULT_THUMBNAIL", "img/default.svg")
+# sizes of the video thumbnails generated in advance, with their options
+THUMBNAIL_SIZES = {
+    "x720": {"crop": "center", "quality": 80},
+    "x170": {"crop": "center", "quality": 72},
+    "100x100": {"crop": "center", "quality": 72},
+}
 SECRET_KEY = getattr(settings, "SECRET_KEY", "")
 
 NOTES_STATUS = getattr(
@@ -681,6 +687,14 @@ def default_site_discipline(sender, instance, **kwargs) -> None:
         instance.site = Site.objects.get_current()
 
 
+# flags of the encoded media, only written by Video.update_media_flags
+MEDIA_FLAGS = ("has_mp4", "has_hls", "has_audio")
+# fields not written by a full save of a video, but by their own update
+UPDATE_ONLY_FIELDS = MEDIA_FLAGS + ("thumbnail_urls",)
+# videos with at least one encoded media to play, see Video.encoded
+ENCODED_VIDEO_FILTER = Q(has_mp4=True) | Q(has_hls=True) | Q(has_audio=True)
+
+
 class Video(models.Model):
     """Class describing video objects."""
 
@@ -739,6 +753,7 @@ class Video(models.Model):
         ),
     )
     date_added = models.DateTimeField(_("Date added"), default=timezone.now)
+    date_modified = models.DateTimeField(_("Date modified"), auto_now=True, db_index=True)
     date_evt = models.DateField(
         _("Date of event"), default=date.today, blank=True, null=True
     )
@@ -868,6 +883,18 @@ class Video(models.Model):
         _("Encoding in progress"), default=False, editable=False
     )
     is_video = models.BooleanField(_("Is Video"), default=True, editable=False)
+    # availability of the encoded media, kept up to date by the encoding signals
+    has_mp4 = models.BooleanField(
+        _("Has MP4 files"), default=False, editable=False, db_index=True
+    )
+    has_hls = models.BooleanField(
+        _("Has HLS playlist"), default=False, editable=False, db_index=True
+    )
+    has_audio = models.BooleanField(
+        _("Has audio file"), default=False, editable=False, db_index=True
+    )
+    # urls of the pre-generated sizes of the thumbnail, see update_thumbnail_urls
+    thumbnail_urls = models.JSONField(default=dict, editable=False, blank=True)
 
     date_delete = models.DateField(
         _("Date to delete"),
@@ -921,6 +948,9 @@ class Video(models.Model):
         # Modifying existing Video
         else:
             newid = self.id
+            if not self._state.adding and not args and not kwargs:
+                # do not overwrite the media flags set during the encoding
+                kwargs["update_fields"] = self.get_saved_fields()
         newid = "%04d" % newid
         self.slug = "%s-%s" % (newid, slugify(self.title))
         # self.set_password()
@@ -928,6 +958,17 @@ class Video(models.Model):
         # Ensure video folder will accord access to additional owners
         self.update_additional_owners_rights()
 
+    def get_saved_fields(self) -> list:
+        """Get the loaded fields of the video, without the update only ones."""
+        deferred = self.get_deferred_fields()
+        return [
+            field.name
+            for field in self._meta.concrete_fields
+            if not field.primary_key
+            and field.name not in UPDATE_ONLY_FIELDS
+            and field.attname not in deferred
+        ]
+
     def __str__(self) -> str:
         """Display a video object as string."""
         if self.id:
@@ -1014,50 +1055,67 @@ class Video(models.Model):
         """
         return 360 if self.is_video else 244
 
-    def get_thumbnail_url(self, size="x720") -> str:
-        """Get a thumbnail url for the video, with defined max size."""
-        request = None
-        # Initialize default thumbnail URL
-        thumbnail_url = "".join(
-            [
-                "//",
-                get_current_site(request).domain,
-                static(DEFAULT_THUMBNAIL),
-            ]
-        )
+    def get_thumbnail_file_url(self, size: str) -> str:
+        """Get the url of a size of the thumbnail, generated from its file if needed."""
         if self.thumbnail and self.thumbnail.file_exist():
             # Do not serve thumbnail url directly, as it can lead to the video URL
             # Handle exception to avoid sending an error email
             try:
-                im = get_thumbnail(self.thumbnail.file, size, crop="center", quality=80)
-                thumbnail_url = "".join(["//", get_current_site(request).domain, im.url])
+                return get_thumbnail(
+                    self.thumbnail.file, size, **THUMBNAIL_SIZES.get(size, {})
+                ).url
             except Exception as e:
                 logger.error(
                     "An error occured during get_thumbnail_url"
                     " for video %s: %s" % (self.id, e)
                 )
-            return thumbnail_url
-        else:
-            return thumbnail_url
+        return static(DEFAULT_THUMBNAIL)
+
+    def get_thumbnail_size_url(self, size: str) -> str:
+        """Get the url of a size of the thumbnail, pre-generated if possible."""
+        if not self.thumbnail_id:
+            return static(DEFAULT_THUMBNAIL)
+        if (
+            self.thumbnail_urls.get("thumbnail_id") == self.thumbnail_id
+            and size in self.thumbnail_urls
+        ):
+            return self.thumbnail_urls[size]
+        # not generated yet, see update_thumbnail_urls
+        return self.get_thumbnail_file_url(size)
+
+    def update_thumbnail_urls(self) -> None:
+        """
+        Generate the sizes of the thumbnail and save their urls.
+
+        If no size could be generated, the urls stay empty
+        so they are generated again at the next change of the video.
+        """
+        thumbnail_urls = {}
+        if self.thumbnail_id:
+            for size in THUMBNAIL_SIZES:
+                url = self.get_thumbnail_file_url(size)
+                if url != static(DEFAULT_THUMBNAIL):
+                    thumbnail_urls[size] = url
+        if thumbnail_urls:
+            thumbnail_urls["thumbnail_id"] = self.thumbnail_id
+        # unless the thumbnail has been changed in the meantime
+        # date_modified is set as by a save, for the harvest of the changes
+        Video.objects.filter(id=self.id, thumbnail_id=self.thumbnail_id).update(
+            thumbnail_urls=thumbnail_urls, date_modified=timezone.now()
+        )
+        self.thumbnail_urls = thumbnail_urls
+
+    def get_thumbnail_url(self, size="x720") -> str:
+        """Get a thumbnail url for the video, with defined max size."""
+        return "".join(
+            ["//", get_current_site(None).domain, self.get_thumbnail_size_url(size)]
+        )
 
     @property
     def get_thumbnail_admin(self):
-        thumbnail_url = ""
+        thumbnail_url = self.get_thumbnail_size_url("100x100")
         # fix title for xml description
         title = re.sub(r"[\x00-\x08\x0B-\x0C\x0E-\x1F]", "", self.title)
-        if self.thumbnail and self.thumbnail.file_exist():
-            # Handle exception to avoid sending an error email
-            try:
-                im = get_thumbnail(
-                    self.thumbnail.file, "100x100", crop="center", quality=72
-                )
-                thumbnail_url = im.url
-            except Exception:
-                thumbnail_url = static(DEFAULT_THUMBNAIL)
-            # <img src="{{ im.url }}" width="{{ im.width }}"
-            # height="{{ im.height }}" loading="lazy">
-        else:
-            thumbnail_url = static(DEFAULT_THUMBNAIL)
         return format_html(
             '<img style="max-width:100px" '
             'src="%s" alt="%s" loading="lazy">'
@@ -1071,23 +1129,9 @@ class Video(models.Model):
 
     def get_thumbnail_card(self) -> str:
         """Return thumbnail image card of current video."""
-        thumbnail_url = ""
-        if self.thumbnail and self.thumbnail.file_exist():
-            # Handle exception to avoid sending an error email
-            try:
-                im = get_thumbnail(self.thumbnail.file, "x170", crop="center", quality=72)
-                thumbnail_url = im.url
-            except Exception:
-                thumbnail_url = static(DEFAULT_THUMBNAIL)
-            # <img src="{{ im.url }}" width="{{ im.width }}"
-            # height="{{ im.height }}" loading="lazy">
-        else:
-            thumbnail_url = static(DEFAULT_THUMBNAIL)
-        return (
-            '<img class="pod-thumbnail" src="%s" alt="%s"\
-            loading="lazy">'
-            % (thumbnail_url, self.title)
-        )
+        thumbnail_url = self.get_thumbnail_size_url("x170")
+        return '<img class="pod-thumbnail" src="%s" alt="%s"\
+            loading="lazy">' % (thumbnail_url, self.title)
 
     @property
     def duration_in_time(self) -> str:
@@ -1099,14 +1143,21 @@ class Video(models.Model):
     @property
     def encoded(self) -> bool:
         """Get the encoded status of a video."""
-        return (
-            self.get_playlist_master() is not None
-            or self.get_video_mp4().exists()
-            or self.get_video_m4a() is not None
-        )
+        return self.has_mp4 or self.has_hls or self.has_audio
 
     encoded.fget.short_description = _("Is the video encoded?")
 
+    def update_media_flags(self) -> None:
+        """Update the availability flags of the media from the encodings."""
+        flags = {
+            "has_mp4": self.get_video_mp4().exists(),
+            "has_hls": self.get_playlist_master() is not None,
+            "has_audio": self.get_video_m4a() is not None,
+        }
+        Video.objects.filter(id=self.id).update(date_modified=timezone.now(), **flags)
+        for flag, value in flags.items():
+            setattr(self, flag, value)
+
     @property
     def get_version(self):
         """Get the version of a video."""
@@ -1162,7 +1213,10 @@ class Video(models.Model):
                     return version["url"]
 
     def get_viewcount(self, from_nb_day=0):
-        """Get the view counter of a video."""
+        """Get the view counter of a video, with the views not saved yet."""
+        from pod.video.viewcount import get_pending_view_count
+
+        pending = get_pending_view_count(self.id, from_nb_day)
         if from_nb_day > 0:
             d = date.today() - timezone.timedelta(days=from_nb_day)
             set = self.viewcount_set.filter(date__gte=d)
@@ -1172,8 +1226,8 @@ class Video(models.Model):
         count_sum = set.aggregate(Sum("count"))
 
         if count_sum["count__sum"] is None:
-            return 0
-        return count_sum["count__sum"]
+            return pending
+        return count_sum["count__sum"] + pending
 
     def get_marker_time_for_user(self, user):
         """Get the marker time of a video for the user in parameter."""
@@ -1245,7 +1299,9 @@ class Video(models.Model):
     def get_audio_json(self, extensions) -> dict:
         """Get the JSON representation of the audio."""
         extension_list = extensions.split(",") if extensions else []
-        list_audio = self.encodingaudio_set.filter(name="audio")
+        list_audio = [
+            audio for audio in self.encodingaudio_set.all() if audio.name == "audio"
+        ]
         dict_src = Video.get_media_json(extension_list, list_audio)
         return dict_src
 
@@ -1281,9 +1337,19 @@ class Video(models.Model):
         return dict_src
 
     def get_json_to_index(self) -> str:
+        """Get the JSON document of the video in the search index."""
+        return json.dumps(self.get_data_to_index())
+
+    def get_data_to_index(self) -> dict:
+        """
+        Get the data of the video in the search index, also used by the REST API.
+
+        The related objects are read with all(), so that the ones prefetched
+        for a list of videos are used, see pod.video.queryset.utils.
+        """
         try:
             current_site = Site.objects.get_current()
-            data_to_dump = {
+            return {
                 "id": self.id,
                 "title": "%s" % self.title,
                 "owner": "%s" % self.owner.username,
@@ -1301,20 +1367,28 @@ class Video(models.Model):
                 "description": "%s" % self.description,
                 "thumbnail": "%s" % self.get_thumbnail_url(),
                 "duration": "%s" % self.duration,
-                "tags": list(self.tags.all().values("name", "slug")),
+                "tags": [{"name": t.name, "slug": t.slug} for t in self.tags.all()],
                 "type": {"title": self.type.title, "slug": self.type.slug},
-                "disciplines": list(
-                    self.discipline.all()
-                    .filter(site=current_site)
-                    .values("title", "slug")
-                ),
-                "channels": list(
-                    self.channel.all().filter(site=current_site).values("title", "slug")
-                ),
-                "themes": list(self.theme.all().values("title", "slug")),
-                "contributors": list(self.contributor_set.values("name", "role")),
-                "chapters": list(self.chapter_set.values("title", "slug")),
-                "overlays": list(self.overlay_set.values("title", "slug")),
+                "disciplines": [
+                    {"title": d.title, "slug": d.slug}
+                    for d in self.discipline.all()
+                    if d.site_id == current_site.id
+                ],
+                "channels": [
+                    {"title": c.title, "slug": c.slug}
+                    for c in self.channel.all()
+                    if c.site_id == current_site.id
+                ],
+                "themes": [{"title": t.title, "slug": t.slug} for t in self.theme.all()],
+                "contributors": [
+                    {"name": c.name, "role": c.role} for c in self.contributor_set.all()
+                ],
+                "chapters": [
+                    {"title": c.title, "slug": c.slug} for c in self.chapter_set.all()
+                ],
+                "overlays": [
+                    {"title": o.title, "slug": o.slug} for o in self.overlay_set.all()
+                ],
                 "full_url": self.get_full_url(),
                 "is_restricted": self.is_restricted,
                 "password": True if self.password != "" else False,
@@ -1323,13 +1397,12 @@ class Video(models.Model):
                 "cursus": "%s" % __CURSUS_CODES_DICT__[self.cursus],
                 "main_lang": "%s" % __LANG_CHOICES_DICT__[self.main_lang],
             }
-            return json.dumps(data_to_dump)
         except ObjectDoesNotExist as e:
             logger.error(
                 "An error occured during get_json_to_index"
                 " for video %s: %s" % (self.id, e)
             )
-            return json.dumps({})
+            return {}
 
     def get_json_to_video_view(video, other_data_to_dump) -> str:
         try:
@@ -1417,10 +1490,12 @@ class Video(models.Model):
 
     def get_dublin_core(self) -> dict:
         """Export Dublin Core items for current video."""
-        contributors = []
         current_site = Site.objects.get_current()
-        for contrib in self.contributor_set.values_list("name", "role"):
-            contributors.append(" ".join(contrib))
+        # read from the prefetched objects if any, see prefetch_videos_to_export
+        contributors = [
+            " ".join((contrib.name, contrib.role))
+            for contrib in self.contributor_set.all()
+        ]
         try:
             data_to_dump = {
                 "dc.title": "%s" % escape(self.title),
@@ -1430,9 +1505,9 @@ class Video(models.Model):
                 % (
                     self.type.title,
                     ", ".join(
-                        self.discipline.all()
-                        .filter(site=current_site)
-                        .values_list("title", flat=True)
+                        discipline.title
+                        for discipline in self.discipline.all()
+                        if discipline.site_id == current_site.id
                     ),
                 ),
                 "dc.publisher": __TITLE_ETB__,
@@ -1569,6 +1644,43 @@ class ViewCount(models.Model):
         verbose_name_plural = _("View counts")
 
 
+class StatsRollup(models.Model):
+    """Totals of views and playlist additions of a video, channel or theme."""
+
+    ENTITY_CHOICES = (
+        ("video", _("Video")),
+        ("channel", _("Channel")),
+        ("theme", _("Theme")),
+    )
+    PERIOD_CHOICES = (
+        ("day", _("Day")),
+        ("month", _("Month")),
+        ("year", _("Year")),
+        ("all", _("Since creation")),
+    )
+    entity = models.CharField(
+        _("Entity"), max_length=10, choices=ENTITY_CHOICES, editable=False
+    )
+    entity_id = models.IntegerField(_("Entity id"), editable=False)
+    period = models.CharField(
+        _("Period"), max_length=5, choices=PERIOD_CHOICES, editable=False
+    )
+    # first day of the period
+    date = models.DateField(_("Date"), editable=False)
+    views = models.IntegerField(_("Number of view"), default=0, editable=False)
+    playlist = models.IntegerField(
+        _("Number of playlist additions"), default=0, editable=False
+    )
+    favorites = models.IntegerField(
+        _("Number of favorite additions"), default=0, editable=False
+    )
+
+    class Meta:
+        unique_together = ("entity", "entity_id", "period", "date")
+        verbose_name = _("Statistics rollup")
+        verbose_name_plural = _("Statistics rollups")
+
+
 class UserMarkerTime(models.Model):
     """Record the time of video played by a user."""
 
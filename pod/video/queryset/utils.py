@@ -1,6 +1,7 @@
 from django.db.models import Prefetch
 from pod.video.models import Video
 from pod.completion.models import Track
+from pod.video_encode_transcript.models import EncodingVideo
 
 
 def prefetch_video_completion_hyperlink(slug: str, user, sites):
@@ -20,3 +21,41 @@ def prefetch_video_completion_hyperlink(slug: str, user, sites):
     return Video.objects.prefetch_related(
         Prefetch("contributor_set", to_attr="list_contributor")
     )
+
+
+def prefetch_videos_to_index(videos):
+    """Prefetch the related objects used by Video.get_data_to_index."""
+    return videos.select_related("owner", "type", "thumbnail").prefetch_related(
+        "tags",
+        "discipline",
+        "channel",
+        "theme",
+        "contributor_set",
+        "chapter_set",
+        "overlay_set",
+    )
+
+
+def prefetch_videos_to_serialize(videos):
+    """Prefetch the related objects used by the video REST serializers."""
+    return (
+        prefetch_videos_to_index(videos)
+        .select_related("encodingstep", "videoversion")
+        .prefetch_related(
+            Prefetch(
+                "encodingvideo_set",
+                queryset=EncodingVideo.objects.select_related("rendition"),
+            ),
+            "encodingaudio_set",
+            "additional_owners",
+            "restrict_access_to_groups",
+            "sites",
+        )
+    )
+
+
+def prefetch_videos_to_export(videos):
+    """Prefetch the related objects used by Video.get_dublin_core."""
+    return videos.select_related("owner", "type").prefetch_related(
+        "discipline", "contributor_set"
+    )
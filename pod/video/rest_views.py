@@ -4,18 +4,28 @@ from rest_framework import serializers, viewsets, renderers
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.decorators import action
+from rest_framework.exceptions import ParseError
+from rest_framework.pagination import CursorPagination, PageNumberPagination
 
-from django.template.loader import render_to_string
+from datetime import datetime, timezone
+
+from django.http import HttpResponseNotModified
+from django.http import StreamingHttpResponse
+from django.http.response import HttpResponseBase
+from django.template.loader import get_template
+from django.utils.http import parse_http_date_safe
 
 from .models import Channel, Theme, Type, Discipline, Video, ViewCount
+from .models import ENCODED_VIDEO_FILTER
 from .context_processors import get_available_videos
+from .utils import CachedCountPaginator, decode_cursor, encode_cursor
+from .utils import filter_after_cursor, get_keyset_list
+from .queryset.utils import prefetch_videos_to_export, prefetch_videos_to_serialize
 from pod.main.utils import remove_trailing_spaces
 
 # commented for v3
 # from .remote_encode import start_store_remote_encoding_video
 
-import json
-
 # Serializers define the API representation.
 
 
@@ -100,6 +110,9 @@ class VideoSerializer(serializers.HyperlinkedModelSerializer):
             "get_encoding_step",
             "get_version",
             "encoded",
+            "has_mp4",
+            "has_hls",
+            "has_audio",
             "duration_in_time",
         )
         read_only_fields = (
@@ -108,6 +121,9 @@ class VideoSerializer(serializers.HyperlinkedModelSerializer):
             "get_encoding_step",
             "get_version",
             "encoded",
+            "has_mp4",
+            "has_hls",
+            "has_audio",
             "duration_in_time",
         )
 
@@ -116,24 +132,16 @@ class VideoUserSerializer(serializers.ModelSerializer):
     def to_representation(self, instance):
         data = super(VideoUserSerializer, self).to_representation(instance)
         request = self.context["request"]
-        video_data = json.loads(instance.get_json_to_index())
+        # built from the related objects prefetched by VideoViewSet.get_queryset
+        video_data = instance.get_data_to_index()
         video_data.update({"encoded": instance.encoded})
         video_data.update({"encoding_in_progress": instance.encoding_in_progress})
         video_data.update({"get_encoding_step": instance.get_encoding_step})
         video_data.update({"get_thumbnail_admin": instance.get_thumbnail_admin})
-        video_data.update(
-            {
-                "video_files": (
-                    instance.get_audio_and_video_json(
-                        request.GET.get("extensions", default=None)
-                    )
-                    if instance.get_audio_and_video_json(
-                        request.GET.get("extensions", default=None)
-                    )
-                    else ""
-                )
-            }
+        video_files = instance.get_audio_and_video_json(
+            request.GET.get("extensions", default=None)
         )
+        video_data.update({"video_files": video_files if video_files else ""})
         data["video_data"] = video_data
         return data
 
@@ -195,7 +203,26 @@ class DisciplineViewSet(viewsets.ModelViewSet):
     serializer_class = DisciplineSerializer
 
 
+class VideoPagination(PageNumberPagination):
+    """Page number pagination of the videos, with their count cached."""
+
+    django_paginator_class = CachedCountPaginator
+
+
+class VideoCursorPagination(CursorPagination):
+    """Keyset pagination of the videos, from the most recent."""
+
+    ordering = ("-date_added", "-id")
+
+
 class VideoViewSet(viewsets.ModelViewSet):
+    """
+    API endpoint of the videos.
+
+    The videos are paginated by page number, or by keyset with the cursor
+    parameter: start with `?cursor=` then follow the next links.
+    """
+
     queryset = Video.objects.all()
     serializer_class = VideoSerializer
     filterset_fields = [
@@ -205,18 +232,34 @@ class VideoViewSet(viewsets.ModelViewSet):
         "is_draft",
         "is_restricted",
         "encoding_in_progress",
+        "has_mp4",
+        "has_hls",
+        "has_audio",
         "sites",
     ]
 
+    def get_queryset(self):
+        """Get the videos with their related objects, prefetched for a whole page."""
+        return prefetch_videos_to_serialize(super().get_queryset())
+
+    @property
+    def paginator(self):
+        """Get the pagination of the videos asked by the request."""
+        if not hasattr(self, "_paginator"):
+            request = getattr(self, "request", None)
+            if request is not None and "cursor" in request.query_params:
+                self._paginator = VideoCursorPagination()
+            else:
+                self._paginator = VideoPagination()
+        return self._paginator
+
     @action(detail=False, methods=["get"])
     def user_videos(self, request):
         user_videos = self.filter_queryset(self.get_queryset()).filter(
             owner__username=request.GET.get("username")
         )
         if request.GET.get("encoded") and request.GET.get("encoded") == "true":
-            user_videos = user_videos.exclude(
-                pk__in=[vid.id for vid in user_videos if not vid.encoded]
-            )
+            user_videos = user_videos.filter(ENCODED_VIDEO_FILTER)
         if request.GET.get("search_title") and request.GET.get("search_title") != "":
             user_videos = user_videos.filter(
                 title__icontains=request.GET.get("search_title")
@@ -256,34 +299,86 @@ class XmlTextRenderer(renderers.BaseRenderer):
 
 
 class DublinCoreView(APIView):
+    """
+    Export the available videos in Dublin Core, streamed by chunk of videos.
+
+    With page_size, the videos are exported by page, in modification order, and
+    the next page is given by the Link header, with a resumption_token.
+    With If-Modified-Since, only the videos modified since are exported.
+    """
+
     # authentication_classes = [authentication.TokenAuthentication]
     renderer_classes = (XmlTextRenderer,)
-    pagination_class = "rest_framework.pagination.PageNumberPagination"
-    page_size = 12
     page_size_query_param = "page_size"
+    resumption_token_query_param = "resumption_token"
     max_page_size = 1000
-
-    def get(self, request, format=None) -> Response:
-        list_videos = get_available_videos(request)
-        if request.GET:
-            list_videos = list_videos.filter(**request.GET.dict())
-        xmlcontent = '<?xml version="1.0" encoding="utf-8"?>\n'
-        xmlcontent += (
-            "<!DOCTYPE rdf:RDF PUBLIC " '"-//DUBLIN CORE//DCMES DTD 2002/07/31//EN" \n'
+    chunk_size = 100
+
+    def get(self, request, format=None) -> HttpResponseBase:
+        params = request.GET.dict()
+        page_size = self.get_page_size(params.pop(self.page_size_query_param, None))
+        resumption_token = params.pop(self.resumption_token_query_param, None)
+        list_videos = get_keyset_list(
+            get_available_videos(request).defer(None), "date_modified", "asc"
+        )
+        if params:
+            list_videos = list_videos.filter(**params)
+        modified_since = parse_http_date_safe(request.headers.get("If-Modified-Since"))
+        if modified_since is not None:
+            list_videos = list_videos.filter(
+                date_modified__gte=datetime.fromtimestamp(modified_since, timezone.utc)
+            )
+            if not list_videos.exists():
+                return HttpResponseNotModified()
+        if resumption_token:
+            position = decode_cursor(resumption_token, "date_modified")
+            if position is None:
+                raise ParseError("Invalid resumption token")
+            list_videos = filter_after_cursor(list_videos, position, "asc")
+        next_url = None
+        if page_size:
+            next_url = self.get_next_url(request, list_videos, page_size)
+            list_videos = list_videos[:page_size]
+        response = StreamingHttpResponse(
+            self.stream_videos(prefetch_videos_to_export(list_videos)),
+            content_type="text/xml; charset=utf-8",
         )
-        xmlcontent += (
+        if next_url:
+            response["Link"] = '<%s>; rel="next"' % next_url
+        return response
+
+    def get_page_size(self, page_size):
+        """Get the number of videos by page, None to export all of them."""
+        if page_size is None:
+            return None
+        try:
+            return min(max(int(page_size), 1), self.max_page_size)
+        except ValueError:
+            raise ParseError("Invalid page size")
+
+    def get_next_url(self, request, list_videos, page_size):
+        """Get the url of the page following the page_size first videos, if any."""
+        last_videos = list(list_videos.only("id")[page_size - 1 : page_size + 1])
+        if len(last_videos) < 2:
+            return None
+        query = request.GET.copy()
+        query[self.resumption_token_query_param] = encode_cursor(last_videos[0])
+        return request.build_absolute_uri("?" + query.urlencode())
+
+    def stream_videos(self, list_videos):
+        """Yield the Dublin Core document, rendered video by video."""
+        yield '<?xml version="1.0" encoding="utf-8"?>\n'
+        yield "<!DOCTYPE rdf:RDF PUBLIC " '"-//DUBLIN CORE//DCMES DTD 2002/07/31//EN" \n'
+        yield (
             '"http://dublincore.org/documents/2002/07'
             '/31/dcmes-xml/dcmes-xml-dtd.dtd">\n'
         )
-        xmlcontent += (
+        yield (
             "<rdf:RDF xmlns:rdf="
             '"http://www.w3.org/1999/02/22-rdf-syntax-ns#"'
             ' xmlns:dc ="http://purl.org/dc/elements/1.1/">\n'
         )
-        for video in list_videos:
-            rendered = render_to_string(
-                "videos/dublincore.html", {"video": video, "xml": True}, request
-            )
-            xmlcontent += remove_trailing_spaces(rendered)
-        xmlcontent += "</rdf:RDF>"
-        return Response(xmlcontent)
+        template = get_template("videos/dublincore.html")
+        for video in list_videos.iterator(chunk_size=self.chunk_size):
+            yield remove_trailing_spaces(template.render({"video": video, "xml": True}))
+        yield "</rdf:RDF>"
@@ -0,0 +1,155 @@
+"""Esup-Pod video signals."""
+
+import threading
+
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .context_processors import clear_video_data
+from .models import Category, Channel, CustomImageModel, Discipline, Theme, Type, Video
+from .models import StatsRollup
+from .stats_rollup import USE_STATS_ROLLUP, move_video_stats
+from .utils import clear_videos_count
+
+
+def update_relation_stats(entity, instance, action, reverse, pk_set) -> None:
+    """Move the statistics totals of videos added to or removed from channels or themes."""
+    if action == "pre_clear":
+        # the related objects are removed, but not given in pk_set
+        related = getattr(instance, "video_set" if reverse else entity)
+        pk_set = set(related.values_list("id", flat=True))
+    elif action not in ("post_add", "post_remove"):
+        return
+    sign = 1 if action == "post_add" else -1
+    if reverse:
+        for video_id in pk_set:
+            move_video_stats(video_id, entity, [instance.id], sign)
+    else:
+        move_video_stats(instance.id, entity, pk_set, sign)
+
+
+@receiver(m2m_changed, sender=Video.channel.through)
+def update_channel_stats(sender, instance, action, reverse, model, pk_set, **kwargs):
+    """Update the statistics totals of the channels of a video."""
+    if USE_STATS_ROLLUP:
+        update_relation_stats("channel", instance, action, reverse, pk_set)
+
+
+@receiver(m2m_changed, sender=Video.theme.through)
+def update_theme_stats(sender, instance, action, reverse, model, pk_set, **kwargs):
+    """Update the statistics totals of the themes of a video."""
+    if USE_STATS_ROLLUP:
+        update_relation_stats("theme", instance, action, reverse, pk_set)
+
+
+@receiver(pre_delete, sender=Video)
+def remove_video_stats(sender, instance, **kwargs):
+    """Remove the statistics totals of a deleted video."""
+    if USE_STATS_ROLLUP:
+        channel_ids = list(instance.channel.values_list("id", flat=True))
+        move_video_stats(instance.id, "channel", channel_ids, -1)
+        theme_ids = list(instance.theme.values_list("id", flat=True))
+        move_video_stats(instance.id, "theme", theme_ids, -1)
+        StatsRollup.objects.filter(entity="video", entity_id=instance.id).delete()
+
+
+@receiver(pre_delete, sender=Channel)
+@receiver(pre_delete, sender=Theme)
+def remove_entity_stats(sender, instance, **kwargs):
+    """Remove the statistics totals of a deleted channel or theme."""
+    if USE_STATS_ROLLUP:
+        entity = "channel" if sender is Channel else "theme"
+        StatsRollup.objects.filter(entity=entity, entity_id=instance.id).delete()
+
+
+@receiver(post_save, sender=Video)
+@receiver(post_delete, sender=Video)
+def expire_videos_count(sender, instance, **kwargs):
+    """Expire the cached counts of videos when a video changes."""
+    clear_videos_count()
+
+
+def update_thumbnail_urls(video_ids) -> None:
+    """Generate the sizes of the thumbnails of the videos."""
+    for video in Video.objects.filter(id__in=video_ids).select_related("thumbnail"):
+        video.update_thumbnail_urls()
+
+
+def start_update_thumbnail_urls(video_ids) -> None:
+    """Start update_thumbnail_urls as daemon thread, once the changes are saved."""
+
+    def start():
+        t = threading.Thread(target=update_thumbnail_urls, args=[video_ids])
+        t.daemon = True
+        t.start()
+
+    if video_ids:
+        transaction.on_commit(start)
+
+
+@receiver(post_save, sender=Video)
+def generate_video_thumbnail(sender, instance, **kwargs):
+    """Generate the sizes of the thumbnail of a video when it changes."""
+    if instance.thumbnail_urls.get("thumbnail_id") != instance.thumbnail_id:
+        start_update_thumbnail_urls([instance.id])
+
+
+@receiver(post_save, sender=CustomImageModel)
+def generate_image_thumbnails(sender, instance, created, **kwargs):
+    """Generate the sizes of the thumbnails again when their image changes."""
+    if not created:
+        start_update_thumbnail_urls(
+            list(Video.objects.filter(thumbnail=instance).values_list("id", flat=True))
+        )
+
+
+@receiver(post_save, sender=Video)
+@receiver(post_delete, sender=Video)
+@receiver(m2m_changed, sender=Video.sites.through)
+def expire_video_data(sender, **kwargs):
+    """Mark the cached video data as stale when a video changes."""
+    clear_video_data("TYPES", "DISCIPLINES", "TAGS", "VIDEOS_COUNT")
+
+
+@receiver(post_save, sender=Type)
+@receiver(post_delete, sender=Type)
+@receiver(m2m_changed, sender=Type.sites.through)
+def expire_types_data(sender, **kwargs):
+    """Mark the cached video types as stale when a type changes."""
+    clear_video_data("TYPES")
+
+
+@receiver(post_save, sender=Discipline)
+@receiver(post_delete, sender=Discipline)
+@receiver(m2m_changed, sender=Video.discipline.through)
+def expire_disciplines_data(sender, **kwargs):
+    """Mark the cached video disciplines as stale when a discipline changes."""
+    clear_video_data("DISCIPLINES")
+
+
+@receiver(post_save, sender=Video.tags.tag_model)
+@receiver(post_delete, sender=Video.tags.tag_model)
+def expire_tags_data(sender, **kwargs):
+    """Mark the cached tag cloud as stale when a tag changes."""
+    clear_video_data("TAGS")
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def expire_category_data(sender, instance, **kwargs):
+    """Mark the cached categories of a user as stale when one of them changes."""
+    clear_video_data("CATEGORY", scope=instance.owner_id)
+
+
+@receiver(m2m_changed, sender=Category.video.through)
+def expire_category_videos_data(sender, instance, reverse, pk_set, **kwargs):
+    """Mark the cached categories of users as stale when their videos change."""
+    if not reverse:
+        clear_video_data("CATEGORY", scope=instance.owner_id)
+        return
+    categories = Category.objects.filter(video=instance)
+    if pk_set:
+        categories = Category.objects.filter(id__in=pk_set)
+    for owner_id in set(categories.values_list("owner_id", flat=True)):
+        clear_video_data("CATEGORY", scope=owner_id)
@@ -69,7 +69,8 @@ function refreshInfiniteLoader(url, nextPage) {
     url,
     onBeforePageLoad,
     onAfterPageLoad,
-    (page = nextPage),
+    true,
+    nextPage,
   );
 }
 
@@ -279,7 +280,7 @@ infinite = new InfiniteLoader(
   onBeforePageLoad,
   onAfterPageLoad,
   nextPage,
-  (page = 2),
+  page,
 );
 
 // Check and clean url to avoid owner parameter if not authorized
@@ -0,0 +1,247 @@
+"""
+Esup-Pod statistics rollups.
+
+With USE_STATS_ROLLUP, the views and playlist additions of the videos are
+added to the totals of the day, month, year and since creation of the video,
+its channels and its themes, so the statistics are read without aggregate.
+The views are added by batch, when the view counts buffer is saved.
+The rebuild_stats_rollup command computes them again from the views and the
+playlists contents.
+"""
+
+from datetime import date
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import StatsRollup, Video, ViewCount
+
+USE_STATS_ROLLUP = getattr(settings, "USE_STATS_ROLLUP", False)
+
+# date of the totals since creation
+ROLLUP_ALL_DATE = date(1970, 1, 1)
+ROLLUP_BATCH_SIZE = 1000
+
+# keys of the statistics of each period, for views, playlist and favorites
+STATS_KEYS = {
+    "day": ("day", "playlist_day", "fav_day"),
+    "month": ("month", "playlist_month", "fav_month"),
+    "year": ("year", "playlist_year", "fav_year"),
+    "all": ("since_created", "playlist_since_created", "fav_since_created"),
+}
+
+
+def get_period_dates(day) -> list:
+    """Get the periods including a day, with their first day."""
+    return [
+        ("day", day),
+        ("month", day.replace(day=1)),
+        ("year", day.replace(month=1, day=1)),
+        ("all", ROLLUP_ALL_DATE),
+    ]
+
+
+def get_videos_entities(video_ids) -> dict:
+    """Get the video, its channels and its themes, for each video."""
+    entities = {video_id: [("video", video_id)] for video_id in video_ids}
+    for video_id, channel_id in Video.channel.through.objects.filter(
+        video_id__in=video_ids
+    ).values_list("video_id", "channel_id"):
+        entities[video_id].append(("channel", channel_id))
+    for video_id, theme_id in Video.theme.through.objects.filter(
+        video_id__in=video_ids
+    ).values_list("video_id", "theme_id"):
+        entities[video_id].append(("theme", theme_id))
+    return entities
+
+
+def get_video_entities(video_id) -> list:
+    """Get the video, its channels and its themes."""
+    return get_videos_entities([video_id])[video_id]
+
+
+def add_to_rollup(entity, entity_id, period, day, views=0, playlist=0, favorites=0):
+    """Add views and playlist additions to a total."""
+    rollup = StatsRollup.objects.filter(
+        entity=entity, entity_id=entity_id, period=period, date=day
+    )
+    values = {
+        "views": F("views") + views,
+        "playlist": F("playlist") + playlist,
+        "favorites": F("favorites") + favorites,
+    }
+    if rollup.update(**values):
+        return
+    try:
+        with transaction.atomic():
+            StatsRollup.objects.create(
+                entity=entity,
+                entity_id=entity_id,
+                period=period,
+                date=day,
+                views=views,
+                playlist=playlist,
+                favorites=favorites,
+            )
+    except IntegrityError:
+        rollup.update(**values)
+
+
+def add_video_stats(video_id, day, views=0, playlist=0, favorites=0) -> None:
+    """Add views and playlist additions of a video on a day to its totals."""
+    if not USE_STATS_ROLLUP:
+        return
+    with transaction.atomic():
+        for entity, entity_id in get_video_entities(video_id):
+            for period, period_date in get_period_dates(day):
+                add_to_rollup(
+                    entity, entity_id, period, period_date, views, playlist, favorites
+                )
+
+
+def add_views_stats(counts) -> None:
+    """
+    Add the views of videos to their totals, from {(video_id, day): views}.
+
+    The views are summed by total first, so a total shared by several videos,
+    as the one of a channel, is written once.
+    """
+    if not USE_STATS_ROLLUP or not counts:
+        return
+    entities = get_videos_entities(set(video_id for video_id, day in counts))
+    totals = {}
+    for (video_id, day), views in counts.items():
+        for entity, entity_id in entities[video_id]:
+            for period, period_date in get_period_dates(day):
+                key = (entity, entity_id, period, period_date)
+                totals[key] = totals.get(key, 0) + views
+    with transaction.atomic():
+        # always in the same order, to avoid deadlocks between flushes
+        for (entity, entity_id, period, period_date), views in sorted(totals.items()):
+            add_to_rollup(entity, entity_id, period, period_date, views=views)
+
+
+def add_playlist_content_stats(playlist_content, sign=1) -> None:
+    """Add (or remove with sign=-1) a playlist addition to the totals."""
+    from pod.playlist.apps import FAVORITE_PLAYLIST_NAME
+
+    if not USE_STATS_ROLLUP:
+        return
+    is_favorite = playlist_content.playlist.name == FAVORITE_PLAYLIST_NAME
+    add_video_stats(
+        playlist_content.video_id,
+        timezone.localdate(playlist_content.date_added),
+        playlist=sign,
+        favorites=sign if is_favorite else 0,
+    )
+
+
+def move_video_stats(video_id, entity, entity_ids, sign=1) -> None:
+    """Add (or remove with sign=-1) the totals of a video to its channels or themes."""
+    if not USE_STATS_ROLLUP:
+        return
+    rollups = StatsRollup.objects.filter(entity="video", entity_id=video_id)
+    with transaction.atomic():
+        for rollup in rollups:
+            for entity_id in entity_ids:
+                add_to_rollup(
+                    entity,
+                    entity_id,
+                    rollup.period,
+                    rollup.date,
+                    sign * rollup.views,
+                    sign * rollup.playlist,
+                    sign * rollup.favorites,
+                )
+
+
+def get_stats_rollup(entity, entity_ids, date_filter) -> dict:
+    """Get the statistics of the entities for the periods including date_filter."""
+    stats = {
+        entity_id: {key: 0 for keys in STATS_KEYS.values() for key in keys}
+        for entity_id in entity_ids
+    }
+    periods = Q()
+    for period, period_date in get_period_dates(date_filter):
+        periods |= Q(period=period, date=period_date)
+    rollups = StatsRollup.objects.filter(
+        periods, entity=entity, entity_id__in=entity_ids
+    ).values_list("entity_id", "period", "views", "playlist", "favorites")
+    for entity_id, period, views, playlist, favorites in rollups:
+        views_key, playlist_key, favorites_key = STATS_KEYS[period]
+        stats[entity_id][views_key] = views
+        stats[entity_id][playlist_key] = playlist
+        stats[entity_id][favorites_key] = favorites
+    return stats
+
+
+def get_video_totals() -> dict:
+    """Get the totals of each video, by period, from the views and playlists."""
+    from pod.playlist.apps import FAVORITE_PLAYLIST_NAME
+    from pod.playlist.models import PlaylistContent
+
+    totals = {}
+
+    def add_total(video_id, day, index, value):
+        for period, period_date in get_period_dates(day):
+            total = totals.setdefault((video_id, period, period_date), [0, 0, 0])
+            total[index] += value
+
+    for video_id, day, count in ViewCount.objects.values_list(
+        "video_id", "date", "count"
+    ).iterator():
+        add_total(video_id, day, 0, count)
+    for video_id, date_added, name in PlaylistContent.objects.values_list(
+        "video_id", "date_added", "playlist__name"
+    ).iterator():
+        add_total(video_id, timezone.localdate(date_added), 1, 1)
+        if name == FAVORITE_PLAYLIST_NAME:
+            add_total(video_id, timezone.localdate(date_added), 2, 1)
+    return totals
+
+
+def get_video_relations(through, field) -> dict:
+    """Get the ids related to each video by a many to many table."""
+    relations = {}
+    for video_id, related_id in through.objects.values_list("video_id", field):
+        relations.setdefault(video_id, []).append(related_id)
+    return relations
+
+
+def rebuild_stats_rollup() -> int:
+    """Compute all the totals again, return the number of totals."""
+    totals = get_video_totals()
+    entities = {
+        "video": {video_id: [video_id] for video_id, period, day in totals},
+        "channel": get_video_relations(Video.channel.through, "channel_id"),
+        "theme": get_video_relations(Video.theme.through, "theme_id"),
+    }
+    rollups = {}
+    for (video_id, period, period_date), values in totals.items():
+        for entity, relations in entities.items():
+            for entity_id in relations.get(video_id, []):
+                rollup = rollups.setdefault(
+                    (entity, entity_id, period, period_date), [0, 0, 0]
+                )
+                for index, value in enumerate(values):
+                    rollup[index] += value
+    with transaction.atomic():
+        StatsRollup.objects.all().delete()
+        StatsRollup.objects.bulk_create(
+            [
+                StatsRollup(
+                    entity=entity,
+                    entity_id=entity_id,
+                    period=period,
+                    date=period_date,
+                    views=values[0],
+                    playlist=values[1],
+                    favorites=values[2],
+                )
+                for (entity, entity_id, period, period_date), values in rollups.items()
+            ],
+            batch_size=ROLLUP_BATCH_SIZE,
+        )
+    return len(rollups)
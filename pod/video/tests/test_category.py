@@ -283,7 +283,7 @@ class TestCategory(TestCase):
         all_categories_videos = json.loads(response_data["all_categories_videos"])
 
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(response_data["videos"].paginator.count, 1)
+        self.assertEqual(response_data["count_videos"], 1)
         self.assertEqual(response_data["categories"].count(), 2)
         self.assertEqual(len(all_categories_videos[self.cat_1.slug]), 1)
         self.assertEqual(all_categories_videos[self.cat_1.slug][0], self.video.slug)
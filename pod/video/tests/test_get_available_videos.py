@@ -1,11 +1,16 @@
 """Video Models test cases."""
 
+from unittest import mock
+
+from django.core.cache import cache
 from django.test import TestCase
 from django.contrib.auth.models import User
+from ..apps import set_media_flags
 from ..models import Video, Type
 
 from ..context_processors import __AVAILABLE_VIDEO_FILTER__
 from ..context_processors import get_available_videos
+from ..context_processors import get_video_data, get_videos_stats
 
 from pod.video_encode_transcript.models import EncodingVideo
 from pod.video_encode_transcript.models import PlaylistVideo
@@ -116,3 +121,65 @@ class VideoAvailableTestCase(TestCase):
         plvid1.delete()
         vids = get_available_videos()
         self.assertEqual(vids.count(), 1)
+
+    def test_video_media_flags(self):
+        """Test the media flags of the videos, set from their encodings."""
+        vid1 = Video.objects.get(id=1)
+        self.assertFalse(vid1.encoded)
+        # an outdated instance does not overwrite the flags
+        outdated_vid1 = Video.objects.get(id=1)
+        EncodingVideo.objects.create(
+            video=Video.objects.get(id=1),
+            encoding_format="video/mp4",
+            rendition=VideoRendition.objects.get(id=1),
+        )
+        outdated_vid1.title = "Video1 title"
+        outdated_vid1.save()
+        vid1 = Video.objects.get(id=1)
+        self.assertTrue(vid1.has_mp4)
+        self.assertFalse(vid1.has_hls)
+        self.assertTrue(vid1.encoded)
+        self.assertEqual(vid1.title, "Video1 title")
+        EncodingAudio.objects.create(
+            video=vid1, name="audio", encoding_format="video/mp4"
+        )
+        self.assertTrue(vid1.has_audio)
+        vid1.encodingvideo_set.all().delete()
+        vid1.refresh_from_db()
+        self.assertFalse(vid1.has_mp4)
+        self.assertTrue(vid1.encoded)
+        # flags set again from the encodings, after a migration
+        Video.objects.update(has_audio=False)
+        set_media_flags(None)
+        self.assertEqual(
+            list(Video.objects.filter(has_audio=True).values_list("id", flat=True)), [1]
+        )
+        print(" --->  test_video_media_flags of VideoAvailableTestCase: OK!")
+
+    def test_get_video_data(self):
+        """Test the cached video data, computed again in background when stale."""
+        cache.clear()
+        self.assertEqual(get_video_data("VIDEOS_COUNT", get_videos_stats, None), (0, "0"))
+        vid1 = Video.objects.get(id=1)
+        vid1.is_draft = False
+        vid1.duration = 60
+        vid1.save()
+        EncodingVideo.objects.create(
+            video=vid1,
+            encoding_format="video/mp4",
+            rendition=VideoRendition.objects.get(id=1),
+        )
+        with mock.patch("pod.video.context_processors.threading.Thread") as mock_thread:
+            # the stale data is returned while a single refresh is started
+            for i in range(2):
+                self.assertEqual(
+                    get_video_data("VIDEOS_COUNT", get_videos_stats, None), (0, "0")
+                )
+            mock_thread.assert_called_once()
+        refresh = mock_thread.call_args.kwargs["target"]
+        with mock.patch("pod.video.context_processors.connection"):
+            refresh(*mock_thread.call_args.kwargs["args"])
+        self.assertEqual(
+            get_video_data("VIDEOS_COUNT", get_videos_stats, None), (1, "0:01:00")
+        )
+        print(" --->  test_get_video_data of VideoAvailableTestCase: OK!")
@@ -21,6 +21,7 @@ from ..models import get_storage_path_video
 from ..models import VIDEOS_DIR
 from ..models import Notes, AdvancedNotes
 from ..models import UserMarkerTime, VideoAccessToken
+from ..queryset.utils import prefetch_videos_to_serialize
 
 from pod.video_encode_transcript.models import VideoRendition, PlaylistVideo
 from pod.video_encode_transcript.models import EncodingVideo, EncodingAudio
@@ -30,6 +31,7 @@ from datetime import datetime, timedelta
 
 import os
 import uuid
+from unittest import mock
 
 if getattr(settings, "USE_PODFILE", False):
     __FILEPICKER__ = True
@@ -418,6 +420,56 @@ class VideoTestCase(TestCase):
 
         print("   --->  test_get_dublin_core of Video: OK!")
 
+    def test_get_data_to_index(self) -> None:
+        """Check that the data of prefetched videos are read without query."""
+        EncodingAudio.objects.create(
+            video=Video.objects.get(id=1),
+            name="audio",
+            encoding_format="video/mp4",
+            source_file="audio.mp4",
+        )
+        expected = {
+            video.id: (video.get_data_to_index(), video.get_audio_and_video_json(None))
+            for video in Video.objects.all()
+        }
+        videos = list(prefetch_videos_to_serialize(Video.objects.all()))
+        with self.assertNumQueries(0):
+            for video in videos:
+                self.assertEqual(video.get_data_to_index(), expected[video.id][0])
+                self.assertEqual(
+                    video.get_audio_and_video_json(None), expected[video.id][1]
+                )
+                self.assertEqual(video.get_encoding_step, "")
+        self.assertEqual(len(expected[1][1]["mp4"]), 1)
+        print("   --->  test_get_data_to_index of Video: OK!")
+
+    def test_update_thumbnail_urls(self) -> None:
+        """Check that the pre-generated thumbnail urls are used."""
+        video = Video.objects.get(title="Video2")
+        # the thumbnail file does not exist, the default thumbnail is used
+        video.update_thumbnail_urls()
+        video = Video.objects.get(id=video.id)
+        # no size generated, they will be generated again at the next change
+        self.assertEqual(video.thumbnail_urls, {})
+        video.thumbnail_urls = {
+            "thumbnail_id": video.thumbnail_id,
+            "x170": "/media/thumbnail_x170.png",
+        }
+        with mock.patch.object(CustomImageModel, "file_exist") as mock_file_exist:
+            self.assertIn("/media/thumbnail_x170.png", video.get_thumbnail_card())
+            mock_file_exist.assert_not_called()
+        # a size not generated is read from the thumbnail file
+        with mock.patch.object(
+            CustomImageModel, "file_exist", return_value=False
+        ) as mock_file_exist:
+            self.assertIn("img/default.svg", video.get_thumbnail_admin)
+            mock_file_exist.assert_called_once()
+        # the urls are not written by a full save of the video
+        video.title = "Video2 title"
+        video.save()
+        self.assertEqual(Video.objects.get(id=video.id).thumbnail_urls, {})
+        print("   --->  test_update_thumbnail_urls of Video: OK!")
+
     def test_video_additional_owners_rights(self) -> None:
         """Check that additional owners have the correct rights."""
         # Create 2nd and 3rd staff users
@@ -523,10 +575,8 @@ class VideoRenditionTestCase(TestCase):
             "VideoRendition num %s with resolution %s" % ("%04d" % vr.id, vr.resolution),
         )
         vr.clean()
-        print(
-            " --->  test_VideoRendition_creation_by_default of \
-            VideoRenditionTestCase: OK!"
-        )
+        print(" --->  test_VideoRendition_creation_by_default of \
+            VideoRenditionTestCase: OK!")
 
     def test_VideoRendition_creation_with_values(self) -> None:
         # print("check resolution error")
@@ -574,10 +624,8 @@ class VideoRenditionTestCase(TestCase):
             "VideoRendition num %s with resolution %s" % ("%04d" % vr.id, vr.resolution),
         )
         self.assertRaises(ValidationError, vr.clean)
-        print(
-            " --->  test_VideoRendition_creation_with_values of \
-            VideoRenditionTestCase: OK!"
-        )
+        print(" --->  test_VideoRendition_creation_with_values of \
+            VideoRenditionTestCase: OK!")
 
     def test_delete_object(self) -> None:
         self.create_video_rendition(resolution="640x365")
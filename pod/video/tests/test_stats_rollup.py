@@ -0,0 +1,86 @@
+"""Unit tests for the statistics rollups.
+
+*  run with 'python manage.py test pod.video.tests.test_stats_rollup'
+"""
+
+from datetime import date
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from pod.video import stats_rollup
+from pod.video.models import Channel, Type, Video, ViewCount
+
+DAY = date(2024, 3, 15)
+
+
+@patch.object(stats_rollup, "USE_STATS_ROLLUP", True)
+class StatsRollupTestCase(TestCase):
+    """Test the statistics totals of the videos and channels."""
+
+    fixtures = [
+        "initial_data.json",
+    ]
+
+    def setUp(self) -> None:
+        """Set up required objects for next tests."""
+        user = User.objects.create(username="pod", password="pod1234pod")
+        self.channel = Channel.objects.create(title="ChannelTest", visible=True)
+        self.video = Video.objects.create(
+            title="Video1",
+            owner=user,
+            video="test1.mp4",
+            type=Type.objects.get(id=1),
+        )
+        self.video.channel.set([self.channel])
+        ViewCount.objects.create(video=self.video, date=DAY, count=3)
+        ViewCount.objects.create(video=self.video, date=date(2024, 3, 1), count=2)
+        ViewCount.objects.create(video=self.video, date=date(2023, 3, 1), count=1)
+        print(" --->  SetUp of StatsRollupTestCase: OK!")
+
+    def test_rebuild_stats_rollup(self) -> None:
+        """Check the totals computed from the views."""
+        stats_rollup.rebuild_stats_rollup()
+        stats = stats_rollup.get_stats_rollup("video", [self.video.id], DAY)
+        self.assertEqual(stats[self.video.id]["day"], 3)
+        self.assertEqual(stats[self.video.id]["month"], 5)
+        self.assertEqual(stats[self.video.id]["year"], 5)
+        self.assertEqual(stats[self.video.id]["since_created"], 6)
+        self.assertEqual(stats[self.video.id]["playlist_day"], 0)
+        stats = stats_rollup.get_stats_rollup("channel", [self.channel.id], DAY)
+        self.assertEqual(stats[self.channel.id]["since_created"], 6)
+        print(" --->  test_rebuild_stats_rollup of StatsRollupTestCase: OK!")
+
+    def test_add_video_stats(self) -> None:
+        """Check that the totals are updated incrementally."""
+        stats_rollup.rebuild_stats_rollup()
+        stats_rollup.add_video_stats(self.video.id, DAY, views=2, playlist=1)
+        stats = stats_rollup.get_stats_rollup("video", [self.video.id], DAY)
+        self.assertEqual(stats[self.video.id]["day"], 5)
+        self.assertEqual(stats[self.video.id]["since_created"], 8)
+        self.assertEqual(stats[self.video.id]["playlist_month"], 1)
+        # the video is removed from its channel
+        stats_rollup.move_video_stats(self.video.id, "channel", [self.channel.id], -1)
+        stats = stats_rollup.get_stats_rollup("channel", [self.channel.id], DAY)
+        self.assertEqual(stats[self.channel.id]["since_created"], 0)
+        print(" --->  test_add_video_stats of StatsRollupTestCase: OK!")
+
+    def test_add_views_stats(self) -> None:
+        """Check that the views of several videos are added to shared totals."""
+        other = Video.objects.create(
+            title="Video2",
+            owner=self.video.owner,
+            video="test2.mp4",
+            type=Type.objects.get(id=1),
+        )
+        other.channel.set([self.channel])
+        stats_rollup.rebuild_stats_rollup()
+        stats_rollup.add_views_stats({(self.video.id, DAY): 2, (other.id, DAY): 4})
+        stats = stats_rollup.get_stats_rollup("video", [self.video.id, other.id], DAY)
+        self.assertEqual(stats[self.video.id]["day"], 5)
+        self.assertEqual(stats[other.id]["day"], 4)
+        stats = stats_rollup.get_stats_rollup("channel", [self.channel.id], DAY)
+        self.assertEqual(stats[self.channel.id]["day"], 9)
+        self.assertEqual(stats[self.channel.id]["since_created"], 12)
+        print(" --->  test_add_views_stats of StatsRollupTestCase: OK!")
@@ -7,6 +7,8 @@ from django.contrib.auth.models import User
 
 from pod.video.models import Channel, Theme, Video, Type
 from pod.video.utils import pagination_data, get_headband, change_owner, get_videos
+from pod.video.utils import get_keyset_list, get_videos_count, get_videos_page
+from pod.video.utils import sort_videos_list
 
 
 class VideoTestUtils(TestCase):
@@ -86,3 +88,50 @@ class VideoTestUtils(TestCase):
         actual = get_videos(self.v.title, self.user.id, search="not found")
         expected = {**expected, "count": 0, "page_infos": "0/0", "results": []}
         self.assertEqual(json.loads(actual.content.decode("utf-8")), expected)
+
+    def test_get_videos_page(self) -> None:
+        """Browse the videos by keyset and by page number."""
+        for index in range(6):
+            # the same title for some videos, sorted by id then
+            Video.objects.create(
+                title="Video%s" % (index // 2),
+                owner=self.user,
+                video="test.mp4",
+                type=Type.objects.get(id=1),
+            )
+        for sort_field, sort_direction in [
+            ("date_added", ""),
+            ("title", ""),
+            ("title", "asc"),
+            ("duration", "asc"),
+            ("theme", ""),
+        ]:
+            videos_list = sort_videos_list(
+                Video.objects.all(), sort_field, sort_direction
+            )
+            expected = [video.id for video in videos_list]
+            if sort_field != "theme":
+                # sorted by id too with the keyset pagination
+                expected = [
+                    video.id
+                    for video in get_keyset_list(videos_list, sort_field, sort_direction)
+                ]
+            browsed = []
+            page = get_videos_page(videos_list, 1, sort_field, sort_direction, 3)
+            while page.has_next():
+                browsed += [video.id for video in page]
+                page = get_videos_page(
+                    videos_list, page.next_page_number(), sort_field, sort_direction, 3
+                )
+            browsed += [video.id for video in page]
+            if sort_field != "theme":
+                self.assertEqual(browsed, expected)
+                # the cursors are only given for the keyset sort fields
+                self.assertTrue(str(page.next_page or "k").startswith("k"))
+            self.assertEqual(sorted(browsed), sorted(expected))
+        # an invalid cursor gives the first page
+        page = get_videos_page(Video.objects.all(), "kinvalid", "date_added", "", 3)
+        self.assertEqual(len(page), 3)
+        self.assertEqual(get_videos_count(Video.objects.all()), 7)
+        self.assertEqual(get_videos_count(Video.objects.filter(id__in=[])), 0)
+        print(" --->  test_get_videos_page of VideoTestUtils: OK!")
@@ -0,0 +1,107 @@
+"""Unit tests for the buffered view counter.
+
+*  run with 'python manage.py test pod.video.tests.test_viewcount'
+"""
+
+from datetime import date
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.test import TestCase
+
+from pod.video import stats_rollup, viewcount
+from pod.video.models import StatsRollup, Type, Video, ViewCount
+
+
+@patch.object(viewcount, "USE_VIEW_COUNT_BUFFER", True)
+class ViewCountBufferTestCase(TestCase):
+    """Test the buffered view counter with the in-memory buffer."""
+
+    fixtures = [
+        "initial_data.json",
+    ]
+
+    def setUp(self) -> None:
+        """Set up required objects for next tests."""
+        user = User.objects.create(username="pod", password="pod1234pod")
+        self.video = Video.objects.create(
+            title="Video1",
+            owner=user,
+            video="test1.mp4",
+            type=Type.objects.get(id=1),
+        )
+        ViewCount.objects.create(video=self.video, count=2)
+        self.buffer = viewcount.MemoryViewCountBuffer()
+        patcher = patch.object(viewcount, "__VIEW_COUNT_BUFFER__", self.buffer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        print(" --->  SetUp of ViewCountBufferTestCase: OK!")
+
+    def test_add_view_and_flush(self) -> None:
+        """Check that the views are counted before and after the flush."""
+        viewcount.add_view(self.video.id)
+        viewcount.add_view(self.video.id)
+        self.assertEqual(ViewCount.objects.get(video=self.video).count, 2)
+        self.assertEqual(self.video.get_viewcount(), 4)
+        self.assertEqual(self.video.get_viewcount(from_nb_day=7), 4)
+        self.assertEqual(viewcount.flush_view_counts(), 2)
+        self.assertEqual(ViewCount.objects.get(video=self.video).count, 4)
+        self.assertEqual(self.video.get_viewcount(), 4)
+        print(" --->  test_add_view_and_flush of ViewCountBufferTestCase: OK!")
+
+    def test_flush_new_day(self) -> None:
+        """Check that the views of a day without views are created."""
+        self.buffer.add_view(self.video.id, date(2024, 1, 1))
+        self.buffer.add_view(self.video.id + 1000, date(2024, 1, 1))
+        # the view of the deleted video is not saved
+        self.assertEqual(viewcount.flush_view_counts(), 1)
+        self.assertEqual(
+            ViewCount.objects.get(video=self.video, date=date(2024, 1, 1)).count, 1
+        )
+        self.assertEqual(ViewCount.objects.filter(video=self.video).count(), 2)
+        print(" --->  test_flush_new_day of ViewCountBufferTestCase: OK!")
+
+    @patch.object(stats_rollup, "USE_STATS_ROLLUP", True)
+    def test_flush_stats_rollup(self) -> None:
+        """Check that the views are added to the totals only when flushed."""
+        viewcount.add_view(self.video.id)
+        self.assertFalse(StatsRollup.objects.exists())
+        viewcount.flush_view_counts()
+        self.assertEqual(
+            StatsRollup.objects.get(
+                entity="video", entity_id=self.video.id, period="all"
+            ).views,
+            1,
+        )
+        print(" --->  test_flush_stats_rollup of ViewCountBufferTestCase: OK!")
+
+    def test_memory_buffer_flushed_at_exit(self) -> None:
+        """Check that the memory buffer is saved at the exit of the process."""
+        with patch.object(viewcount, "__VIEW_COUNT_BUFFER__", None), patch(
+            "django_redis.get_redis_connection", side_effect=NotImplementedError
+        ), patch.object(viewcount.atexit, "register") as register:
+            self.assertTrue(viewcount.is_buffer_in_memory())
+        register.assert_called_once_with(viewcount.flush_view_counts_at_exit)
+        print(" --->  test_memory_buffer_flushed_at_exit of ViewCountBufferTestCase: OK!")
+
+    def test_flush_command_memory_buffer(self) -> None:
+        """Check that the command does not save the memory buffer of another process."""
+        self.buffer.add_view(self.video.id, date.today())
+        out = StringIO()
+        call_command("flush_view_counts", stdout=out)
+        self.assertIn("nothing to save", out.getvalue())
+        self.assertEqual(ViewCount.objects.get(video=self.video).count, 2)
+        print(" --->  test_flush_command_memory_buffer of ViewCountBufferTestCase: OK!")
+
+    def test_stats_rollup_without_redis(self) -> None:
+        """Check that the statistics rollups do not use the memory buffer."""
+        with patch.object(viewcount, "__VIEW_COUNT_BUFFER__", None), patch(
+            "django_redis.get_redis_connection", side_effect=NotImplementedError
+        ), patch.object(viewcount, "USE_STATS_ROLLUP", True):
+            with self.assertRaises(ImproperlyConfigured):
+                viewcount.get_view_count_buffer()
+            self.assertIsNone(getattr(viewcount, "__VIEW_COUNT_BUFFER__"))
+        print(" --->  test_stats_rollup_without_redis of ViewCountBufferTestCase: OK!")
@@ -13,6 +13,8 @@ from django.contrib.sites.models import Site
 from django.contrib.messages import get_messages
 from django.core.files.temp import NamedTemporaryFile
 from django.utils.translation import gettext_lazy as _
+from django.utils.http import http_date
+from rest_framework.authtoken.models import Token
 
 from pod.main.models import AdditionalChannelTab
 
@@ -30,6 +32,7 @@ from .. import views
 
 import re
 import json
+from datetime import datetime, timezone as dt_timezone
 from http import HTTPStatus
 from importlib import reload
 import shutil
@@ -475,12 +478,12 @@ class DashboardTestView(TestCase):
         url = reverse("video:dashboard")
         response = self.client.get(url)
         self.assertEqual(response.status_code, HTTPStatus.OK)
-        self.assertEqual(response.context["videos"].paginator.count, 3)
+        self.assertEqual(response.context["count_videos"], 3)
         self.user = User.objects.get(username="pod2")
         self.client.force_login(self.user)
         response = self.client.get(url)
         self.assertEqual(response.status_code, HTTPStatus.OK)
-        self.assertEqual(response.context["videos"].paginator.count, 1)
+        self.assertEqual(response.context["count_videos"], 1)
         print(" --->  test_get_dashboard_view of MyVideosTestView: OK!")
 
 
@@ -557,51 +560,51 @@ class VideosTestView(TestCase):
         url = reverse("videos:videos")
         response = self.client.get(url)
         self.assertEqual(response.status_code, HTTPStatus.OK)
-        self.assertEqual(response.context["videos"].paginator.count, 4)
+        self.assertEqual(response.context["count_videos"], 4)
         # type
         response = self.client.get(url + "?type=type1")
         self.assertEqual(response.status_code, HTTPStatus.OK)
-        self.assertEqual(response.context["videos"].paginator.count, 3)
+        self.assertEqual(response.context["count_videos"], 3)
         response = self.client.get(url + "?type=type2")
         self.assertEqual(response.status_code, HTTPStatus.OK)
-        self.assertEqual(response.context["videos"].paginator.count, 1)
+        self.assertEqual(response.context["count_videos"], 1)
         response = self.client.get(url + "?type=type2&type=type1")
         self.assertEqual(response.status_code, HTTPStatus.OK)
-        self.assertEqual(response.context["videos"].paginator.count, 4)
+        self.assertEqual(response.context["count_videos"], 4)
         # discipline
         response = self.client.get(url + "?discipline=discipline1")
         self.assertEqual(response.status_code, HTTPStatus.OK)
-        self.assertEqual(response.context["videos"].paginator.count, 2)
+        self.assertEqual(response.context["count_videos"], 2)
         response = self.client.get(url + "?discipline=discipline2")
         self.assertEqual(response.status_code, HTTPStatus.OK)
-        self.assertEqual(response.context["videos"].paginator.count, 2)
+        self.assertEqual(response.context["count_videos"], 2)
         response = self.client.get(url + "?discipline=discipline1&discipline=discipline2")
         self.assertEqual(response.status_code, HTTPStatus.OK)
-        self.assertEqual(response.context["videos"].paginator.count, 3)
+        self.assertEqual(response.context["count_videos"], 3)
         # owner
         response = self.client.get(url + "?owner=pod")
-        self.assertEqual(response.context["videos"].paginator.count, 4)
+        self.assertEqual(response.context["count_videos"], 4)
         self.user = User.objects.get(username="pod")
         self.client.force_login(self.user)
         response = self.client.get(url + "?owner=pod")
         self.assertEqual(response.status_code, HTTPStatus.OK)
-        self.assertEqual(response.context["videos"].paginator.count, 2)
+        self.assertEqual(response.context["count_videos"], 2)
         response = self.client.get(url + "?owner=pod2")
         self.assertEqual(response.status_code, HTTPStatus.OK)
-        self.assertEqual(response.context["videos"].paginator.count, 2)
+        self.assertEqual(response.context["count_videos"], 2)
         response = self.client.get(url + "?owner=pod&owner=pod2")
         self.assertEqual(response.status_code, HTTPStatus.OK)
-        self.assertEqual(response.context["videos"].paginator.count, 4)
+        self.assertEqual(response.context["count_videos"], 4)
         # tag
         response = self.client.get(url + "?tag=tag1")
         self.assertEqual(response.status_code, HTTPStatus.OK)
-        self.assertEqual(response.context["videos"].paginator.count, 2)
+        self.assertEqual(response.context["count_videos"], 2)
         response = self.client.get(url + "?tag=tag2")
         self.assertEqual(response.status_code, HTTPStatus.OK)
-        self.assertEqual(response.context["videos"].paginator.count, 2)
+        self.assertEqual(response.context["count_videos"], 2)
         response = self.client.get(url + "?tag=tag1&tag=tag2")
         self.assertEqual(response.status_code, HTTPStatus.OK)
-        self.assertEqual(response.context["videos"].paginator.count, 1)
+        self.assertEqual(response.context["count_videos"], 1)
         print(" --->  test_get_videos_view of VideosTestView: OK!")
 
 
@@ -1892,3 +1895,78 @@ class VideoAccessTokenTestView(TestCase):
         self.assertEqual(VideoAccessToken.objects.all().count(), 0)
 
         print(" ---> test_video_access_tokens_post_request: OK!")
+
+
+class DublinCoreTestView(TestCase):
+    """Test the Dublin Core export of the videos."""
+
+    fixtures = [
+        "initial_data.json",
+    ]
+
+    def setUp(self) -> None:
+        """Set up required objects for next tests."""
+        user = User.objects.create(
+            first_name="pod", last_name="Pod", username="pod", password="pod1234pod"
+        )
+        for i in range(3):
+            Video.objects.create(
+                title="Video%s" % i,
+                owner=user,
+                video="test%s.mp4" % i,
+                type=Type.objects.get(id=1),
+                is_draft=False,
+            )
+        Video.objects.update(has_mp4=True)
+        # the export is only open to the admins, authenticated by token
+        admin = User.objects.create(
+            username="admin", password="admin1234admin", is_staff=True, is_superuser=True
+        )
+        token = Token.objects.create(user=admin)
+        self.client = Client(HTTP_AUTHORIZATION="Token %s" % token.key)
+        print(" --->  SetUp of DublinCoreTestView: OK!")
+
+    def test_dublincore_pages(self) -> None:
+        """Test the export of the videos by page."""
+        url = reverse("dublincore")
+        response = self.client.get(url, {"page_size": 2})
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        content = b"".join(response.streaming_content).decode()
+        self.assertEqual(content.count("<rdf:Description"), 2)
+        self.assertIn("<dc.title>Video0</dc.title>", content)
+        next_url = re.match("<(.*)>", response["Link"]).group(1)
+        response = self.client.get(next_url)
+        content = b"".join(response.streaming_content).decode()
+        self.assertEqual(content.count("<rdf:Description"), 1)
+        self.assertIn("<dc.title>Video2</dc.title>", content)
+        self.assertFalse(response.has_header("Link"))
+        response = self.client.get(url, {"resumption_token": "invalid"})
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        print(" --->  test_dublincore_pages of DublinCoreTestView: OK!")
+
+    def test_dublincore_modified_since(self) -> None:
+        """Test the export of the videos modified since a date."""
+        url = reverse("dublincore")
+        response = self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE="Sat, 01 Jan 2000 00:00:00 GMT"
+        )
+        content = b"".join(response.streaming_content).decode()
+        self.assertEqual(content.count("<rdf:Description"), 3)
+        response = self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE="Fri, 01 Jan 2100 00:00:00 GMT"
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        print(" --->  test_dublincore_modified_since of DublinCoreTestView: OK!")
+
+    def test_dublincore_modified_by_update(self) -> None:
+        """Test that the videos updated without save are exported as modified."""
+        Video.objects.update(date_modified=datetime(2020, 1, 1, tzinfo=dt_timezone.utc))
+        Video.objects.get(title="Video1").update_thumbnail_urls()
+        response = self.client.get(
+            reverse("dublincore"),
+            HTTP_IF_MODIFIED_SINCE=http_date(datetime(2021, 1, 1).timestamp()),
+        )
+        content = b"".join(response.streaming_content).decode()
+        self.assertEqual(content.count("<rdf:Description"), 1)
+        self.assertIn("<dc.title>Video1</dc.title>", content)
+        print(" --->  test_dublincore_modified_by_update of DublinCoreTestView: OK!")
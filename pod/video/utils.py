@@ -6,12 +6,20 @@ import json
 import re
 import shutil
 import logging
+import hashlib
+import uuid
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
 from math import ceil
 
 from django.urls import reverse
 from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet, ValidationError
+from django.core.paginator import Paginator
 from django.http import JsonResponse
-from django.db.models import Q, Count
+from django.db.models import F, Q, Count
+from django.utils.functional import cached_property
 from django.utils.translation import gettext_lazy as _
 from pod.video_encode_transcript.models import EncodingVideo, EncodingAudio
 from pod.video_encode_transcript.models import PlaylistVideo
@@ -58,6 +66,21 @@ SECURE_SSL_REDIRECT = getattr(settings, "SECURE_SSL_REDIRECT", False)
 
 VIDEOS_DIR = getattr(settings, "VIDEOS_DIR", "videos")
 
+VIDEOS_COUNT_CACHE_TIMEOUT = getattr(settings, "VIDEOS_COUNT_CACHE_TIMEOUT", 60)
+
+# sort fields of sort_videos_list paginated by keyset, on not null columns
+KEYSET_SORT_FIELDS = {
+    "cursus",
+    "date_added",
+    "duration",
+    "id",
+    "is_360",
+    "is_restricted",
+    "is_video",
+    "main_lang",
+    "title",
+}
+
 NUMBER_TAGS_CLOUD = getattr(settings, "NUMBER_TAGS_CLOUD", 20)
 
 ###############################################################
@@ -273,6 +296,128 @@ def sort_videos_list(videos_list: list, sort_field: str, sort_direction: str = "
     return videos_list.distinct()
 
 
+class VideosPage:
+    """A page of videos, with the number or the cursor of the next page."""
+
+    def __init__(self, object_list, next_page=None):
+        self.object_list = object_list
+        self.next_page = next_page
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self) -> int:
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self) -> bool:
+        return self.next_page is not None
+
+    def next_page_number(self):
+        return self.next_page
+
+
+def encode_cursor(video) -> str:
+    """Get the cursor of the page following a video, from its sort value."""
+    value = video.keyset_value
+    if isinstance(value, datetime):
+        # keep the microseconds, dropped by the Django JSON encoder
+        value = value.isoformat()
+    data = json.dumps([value, video.id])
+    return "k" + urlsafe_b64encode(data.encode("utf-8")).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort_field: str):
+    """Get the sort value and the id of the video before a page, None if invalid."""
+    if not cursor.startswith("k"):
+        return None
+    data = cursor[1:] + "=" * (-len(cursor[1:]) % 4)
+    try:
+        value, video_id = json.loads(urlsafe_b64decode(data))
+        if sort_field != "title":
+            value = Video._meta.get_field(sort_field).to_python(value)
+        return value, int(video_id)
+    except (ValueError, TypeError, ValidationError):
+        return None
+
+
+def get_keyset_list(videos_list, sort_field: str, sort_direction: str = ""):
+    """Sort the videos on their sort field then their id, for the keyset pagination."""
+    key = Lower("title") if sort_field == "title" else F(sort_field)
+    order = ("keyset_value", "id") if sort_direction else ("-keyset_value", "-id")
+    return videos_list.annotate(keyset_value=key).order_by(*order)
+
+
+def filter_after_cursor(videos_list, position, sort_direction: str = ""):
+    """Get the videos after the position of a cursor, in the keyset sort order."""
+    value, video_id = position
+    lookup = "gt" if sort_direction else "lt"
+    return videos_list.filter(
+        Q(**{"keyset_value__%s" % lookup: value})
+        | Q(keyset_value=value, **{"id__%s" % lookup: video_id})
+    )
+
+
+def get_videos_page(
+    videos_list, page, sort_field: str, sort_direction: str = "", per_page: int = 12
+) -> VideosPage:
+    """Get a page of videos, sorted by sort_videos_list.
+
+    With a sort field of KEYSET_SORT_FIELDS, the next page is given by a cursor
+    on the last video of the page: its videos are read from there without
+    skipping the previous ones, so a deep page costs the same as the first one.
+    The other sort fields, and the page numbers of old links, use an offset.
+    """
+    keyset = sort_field in KEYSET_SORT_FIELDS
+    position = None
+    if keyset:
+        videos_list = get_keyset_list(videos_list, sort_field, sort_direction)
+        position = decode_cursor(str(page), sort_field)
+    number = 1
+    if position:
+        videos_list = filter_after_cursor(videos_list, position, sort_direction)
+    elif str(page).isdigit() and int(page) > 0:
+        number = int(page)
+    start = (number - 1) * per_page
+    # one more video to know if there is a next page, without counting them
+    videos = list(videos_list[start : start + per_page + 1])
+    if len(videos) <= per_page:
+        return VideosPage(videos)
+    videos = videos[:per_page]
+    return VideosPage(videos, encode_cursor(videos[-1]) if keyset else number + 1)
+
+
+def clear_videos_count() -> None:
+    """Expire the cached counts of videos, after a change of a video."""
+    cache.set("videos_count_version", uuid.uuid4().hex, None)
+
+
+def get_videos_count(videos_list) -> int:
+    """Count the videos of a list, cached for VIDEOS_COUNT_CACHE_TIMEOUT seconds."""
+    try:
+        sql, params = videos_list.query.sql_with_params()
+    except EmptyResultSet:
+        return 0
+    version = cache.get_or_set("videos_count_version", lambda: uuid.uuid4().hex, None)
+    query = ("%s %s" % (sql, params)).encode("utf-8")
+    cache_key = "videos_count_%s_%s" % (version, hashlib.sha256(query).hexdigest())
+    count = cache.get(cache_key)
+    if count is None:
+        count = videos_list.count()
+        cache.set(cache_key, count, VIDEOS_COUNT_CACHE_TIMEOUT)
+    return count
+
+
+class CachedCountPaginator(Paginator):
+    """Paginator of videos with their count cached, see get_videos_count."""
+
+    @cached_property
+    def count(self) -> int:
+        return get_videos_count(self.object_list)
+
+
 def get_id_from_request(request, key):
     """Get the value of a specified key from the request object."""
     if request.method == "POST" and request.POST.get(key):
@@ -0,0 +1,207 @@
+"""
+Esup-Pod buffered video view counter.
+
+With USE_VIEW_COUNT_BUFFER, the views of the videos are counted in Redis, with
+the connection of the VIEW_COUNT_BUFFER_CACHE cache, or in the memory of the
+process if this cache is not a Redis one. They are saved in ViewCount by batch,
+every VIEW_COUNT_FLUSH_DELAY seconds or with the flush_view_counts command.
+The memory buffer of a process is also saved at its exit, the flush_view_counts
+command can not reach it.
+The buffer is always used with USE_STATS_ROLLUP, whose view totals are updated
+when the buffer is saved: it has then to be in Redis, to not lose the views
+of a process which did not exit cleanly.
+"""
+
+import atexit
+import logging
+import threading
+import time
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.cache import InvalidCacheBackendError
+from django.core.exceptions import ImproperlyConfigured
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import Video, ViewCount
+from .stats_rollup import USE_STATS_ROLLUP, add_views_stats
+
+# the views are added to the statistics rollups by batch, from the buffer
+USE_VIEW_COUNT_BUFFER = (
+    getattr(settings, "USE_VIEW_COUNT_BUFFER", False) or USE_STATS_ROLLUP
+)
+VIEW_COUNT_BUFFER_CACHE = getattr(settings, "VIEW_COUNT_BUFFER_CACHE", "default")
+VIEW_COUNT_FLUSH_DELAY = getattr(settings, "VIEW_COUNT_FLUSH_DELAY", 60)
+
+logger = logging.getLogger(__name__)
+
+__VIEW_COUNT_BUFFER__ = None
+
+
+class MemoryViewCountBuffer:
+    """View counts kept in the memory of the current process."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # {(video_id, date): count}
+        self.counts = {}
+        self.last_flush = time.time()
+
+    def add_view(self, video_id, day) -> None:
+        """Count a view of a video on a day."""
+        with self.lock:
+            self.counts[(video_id, day)] = self.counts.get((video_id, day), 0) + 1
+
+    def get_pending_count(self, video_id, days) -> int:
+        """Get the views of a video on the days not saved yet."""
+        with self.lock:
+            return sum(self.counts.get((video_id, day), 0) for day in days)
+
+    def is_flush_due(self) -> bool:
+        """Check if the counts have to be saved, for one caller by period."""
+        with self.lock:
+            if time.time() - self.last_flush < VIEW_COUNT_FLUSH_DELAY:
+                return False
+            self.last_flush = time.time()
+        return True
+
+    def pop_counts(self) -> dict:
+        """Get the counts to save and empty the buffer."""
+        with self.lock:
+            counts, self.counts = self.counts, {}
+        return counts
+
+
+class RedisViewCountBuffer:
+    """View counts kept in a Redis hash, shared by every process."""
+
+    key = "viewcount:pending"
+
+    def __init__(self, redis):
+        self.redis = redis
+
+    def add_view(self, video_id, day) -> None:
+        """Count a view of a video on a day."""
+        self.redis.hincrby(self.key, "%s:%s" % (video_id, day.isoformat()), 1)
+
+    def get_pending_count(self, video_id, days) -> int:
+        """Get the views of a video on the days not saved yet."""
+        counts = self.redis.hmget(
+            self.key, ["%s:%s" % (video_id, day.isoformat()) for day in days]
+        )
+        return sum(int(count) for count in counts if count)
+
+    def is_flush_due(self) -> bool:
+        """Check if the counts have to be saved, for one caller by period."""
+        return bool(
+            self.redis.set("viewcount:flush", 1, nx=True, ex=VIEW_COUNT_FLUSH_DELAY)
+        )
+
+    def pop_counts(self) -> dict:
+        """Get the counts to save and empty the buffer."""
+        pipe = self.redis.pipeline()
+        pipe.hgetall(self.key)
+        pipe.delete(self.key)
+        counts, deleted = pipe.execute()
+        pending = {}
+        for field, count in counts.items():
+            video_id, day = field.decode().split(":")
+            pending[(int(video_id), date.fromisoformat(day))] = int(count)
+        return pending
+
+
+def get_view_count_buffer():
+    """Get the buffer of the view counts, in Redis if available."""
+    global __VIEW_COUNT_BUFFER__
+    if __VIEW_COUNT_BUFFER__ is None:
+        try:
+            from django_redis import get_redis_connection
+
+            __VIEW_COUNT_BUFFER__ = RedisViewCountBuffer(
+                get_redis_connection(VIEW_COUNT_BUFFER_CACHE)
+            )
+        except (ImportError, NotImplementedError, InvalidCacheBackendError) as e:
+            if USE_STATS_ROLLUP:
+                raise ImproperlyConfigured(
+                    "USE_STATS_ROLLUP needs the Redis cache %s to buffer the views: %s"
+                    % (VIEW_COUNT_BUFFER_CACHE, e)
+                )
+            logger.warning("View counts buffered in memory, Redis not available: %s" % e)
+            __VIEW_COUNT_BUFFER__ = MemoryViewCountBuffer()
+            # the views of the process are lost if not saved before its exit
+            atexit.register(flush_view_counts_at_exit)
+    return __VIEW_COUNT_BUFFER__
+
+
+def is_buffer_in_memory() -> bool:
+    """Check if the view counts are buffered in the memory of the process."""
+    return isinstance(get_view_count_buffer(), MemoryViewCountBuffer)
+
+
+def save_view_count(video_id, day, count=1) -> None:
+    """Add views of a video on a day in ViewCount."""
+    view_count = ViewCount.objects.filter(video_id=video_id, date=day)
+    if view_count.update(count=F("count") + count):
+        return
+    try:
+        with transaction.atomic():
+            ViewCount.objects.create(video_id=video_id, date=day, count=count)
+    except IntegrityError:
+        view_count.update(count=F("count") + count)
+
+
+def add_view(video_id) -> None:
+    """Count a view of a video, in the buffer if used."""
+    if not USE_VIEW_COUNT_BUFFER:
+        save_view_count(video_id, date.today())
+        return
+    buffer = get_view_count_buffer()
+    buffer.add_view(video_id, date.today())
+    if buffer.is_flush_due():
+        flush_view_counts()
+
+
+def flush_view_counts() -> int:
+    """Save the buffered view counts in ViewCount, return the number of views saved."""
+    counts = get_view_count_buffer().pop_counts()
+    if not counts:
+        return 0
+    # the views of the videos deleted in the meantime are lost
+    video_ids = set(
+        Video.objects.filter(
+            id__in=set(video_id for video_id, day in counts)
+        ).values_list("id", flat=True)
+    )
+    counts = {
+        (video_id, day): count
+        for (video_id, day), count in counts.items()
+        if video_id in video_ids
+    }
+    with transaction.atomic():
+        # always in the same order, to avoid deadlocks between flushes
+        for (video_id, day), count in sorted(counts.items()):
+            save_view_count(video_id, day, count)
+        add_views_stats(counts)
+    return sum(counts.values())
+
+
+def flush_view_counts_at_exit() -> None:
+    """Save the view counts buffered in memory when the process exits."""
+    try:
+        flush_view_counts()
+    except Exception as e:
+        logger.error("Unable to save the buffered view counts: %s" % e)
+
+
+def get_pending_view_count(video_id, from_nb_day=0) -> int:
+    """Get the views of a video not saved yet in ViewCount."""
+    if not USE_VIEW_COUNT_BUFFER:
+        return 0
+    # the buffer only has the views since the last flush, of today or yesterday
+    days = [
+        date.today() - timedelta(days=nb_day)
+        for nb_day in range(2)
+        if from_nb_day == 0 or nb_day <= from_nb_day
+    ]
+    return get_view_count_buffer().get_pending_count(video_id, days)
@@ -8,7 +8,7 @@ from django.core.exceptions import PermissionDenied, SuspiciousOperation
 from django.core.handlers.wsgi import WSGIRequest
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 from django.core.serializers.json import DjangoJSONEncoder
-from django.db.models import Count, F, Q, Case, When, Value, BooleanField
+from django.db.models import Count, Q, Case, When, Value, BooleanField
 from django.db.models.functions import Concat
 from django.shortcuts import get_object_or_404
 from django.shortcuts import render
@@ -60,6 +60,8 @@ from pod.video.models import Theme
 from pod.video.models import Discipline
 from pod.video.models import AdvancedNotes, NoteComments, NOTES_STATUS
 from pod.video.models import ViewCount, VideoVersion
+from pod.video.viewcount import add_view
+from pod.video.stats_rollup import USE_STATS_ROLLUP, get_stats_rollup
 from pod.video.models import Comment, Vote, Category
 from pod.video.models import get_transcription_choices
 from pod.video.models import UserMarkerTime, VideoAccessToken
@@ -81,6 +83,8 @@ from .utils import (
     get_filtered_disciplines_for_videos,
     get_filtered_tags_for_videos,
     get_filtered_owners_for_videos,
+    get_videos_count,
+    get_videos_page,
 )
 from .context_processors import get_available_videos
 from .utils import sort_videos_list
@@ -633,13 +637,13 @@ def dashboard(request):
     )
 
     error_message = {}
-    if not filtered_videos_list:
+    if not filtered_videos_list.exists():
         error_message["main"] = _(
             "No videos matched your filters. Please try adjusting them."
         )
         error_message["types"] = ""
 
-    if not videos_list:
+    if not videos_list.exists():
         error_message["main"] = _("You haven’t uploaded any videos yet.")
         error_message["types"] = _(
             "Click on “Add a video” to start populating your dashboard."
@@ -648,10 +652,8 @@ def dashboard(request):
     ownersInstances = get_owners_has_instances(request.GET.getlist("owner"))
     owner_filter = owner_is_searchable(request.user)
 
-    count_videos = len(sorted_videos_list)
-
-    paginator = Paginator(sorted_videos_list, 12)
-    videos = get_paginated_videos(paginator, page)
+    count_videos = sorted_videos_list.count()
+    videos = get_videos_page(sorted_videos_list, page, sort_field, sort_direction)
 
     videos_list_templates = {
         "grid": "videos/video_list_grid_selectable.html",
@@ -1000,7 +1002,7 @@ def videos(request):
     if not sort_field:
         # Get the default Video ordering
         sort_field = Video._meta.ordering[0].lstrip("-")
-    count_videos = len(videos_list)
+    count_videos = get_videos_count(videos_list)
 
     page = request.GET.get("page", 1)
     if page == "" or page is None:
@@ -1013,8 +1015,7 @@ def videos(request):
             .replace("&page=%s" % page, "")
         )
 
-    paginator = Paginator(videos_list, 12)
-    videos = get_paginated_videos(paginator, page)
+    videos = get_videos_page(videos_list, page, sort_field, sort_direction)
     ownersInstances = get_owners_has_instances(request.GET.getlist("owner"))
     owner_filter = owner_is_searchable(request.user)
 
@@ -2325,19 +2326,9 @@ def video_note_download(request, slug):
 @csrf_protect
 def video_count(request, id):
     """View to store the video count."""
-    video = get_object_or_404(Video, id=id)
+    video = get_object_or_404(Video.objects.only("id"), id=id)
     if request.method == "POST":
-        try:
-            view_count = ViewCount.objects.get(video=video, date=date.today())
-        except ViewCount.DoesNotExist:
-            try:
-                with transaction.atomic():
-                    ViewCount.objects.create(video=video, count=1)
-                    return HttpResponse("ok")
-            except IntegrityError:
-                view_count = ViewCount.objects.get(video=video, date=date.today())
-        view_count.count = F("count") + 1
-        view_count.save(update_fields=["count"])
+        add_view(video.id)
         return HttpResponse("ok")
     messages.add_message(request, messages.ERROR, _("You cannot access to this view."))
     raise PermissionDenied
@@ -2495,6 +2486,8 @@ def video_oembed(request):
 
 
 def get_all_views_count(v_id, date_filter=date.today()):
+    if USE_STATS_ROLLUP:
+        return get_stats_rollup("video", [v_id], date_filter)[v_id]
     all_views = {}
 
     # view count in day
@@ -2723,12 +2716,20 @@ def stats_view(request, slug=None, slug_t=None):
         if isinstance(date_filter, str):
             date_filter = parse(date_filter).date()
 
+        if USE_STATS_ROLLUP:
+            # the statistics of all the videos are read in a single query
+            videos = list(videos)
+            stats = get_stats_rollup("video", [v.id for v in videos], date_filter)
         data = list(
             map(
                 lambda v: {
                     "title": v.title,
                     "slug": v.slug,
-                    **get_all_views_count(v.id, date_filter),
+                    **(
+                        stats[v.id]
+                        if USE_STATS_ROLLUP
+                        else get_all_views_count(v.id, date_filter)
+                    ),
                 },
                 videos,
             )
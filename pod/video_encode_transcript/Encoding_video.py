@@ -4,8 +4,10 @@ import argparse
 import json
 import logging
 import os
+import shutil
 import time
 import unicodedata
+from concurrent.futures import ThreadPoolExecutor
 from webvtt import WebVTT, Caption
 
 if __name__ == "__main__":
@@ -13,6 +15,7 @@ if __name__ == "__main__":
         get_dressing_position_value,
         get_info_from_video,
         get_list_rendition,
+        get_segment_ranges,
         launch_cmd,
         check_file,
     )
@@ -47,12 +50,24 @@ if __name__ == "__main__":
         FFMPEG_DRESSING_CONCAT,
         FFMPEG_DRESSING_SILENT,
         FFMPEG_DRESSING_AUDIO,
+        FFMPEG_SINGLE_DECODE,
+        FFMPEG_SEGMENT_ENCODING,
+        FFMPEG_SEGMENT_MIN_DURATION,
+        FFMPEG_SEGMENT_NB_WORKERS,
+        FFPROBE_GET_KEYFRAME,
+        FFMPEG_SEGMENT_INPUT,
+        FFMPEG_SEGMENT_ENCODE,
+        FFMPEG_SEGMENT_JOIN,
+        FFMPEG_SEGMENT_HLS,
+        FFMPEG_CUT_COPY,
+        FFMPEG_CUT_COPY_HLS,
     )
 else:
     from .encoding_utils import (
         get_dressing_position_value,
         get_info_from_video,
         get_list_rendition,
+        get_segment_ranges,
         launch_cmd,
         check_file,
     )
@@ -87,6 +102,17 @@ else:
         FFMPEG_DRESSING_CONCAT,
         FFMPEG_DRESSING_SILENT,
         FFMPEG_DRESSING_AUDIO,
+        FFMPEG_SINGLE_DECODE,
+        FFMPEG_SEGMENT_ENCODING,
+        FFMPEG_SEGMENT_MIN_DURATION,
+        FFMPEG_SEGMENT_NB_WORKERS,
+        FFPROBE_GET_KEYFRAME,
+        FFMPEG_SEGMENT_INPUT,
+        FFMPEG_SEGMENT_ENCODE,
+        FFMPEG_SEGMENT_JOIN,
+        FFMPEG_SEGMENT_HLS,
+        FFMPEG_CUT_COPY,
+        FFMPEG_CUT_COPY_HLS,
     )
 
 __author__ = "Nicolas CAN <nicolas.can@univ-lille.fr>"
@@ -159,6 +185,25 @@ try:
     FFMPEG_DRESSING_AUDIO = getattr(
         settings, "FFMPEG_DRESSING_AUDIO", FFMPEG_DRESSING_AUDIO
     )
+    FFMPEG_SINGLE_DECODE = getattr(settings, "FFMPEG_SINGLE_DECODE", FFMPEG_SINGLE_DECODE)
+    FFMPEG_SEGMENT_ENCODING = getattr(
+        settings, "FFMPEG_SEGMENT_ENCODING", FFMPEG_SEGMENT_ENCODING
+    )
+    FFMPEG_SEGMENT_MIN_DURATION = getattr(
+        settings, "FFMPEG_SEGMENT_MIN_DURATION", FFMPEG_SEGMENT_MIN_DURATION
+    )
+    FFMPEG_SEGMENT_NB_WORKERS = getattr(
+        settings, "FFMPEG_SEGMENT_NB_WORKERS", FFMPEG_SEGMENT_NB_WORKERS
+    )
+    FFPROBE_GET_KEYFRAME = getattr(settings, "FFPROBE_GET_KEYFRAME", FFPROBE_GET_KEYFRAME)
+    FFMPEG_SEGMENT_INPUT = getattr(settings, "FFMPEG_SEGMENT_INPUT", FFMPEG_SEGMENT_INPUT)
+    FFMPEG_SEGMENT_ENCODE = getattr(
+        settings, "FFMPEG_SEGMENT_ENCODE", FFMPEG_SEGMENT_ENCODE
+    )
+    FFMPEG_SEGMENT_JOIN = getattr(settings, "FFMPEG_SEGMENT_JOIN", FFMPEG_SEGMENT_JOIN)
+    FFMPEG_SEGMENT_HLS = getattr(settings, "FFMPEG_SEGMENT_HLS", FFMPEG_SEGMENT_HLS)
+    FFMPEG_CUT_COPY = getattr(settings, "FFMPEG_CUT_COPY", FFMPEG_CUT_COPY)
+    FFMPEG_CUT_COPY_HLS = getattr(settings, "FFMPEG_CUT_COPY_HLS", FFMPEG_CUT_COPY_HLS)
     DEBUG = getattr(settings, "DEBUG", True)
 except ImportError:  # pragma: no cover
     DEBUG = True
@@ -639,6 +684,15 @@ class Encoding_video:
 
     def encode_video_part(self) -> None:
         """Encode the video part of a file."""
+        if self.use_segment_encoding():
+            error_encoding = self.error_encoding
+            if self.encode_video_segments():
+                return
+            # the failed segments are logged, the video is encoded in one process
+            logger.warning("segment encoding failed, start a single process encoding")
+            self.error_encoding = error_encoding
+            self.list_mp4_files = {}
+            self.list_hls_files = {}
         mp4_command = self.get_mp4_command()
         return_value, return_msg = launch_cmd(mp4_command)
         self.add_encoding_log("mp4_command", mp4_command, return_value, return_msg)
@@ -654,6 +708,250 @@ class Encoding_video:
             self.create_main_livestream()
         self.add_encoding_log("hls_command", hls_command, return_value, return_msg)
 
+    def get_segment_nb_workers(self) -> int:
+        """Get the number of segments encoded at the same time."""
+        return int(FFMPEG_SEGMENT_NB_WORKERS) or os.cpu_count() or 1
+
+    def use_segment_encoding(self) -> bool:
+        """Check if the video has to be encoded by segments in parallel."""
+        return (
+            FFMPEG_SEGMENT_ENCODING
+            and self.duration >= FFMPEG_SEGMENT_MIN_DURATION
+            and self.get_segment_nb_workers() > 1
+        )
+
+    def get_keyframe(self, position):
+        """
+        Get the time of the first keyframe from position in the video source.
+
+        Cutting on a keyframe avoids decoding frames only to drop them,
+        the cut stays frame accurate if no keyframe is found.
+        """
+        probe_cmd = FFPROBE_GET_KEYFRAME % {
+            "ffprobe": FFPROBE_CMD,
+            "interval": "%s%%+30" % position,
+            "source": '"' + self.video_file + '" ',
+        }
+        info, return_msg = get_info_from_video(probe_cmd)
+        keyframes = []
+        for frame in (info or {}).get("frames", []):
+            for key in ["pts_time", "pkt_pts_time", "best_effort_timestamp_time"]:
+                try:
+                    keyframes.append(float(frame[key]))
+                    break
+                except (KeyError, TypeError, ValueError):
+                    continue
+        next_keyframes = [keyframe for keyframe in keyframes if keyframe >= position]
+        return min(next_keyframes) if next_keyframes else position
+
+    def get_segment_outputs(self) -> dict:
+        """
+        Get the renditions to encode by segment.
+
+        Returns:
+            dict: {(rendition, height): {"mp4": bool, "hls": bool}}, with the
+                same renditions as get_mp4_command and get_hls_command.
+        """
+        outputs = {}
+        list_rendition = get_list_rendition()
+        in_height = list(self.list_video_track.items())[0][1]["height"]
+        first_item = self.get_first_item()
+        for index, rend in enumerate(list_rendition):
+            resolution_threshold = rend - rend * (
+                list_rendition[rend]["encoding_resolution_threshold"] / 100
+            )
+            height = min(rend, in_height)
+            if in_height >= resolution_threshold or index == 0:
+                outputs.setdefault((rend, height), {"mp4": False, "hls": False})
+                outputs[(rend, height)]["hls"] = True
+            if first_item and rend == first_item[0]:
+                outputs.setdefault((rend, rend), {"mp4": False, "hls": False})
+                outputs[(rend, rend)]["mp4"] = True
+            elif list_rendition[rend]["encode_mp4"] and in_height >= resolution_threshold:
+                outputs.setdefault((rend, height), {"mp4": False, "hls": False})
+                outputs[(rend, height)]["mp4"] = True
+        return outputs
+
+    def get_segment_file(self, segment_dir, rend, height, index) -> str:
+        """Get the path of an encoded segment."""
+        return os.path.join(segment_dir, "%sp_%s_%03d.mp4" % (rend, height, index))
+
+    def get_segment_command(self, index, segment, outputs, segment_dir) -> str:
+        """Get the command encoding all renditions of one segment of the video."""
+        list_rendition = get_list_rendition()
+        segment_start, segment_duration, is_last = segment
+        cut = "-ss %s " % segment_start
+        if not is_last or self.cutting_stop != 0:
+            cut += "-t %s " % segment_duration
+        segment_command = "%s " % FFMPEG_CMD
+        segment_command += FFMPEG_SEGMENT_INPUT % {
+            "nb_threads": FFMPEG_NB_THREADS,
+            "cut": cut,
+            "input": self.video_file,
+        }
+        for rend, height in outputs:
+            segment_command += FFMPEG_SEGMENT_ENCODE % {
+                "libx": FFMPEG_LIBX,
+                "height": height,
+                "preset": FFMPEG_PRESET,
+                "profile": FFMPEG_PROFILE,
+                "level": FFMPEG_LEVEL,
+                "crf": FFMPEG_CRF,
+                "maxrate": list_rendition[rend]["maxrate"],
+                "bufsize": list_rendition[rend]["maxrate"],
+                "output": self.get_segment_file(segment_dir, rend, height, index),
+            }
+        return segment_command
+
+    def get_segment_join_command(self, rend, height, nb_segments, segment_dir, output):
+        """Get the command joining the segments of a rendition with the audio."""
+        list_rendition = get_list_rendition()
+        list_file = os.path.join(segment_dir, "%sp_%s.txt" % (rend, height))
+        with open(list_file, "w") as file:
+            for index in range(nb_segments):
+                segment_file = self.get_segment_file(segment_dir, rend, height, index)
+                file.write("file '%s'\n" % segment_file)
+        input_audio = ""
+        if len(self.list_audio_track) > 0:
+            cut = ""
+            if self.cutting_start != 0 or self.cutting_stop != 0:
+                cut = "-ss %s -t %s " % (self.cutting_start, self.duration)
+            input_audio = '%s-i "%s"' % (cut, self.video_file)
+        join_command = "%s " % FFMPEG_CMD
+        join_command += FFMPEG_SEGMENT_JOIN % {
+            "list": list_file,
+            "input_audio": input_audio,
+            "map_audio": "-map 1:a:0" if input_audio else "",
+            "ba": list_rendition[rend]["audio_bitrate"],
+            "output": output,
+        }
+        return join_command
+
+    def encode_video_segments(self) -> bool:
+        """
+        Encode the video part of a file by segments, in parallel.
+
+        The source is split into time ranges starting on keyframes, each range
+        is encoded in all renditions by its own ffmpeg process, then the ranges
+        are joined with the audio in the same MP4 and HLS files as encode_video_part.
+        Return False and set error_encoding if a segment or a join failed.
+        """
+        segment_dir = os.path.join(self.output_dir, "segments")
+        if not os.path.exists(segment_dir):
+            os.makedirs(segment_dir)
+        nb_workers = self.get_segment_nb_workers()
+        ranges = get_segment_ranges(
+            self.cutting_start, self.duration, nb_workers, self.get_keyframe
+        )
+        outputs = self.get_segment_outputs()
+        segment_commands = [
+            self.get_segment_command(
+                index, (start, duration, index == len(ranges) - 1), outputs, segment_dir
+            )
+            for index, (start, duration) in enumerate(ranges)
+        ]
+        with ThreadPoolExecutor(max_workers=nb_workers) as executor:
+            results = list(executor.map(launch_cmd, segment_commands))
+        for index, (return_value, return_msg) in enumerate(results):
+            self.add_encoding_log(
+                "segment_command_%03d" % index,
+                segment_commands[index],
+                return_value,
+                return_msg,
+            )
+        encoded = all(return_value for return_value, return_msg in results)
+        if encoded:
+            for (rend, height), output in outputs.items():
+                encoded = self.join_video_segments(
+                    rend, height, output, len(ranges), segment_dir
+                )
+                if not encoded:
+                    break
+        if not encoded:
+            self.error_encoding = True
+        elif len(self.list_hls_files) > 0:
+            self.create_main_livestream()
+        shutil.rmtree(segment_dir, ignore_errors=True)
+        return encoded
+
+    def join_video_segments(self, rend, height, output, nb_segments, segment_dir):
+        """Join the segments of a rendition in its MP4 and HLS files, False if failed."""
+        joined_file = os.path.join(segment_dir, "%sp_%s.mp4" % (rend, height))
+        if output["mp4"]:
+            joined_file = os.path.join(self.output_dir, "%sp.mp4" % rend)
+        join_command = self.get_segment_join_command(
+            rend, height, nb_segments, segment_dir, joined_file
+        )
+        return_value, return_msg = launch_cmd(join_command)
+        self.add_encoding_log(
+            "segment_join_command_%sp" % rend, join_command, return_value, return_msg
+        )
+        if not return_value:
+            return False
+        if output["mp4"]:
+            self.list_mp4_files[rend] = joined_file
+        if output["hls"]:
+            output_file = os.path.join(self.output_dir, "%sp.m3u8" % rend)
+            hls_command = "%s " % FFMPEG_CMD
+            hls_command += FFMPEG_SEGMENT_HLS % {
+                "input": joined_file,
+                "height": height,
+                "hls_time": FFMPEG_HLS_TIME,
+                "output": output_file,
+            }
+            return_value, return_msg = launch_cmd(hls_command)
+            self.add_encoding_log(
+                "segment_hls_command_%sp" % rend, hls_command, return_value, return_msg
+            )
+            if not return_value:
+                return False
+            self.list_hls_files[rend] = output_file
+        return True
+
+    def get_cut_copy_command(self, input_file, output_file, start, params="") -> str:
+        """Get the command cutting input_file from start by stream copy."""
+        cut_copy_command = "%s " % FFMPEG_CMD
+        cut_copy_command += FFMPEG_CUT_COPY % {
+            "start": start,
+            "duration": self.cutting_stop - self.cutting_start,
+            "input": input_file,
+            "params": params,
+            "output": output_file,
+        }
+        return cut_copy_command
+
+    def encode_cut_copy(self, previous_files, start) -> None:
+        """
+        Cut the outputs of a previous encoding by stream copy.
+
+        Args:
+            previous_files (dict): previous output files by list name, like
+                list_mp4_files, with the TS file in list_hls_files.
+            start (int): position of the new cut in the previous outputs.
+        """
+        for list_name, files in previous_files.items():
+            for key, input_file in files.items():
+                filename = os.path.basename(input_file)
+                params = "-movflags faststart" if filename.endswith(".mp4") else ""
+                if list_name == "list_hls_files":
+                    filename = os.path.splitext(filename)[0] + ".m3u8"
+                    params = FFMPEG_CUT_COPY_HLS % {
+                        "hls_time": FFMPEG_HLS_TIME,
+                        "height": key,
+                    }
+                output_file = os.path.join(self.output_dir, filename)
+                command = self.get_cut_copy_command(
+                    input_file, output_file, start, params
+                )
+                return_value, return_msg = launch_cmd(command)
+                self.add_encoding_log(
+                    "cut_copy_command_%s" % filename, command, return_value, return_msg
+                )
+                if return_value:
+                    getattr(self, list_name)[key] = output_file
+        if len(self.list_hls_files) > 0:
+            self.create_main_livestream()
+
     def create_main_livestream(self) -> None:
         list_rendition = get_list_rendition()
         livestream_content = ""
@@ -733,10 +1031,11 @@ class Encoding_video:
             self.list_thumbnail_files[img] = output_file
         return thumbnail_command
 
-    def get_create_thumbnail_command(self) -> str:
+    def get_create_thumbnail_command(self, input_file=None) -> str:
         thumbnail_command = "%s " % FFMPEG_CMD
-        first_item = self.get_first_item()
-        input_file = self.list_mp4_files[first_item[0]]
+        if input_file is None:
+            first_item = self.get_first_item()
+            input_file = self.list_mp4_files[first_item[0]]
         thumbnail_command += FFMPEG_INPUT % {
             "input": input_file,
             "nb_threads": FFMPEG_NB_THREADS,
@@ -766,19 +1065,22 @@ class Encoding_video:
         else:
             return list_rendition.popitem(last=False)
 
-    def create_overview(self) -> None:
-        first_item = self.get_first_item()
+    def get_overview_size(self):
+        """Get the width, height and number of images of the overview."""
         # overview combine for 160x90
         in_height = list(self.list_video_track.items())[0][1]["height"]
         in_width = list(self.list_video_track.items())[0][1]["width"]
         image_height = 90
         coef = in_height / image_height
         image_width = int(in_width / coef)
-        input_file = self.list_mp4_files[first_item[0]]
         nb_img = 100 if self.duration >= 100 else 10
+        return image_width, image_height, nb_img
 
+    def get_overview_command(self, input_file) -> str:
+        """Get the command creating the overview image from input_file."""
+        image_width, image_height, nb_img = self.get_overview_size()
         overviewimagefilename = os.path.join(self.output_dir, "overview.png")
-        overview_image_command = (
+        return (
             FFMPEG_CMD
             + " "
             + FFMPEG_INPUT
@@ -795,10 +1097,21 @@ class Encoding_video:
                 "output": overviewimagefilename,
             }
         )
+
+    def create_overview(self) -> None:
+        first_item = self.get_first_item()
+        input_file = self.list_mp4_files[first_item[0]]
+        overviewimagefilename = os.path.join(self.output_dir, "overview.png")
+        overview_image_command = self.get_overview_command(input_file)
         return_value, output_message = launch_cmd(overview_image_command)
         if not return_value or not check_file(overviewimagefilename):
             logger.error(f"FFmpeg failed with output: {output_message}")
+        self.create_overview_vtt()
 
+    def create_overview_vtt(self) -> None:
+        """Create the overview WebVTT pointing to the overview image."""
+        image_width, image_height, nb_img = self.get_overview_size()
+        overviewimagefilename = os.path.join(self.output_dir, "overview.png")
         overviewfilename = os.path.join(self.output_dir, "overview.vtt")
         image_url = os.path.basename(overviewimagefilename)
         webvtt = WebVTT()
@@ -845,6 +1158,105 @@ class Encoding_video:
         if self.is_video() and self.duration >= 10:
             self.create_overview()
 
+    def use_single_decode(self) -> bool:
+        """Check if all outputs can be made with a single decode of the source."""
+        return (
+            FFMPEG_SINGLE_DECODE
+            and self.duration > 0
+            and not (self.is_video() and self.use_segment_encoding())
+        )
+
+    def get_single_decode_outputs(self) -> dict:
+        """
+        Get the output part of the command of each enabled output.
+
+        Returns:
+            dict: {encoding_log title: output options}, the input options
+                being shared by all outputs.
+        """
+        input_command = "%s " % FFMPEG_CMD
+        input_command += FFMPEG_INPUT % {
+            "input": self.video_file,
+            "nb_threads": FFMPEG_NB_THREADS,
+        }
+        # the cut is done on the input for all outputs (see get_single_decode_input)
+        cutting_start, cutting_stop = self.cutting_start, self.cutting_stop
+        self.cutting_start, self.cutting_stop = 0, 0
+        try:
+            outputs = self.get_single_decode_commands()
+        finally:
+            self.cutting_start, self.cutting_stop = cutting_start, cutting_stop
+        for title, command in outputs.items():
+            outputs[title] = command.replace(input_command, "", 1)
+        return outputs
+
+    def get_single_decode_commands(self) -> dict:
+        """Get the command of each enabled output."""
+        outputs = {}
+        if self.is_video():
+            outputs["mp4_command"] = self.get_mp4_command()
+            outputs["hls_command"] = self.get_hls_command()
+        if len(self.list_audio_track) > 0:
+            outputs["mp3_command"] = self.get_mp3_command()
+            if not self.is_video():
+                outputs["m4a_command"] = self.get_m4a_command()
+        if len(self.list_image_track) > 0:
+            outputs["extract_thumbnail_command"] = self.get_extract_thumbnail_command()
+        elif self.is_video():
+            outputs["create_thumbnail_command"] = self.get_create_thumbnail_command(
+                self.video_file
+            )
+        if self.is_video() and self.duration >= 10:
+            outputs["overview_command"] = self.get_overview_command(self.video_file)
+        return outputs
+
+    def get_single_decode_input(self) -> str:
+        """Get the input part of the single decode command, with the cut."""
+        input_command = "%s " % FFMPEG_CMD
+        if self.cutting_start != 0 or self.cutting_stop != 0:
+            input_command += "-ss %s -t %s " % (self.cutting_start, self.duration)
+        input_command += FFMPEG_INPUT % {
+            "input": self.video_file,
+            "nb_threads": FFMPEG_NB_THREADS,
+        }
+        return input_command
+
+    def encode_single_decode(self) -> bool:
+        """
+        Encode all outputs with a single ffmpeg command.
+
+        ffmpeg decodes each input stream once and feeds the filters of every
+        output, the renditions, audio, thumbnails and overview are then made
+        from the same decoded frames instead of decoding the source for each one.
+
+        Returns:
+            bool: False if the command failed and nothing has been encoded.
+        """
+        outputs = self.get_single_decode_outputs()
+        single_decode_command = self.get_single_decode_input()
+        single_decode_command += " ".join(outputs.values())
+        return_value, return_msg = launch_cmd(single_decode_command)
+        # not added with add_encoding_log: a failure is retried output by output
+        self.encoding_log["single_decode_command"] = {
+            "command": single_decode_command,
+            "result": return_value,
+            "msg": return_msg,
+        }
+        if not return_value:
+            self.list_mp4_files = {}
+            self.list_hls_files = {}
+            self.list_mp3_files = {}
+            self.list_m4a_files = {}
+            self.list_thumbnail_files = {}
+            return False
+        for title, command in outputs.items():
+            self.add_encoding_log(title, command, True, "See single_decode_command")
+        if self.is_video():
+            self.create_main_livestream()
+            if "overview_command" in outputs:
+                self.create_overview_vtt()
+        return True
+
     def get_extract_subtitle_command(self) -> str:
         subtitle_command = "%s " % FFMPEG_CMD
         subtitle_command += FFMPEG_INPUT % {
@@ -892,14 +1304,20 @@ class Encoding_video:
             "start_encode {id: %s, file: %s, duration: %s}"
             % (self.id, self.video_file, self.duration)
         )
-        if self.is_video():
+        if self.use_single_decode():
+            logger.debug("* encode_single_decode")
+            single_decode = self.encode_single_decode()
+        else:
+            single_decode = False
+        if self.is_video() and not single_decode:
             logger.debug("* encode_video_part")
             self.encode_video_part()
-        if len(self.list_audio_track) > 0:
+        if len(self.list_audio_track) > 0 and not single_decode:
             logger.debug("* encode_audio_part")
             self.encode_audio_part()
-        logger.debug("* encode_image_part")
-        self.encode_image_part()
+        if not single_decode:
+            logger.debug("* encode_image_part")
+            self.encode_image_part()
         if len(self.list_subtitle_track) > 0:
             logger.debug("* get_subtitle_part")
             self.get_subtitle_part()
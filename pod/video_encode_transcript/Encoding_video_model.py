@@ -3,6 +3,7 @@
 import logging
 import os
 import re
+import shutil
 from django.conf import settings
 from .models import EncodingVideo
 from .models import EncodingAudio
@@ -27,6 +28,7 @@ from .encoding_utils import (
     launch_cmd,
     check_file,
 )
+from .utils import link_file
 
 DEBUG = getattr(settings, "DEBUG", True)
 logger = logging.getLogger(__name__)
@@ -46,6 +48,14 @@ ENCODING_CHOICES = getattr(
     ),
 )
 
+# dressing values applied to the video only, the audio being left unchanged
+DRESSING_VIDEO_KEYS = ["watermark_path", "position_orig", "opacity"]
+# previous outputs reused, by incremental encoding mode
+INCREMENTAL_FILES = {
+    "cut": ["list_mp4_files", "list_hls_files", "list_mp3_files", "list_m4a_files"],
+    "dressing": ["list_mp3_files", "list_m4a_files"],
+}
+
 __LANG_CHOICES_DICT__ = {
     key: value for key, value in LANG_CHOICES[0][1] + LANG_CHOICES[1][1]
 }
@@ -284,6 +294,24 @@ class Encoding_video_model(Encoding_video):
                 os.remove(list_thumbnail_files[thumbnail_path])
         return video
 
+    def store_cached_thumbnail(self, cached_video) -> Video:
+        """Copy the thumbnail of a cached video, which can be deleted with its folder."""
+        video = Video.objects.get(id=self.id)
+        if not cached_video.thumbnail or not check_file(cached_video.thumbnail.file.path):
+            return video
+        thumbnail = CustomImageModel()
+        if __FILEPICKER__:
+            videodir = video.get_or_create_video_folder()
+            thumbnail = CustomImageModel(folder=videodir, created_by=video.owner)
+        extension = os.path.splitext(cached_video.thumbnail.file.path)[1]
+        with open(cached_video.thumbnail.file.path, "rb") as thumbnail_file:
+            thumbnail.file.save(
+                "%s_1%s" % (video.slug, extension), File(thumbnail_file), save=True
+            )
+        video.thumbnail = thumbnail
+        video.save()
+        return video
+
     def store_json_list_overview_files(self, info_video) -> Video:
         list_overview_files = info_video["list_overview_files"]
         video = Video.objects.get(id=self.id)
@@ -330,6 +358,196 @@ class Encoding_video_model(Encoding_video):
 
             return video
 
+    def link_cached_file(self, source_path) -> str:
+        """Link a file of an other video into the output dir and return its new path."""
+        output_file = os.path.join(self.output_dir, os.path.basename(source_path))
+        link_file(source_path, output_file)
+        return output_file
+
+    def store_cached_encoding(self, cached_video) -> None:
+        """Reuse the encoded files of a video encoded with the same key."""
+        self.start = time.ctime()
+        self.create_output_dir()
+        self.duration = cached_video.duration
+        for encoding in EncodingVideo.objects.filter(
+            video=cached_video, encoding_format="video/mp4"
+        ):
+            rend = encoding.name.replace("p", "")
+            self.list_mp4_files[rend] = self.link_cached_file(encoding.source_file.path)
+        for encoding in EncodingVideo.objects.filter(
+            video=cached_video, encoding_format="video/mp2t"
+        ):
+            self.link_cached_file(encoding.source_file.path)
+        for encoding in PlaylistVideo.objects.filter(video=cached_video):
+            output_file = self.link_cached_file(encoding.source_file.path)
+            if encoding.name != "playlist":
+                self.list_hls_files[encoding.name.replace("p", "")] = output_file
+        for encoding in EncodingAudio.objects.filter(video=cached_video):
+            output_file = self.link_cached_file(encoding.source_file.path)
+            if encoding.encoding_format == "audio/mp3":
+                self.list_mp3_files["cache"] = output_file
+            else:
+                self.list_m4a_files["cache"] = output_file
+        if cached_video.overview:
+            overview_vtt = cached_video.overview.path
+            overview_png = os.path.join(os.path.dirname(overview_vtt), "overview.png")
+            if check_file(overview_png) and check_file(overview_vtt):
+                self.list_overview_files["0"] = self.link_cached_file(overview_png)
+                self.list_overview_files["1"] = self.link_cached_file(overview_vtt)
+        self.store_cached_subtitle_files(cached_video)
+        self.add_encoding_log(
+            "encoding_cache", "", True, "Reuse encoding of video %s" % cached_video.id
+        )
+        self.stop = time.ctime()
+        self.export_to_json()
+
+    def store_cached_subtitle_files(self, cached_video) -> None:
+        """Link the subtitles extracted from the source of a cached video."""
+        cached_json = os.path.join(
+            os.path.dirname(cached_video.video.path),
+            "%04d" % cached_video.id,
+            "info_video.json",
+        )
+        if not check_file(cached_json):
+            return
+        with open(cached_json, "r") as json_file:
+            list_subtitle_files = json.load(json_file).get("list_subtitle_files", {})
+        for sub, (lang, subtitle_file) in list_subtitle_files.items():
+            if check_file(subtitle_file):
+                self.list_subtitle_files[sub] = [
+                    lang,
+                    self.link_cached_file(subtitle_file),
+                ]
+
+    def get_previous_encoding(self) -> dict:
+        """Get the data of the previous encoding if it matches the current source."""
+        infovideojsonfilepath = os.path.join(self.get_output_dir(), "info_video.json")
+        if not check_file(infovideojsonfilepath) or os.path.getmtime(
+            self.video_file
+        ) > os.path.getmtime(infovideojsonfilepath):
+            return {}
+        with open(infovideojsonfilepath, "r") as json_file:
+            info_video = json.load(json_file)
+        if info_video.get("error_encoding", True):
+            return {}
+        return info_video
+
+    def get_incremental_mode(self, previous) -> str:
+        """
+        Get which change was made since the previous encoding.
+
+        Returns:
+            str: "cut" if only the cut changed within the previous one, "dressing"
+                if only the watermark changed, else "" for a full encoding.
+        """
+        dressings = [previous.get("json_dressing"), self.json_dressing]
+        if not previous or any(
+            dressing
+            and (dressing.get("opening_credits") or dressing.get("ending_credits"))
+            for dressing in dressings
+        ):
+            return ""
+        watermarks = [
+            [(dressing or {}).get(key) for key in DRESSING_VIDEO_KEYS]
+            for dressing in dressings
+        ]
+        previous_start = previous.get("cutting_start", 0)
+        previous_stop = previous_start + previous.get("duration", 0)
+        cut_changed = [previous_start, previous.get("cutting_stop", 0)] != [
+            self.cutting_start,
+            self.cutting_stop,
+        ]
+        watermark_changed = watermarks[0] != watermarks[1]
+        if cut_changed and not watermark_changed:
+            # the new cut must be inside the previous outputs
+            if previous_start <= self.cutting_start < self.cutting_stop <= previous_stop:
+                return "cut"
+        elif watermark_changed and not cut_changed and previous.get("list_video_track"):
+            return "dressing"
+        return ""
+
+    def prepare_incremental_encode(self) -> bool:
+        """Keep aside the previous outputs not affected by the changes."""
+        previous = self.get_previous_encoding()
+        self.incremental_mode = self.get_incremental_mode(previous)
+        if not self.incremental_mode:
+            return False
+        previous_files = {}
+        for list_name in INCREMENTAL_FILES[self.incremental_mode]:
+            files = previous.get(list_name, {})
+            if list_name == "list_hls_files":
+                files = {key: path.replace(".m3u8", ".ts") for key, path in files.items()}
+            if not all(check_file(path) for path in files.values()):
+                self.incremental_mode = ""
+                return False
+            previous_files[list_name] = files
+        previous_dir = os.path.join(self.get_output_dir(), "previous")
+        os.makedirs(previous_dir, exist_ok=True)
+        self.previous_files = {}
+        for list_name, files in previous_files.items():
+            self.previous_files[list_name] = {}
+            for key, path in files.items():
+                previous_path = os.path.join(previous_dir, os.path.basename(path))
+                os.replace(path, previous_path)
+                if list_name in ["list_mp4_files", "list_hls_files"]:
+                    key = int(key)
+                self.previous_files[list_name][key] = previous_path
+        self.previous_cutting_start = previous.get("cutting_start", 0)
+        return True
+
+    def restore_previous_files(self) -> None:
+        """Put back the previous outputs kept unchanged."""
+        for list_name, files in self.previous_files.items():
+            for key, previous_path in files.items():
+                output_file = os.path.join(
+                    self.output_dir, os.path.basename(previous_path)
+                )
+                os.replace(previous_path, output_file)
+                getattr(self, list_name)[key] = output_file
+
+    def start_incremental_encode(self) -> None:
+        """Encode again only the outputs affected by the changes."""
+        source_file = self.video_file
+        self.start = time.ctime()
+        self.create_output_dir()
+        self.get_video_data()
+        logger.info(
+            "start_incremental_encode {id: %s, mode: %s}"
+            % (self.id, self.incremental_mode)
+        )
+        if self.incremental_mode == "cut":
+            start = self.cutting_start - self.previous_cutting_start
+            self.encode_cut_copy(self.previous_files, start)
+        else:
+            if self.json_dressing is not None:
+                self.encode_video_dressing()
+            self.encode_video_part()
+            self.restore_previous_files()
+        shutil.rmtree(os.path.join(self.output_dir, "previous"), ignore_errors=True)
+        if self.error_encoding:
+            logger.warning("incremental encoding failed, start a full encoding")
+            self.reset_encoding(source_file)
+            self.start_encode()
+            return
+        self.encode_image_part()
+        if len(self.list_subtitle_track) > 0:
+            self.get_subtitle_part()
+        self.stop = time.ctime()
+        self.export_to_json()
+
+    def reset_encoding(self, source_file) -> None:
+        """Forget the outputs and errors of an encoding to start it again."""
+        self.video_file = source_file
+        self.error_encoding = False
+        self.list_video_track = {}
+        self.list_audio_track = {}
+        self.list_subtitle_track = {}
+        self.list_image_track = {}
+        self.list_mp4_files = {}
+        self.list_hls_files = {}
+        self.list_mp3_files = {}
+        self.list_m4a_files = {}
+
     def get_create_thumbnail_command_from_video(self, video_to_encode):
         """Create command line to generate thumbnails from video."""
         thumbnail_command = "%s " % FFMPEG_CMD
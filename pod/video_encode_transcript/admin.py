@@ -90,8 +90,18 @@ class EncodingLogAdmin(admin.ModelAdmin):
 class EncodingStepAdmin(admin.ModelAdmin):
     """Admin model for EncodingStep."""
 
-    list_display = ("video", "num_step", "desc_step")
-    readonly_fields = ("video", "num_step", "desc_step")
+    list_display = ("video", "num_step", "desc_step", "priority", "node", "date_queued")
+    readonly_fields = (
+        "video",
+        "num_step",
+        "desc_step",
+        "priority",
+        "duration",
+        "node",
+        "date_queued",
+        "date_started",
+    )
+    list_filter = ("priority", "node")
     search_fields = ["id", "video__id", "video__title"]
 
     def get_queryset(self, request):
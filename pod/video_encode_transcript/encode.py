@@ -14,6 +14,8 @@ from pod.dressing.utils import get_dressing_input
 from pod.main.tasks import task_start_encode, task_start_encode_studio
 from pod.recorder.models import Recording
 from .encoding_settings import FFMPEG_DRESSING_INPUT
+from .encoding_cache import get_cached_video, get_encoding_key, set_encoding_key
+from .encoding_scheduler import queue_encode
 from .utils import (
     change_encoding_step,
     check_file,
@@ -40,6 +42,9 @@ if USE_TRANSCRIPTION:
 
 CELERY_TO_ENCODE = getattr(settings, "CELERY_TO_ENCODE", False)
 EMAIL_ON_ENCODING_COMPLETION = getattr(settings, "EMAIL_ON_ENCODING_COMPLETION", True)
+USE_ENCODING_CACHE = getattr(settings, "USE_ENCODING_CACHE", False)
+USE_ENCODING_SCHEDULER = getattr(settings, "USE_ENCODING_SCHEDULER", False)
+USE_INCREMENTAL_ENCODING = getattr(settings, "USE_INCREMENTAL_ENCODING", False)
 
 USE_REMOTE_ENCODING_TRANSCODING = getattr(
     settings, "USE_REMOTE_ENCODING_TRANSCODING", False
@@ -57,10 +62,12 @@ FFMPEG_DRESSING_INPUT = getattr(settings, "FFMPEG_DRESSING_INPUT", FFMPEG_DRESSI
 # Disable for the moment, will be reactivated in future version
 
 
-def start_encode(video_id: int, threaded=True) -> None:
+def start_encode(video_id: int, threaded=True, priority=None) -> None:
     """Start video encoding."""
     if threaded:
-        if CELERY_TO_ENCODE:
+        if USE_ENCODING_SCHEDULER:
+            queue_encode(video_id, priority)
+        elif CELERY_TO_ENCODE:
             task_start_encode.delay(video_id)
         else:
             log.info("START ENCODE VIDEO ID %s" % video_id)
@@ -135,6 +142,13 @@ def encode_video(video_id: int) -> None:
     # start and stop cut?
     encoding_video = get_encoding_video(video_to_encode)
     encoding_video.add_encoding_log("start_time", "", True, start)
+    if USE_ENCODING_CACHE and encode_video_from_cache(video_to_encode, encoding_video):
+        return
+    incremental = (
+        USE_INCREMENTAL_ENCODING
+        and not USE_REMOTE_ENCODING_TRANSCODING
+        and encoding_video.prepare_incremental_encode()
+    )
     change_encoding_step(video_id, 1, "remove old data")
     encoding_video.remove_old_data()
 
@@ -155,8 +169,16 @@ def encode_video(video_id: int) -> None:
             dressing_input=dressing_input,
         )
     else:
-        change_encoding_step(video_id, 2, "start standard encoding")
-        encoding_video.start_encode()
+        if incremental:
+            change_encoding_step(
+                video_id,
+                2,
+                "start incremental encoding (%s)" % encoding_video.incremental_mode,
+            )
+            encoding_video.start_incremental_encode()
+        else:
+            change_encoding_step(video_id, 2, "start standard encoding")
+            encoding_video.start_encode()
         final_video = store_encoding_info(video_id, encoding_video)
 
         if encoding_video.error_encoding:
@@ -170,6 +192,34 @@ def encode_video(video_id: int) -> None:
             end_of_encoding(final_video)
 
 
+def encode_video_from_cache(
+    video_to_encode: Video, encoding_video: Encoding_video_model
+) -> bool:
+    """Reuse the encoding of a video with the same source, cut, dressing and renditions."""
+    key = get_encoding_key(video_to_encode, encoding_video)
+    cached_video = get_cached_video(video_to_encode, key)
+    if cached_video is None:
+        return False
+    if cached_video.id == video_to_encode.id:
+        # nothing is encoded: no notification and no new transcription
+        video_to_encode.encoding_in_progress = False
+        video_to_encode.save()
+        change_encoding_step(video_to_encode.id, 0, "encoding already up to date")
+        return True
+    # the key is set again once the encoded files are stored
+    set_encoding_key(video_to_encode, "")
+    change_encoding_step(video_to_encode.id, 1, "remove old data")
+    encoding_video.remove_old_data()
+    change_encoding_step(
+        video_to_encode.id, 2, "reuse encoding of video %s" % cached_video.id
+    )
+    encoding_video.store_cached_encoding(cached_video)
+    store_encoding_info(video_to_encode.id, encoding_video)
+    final_video = encoding_video.store_cached_thumbnail(cached_video)
+    end_of_encoding(final_video)
+    return True
+
+
 def store_encoding_info(video_id: int, encoding_video: Encoding_video_model) -> Video:
     """Store all encoding file and informations from encoding tasks."""
     change_encoding_step(video_id, 3, "store encoding info")
@@ -215,6 +265,8 @@ def get_encoding_video(video_to_encode: Video) -> Encoding_video_model:
 
 def end_of_encoding(video: Video) -> None:
     """Notify user at the end of encoding & call transcription."""
+    if USE_ENCODING_CACHE:
+        set_encoding_key(video, get_encoding_key(video, get_encoding_video(video)))
     if (
         USE_NOTIFICATIONS
         and video.owner.owner.accepts_notifications
@@ -0,0 +1,115 @@
+"""Esup-Pod encoding cache, to reuse the encoding of an identical source."""
+
+import hashlib
+import json
+import logging
+import os
+
+from django.conf import settings
+from django.db.models import Q
+
+from .encoding_utils import get_list_rendition
+from .models import EncodingAudio, EncodingCache, EncodingVideo, PlaylistVideo
+from .utils import check_file
+
+__license__ = "LGPL v3"
+
+DEBUG = getattr(settings, "DEBUG", True)
+logger = logging.getLogger(__name__)
+if DEBUG:
+    logger.setLevel(logging.DEBUG)
+
+HASH_BLOCK_SIZE = 1024 * 1024
+# dressing values without effect on the encoded files
+DRESSING_KEY_EXCLUDE = ["id", "title", "owners", "users", "allow_to_groups"]
+
+
+def get_file_hash(path_file) -> str:
+    """Get the sha256 hash of a file, read by blocks."""
+    file_hash = hashlib.sha256()
+    with open(path_file, "rb") as file:
+        for block in iter(lambda: file.read(HASH_BLOCK_SIZE), b""):
+            file_hash.update(block)
+    return file_hash.hexdigest()
+
+
+def get_source_hash(video) -> str:
+    """Get the hash of the video source file, computed again only if it changed."""
+    stat = os.stat(video.video.path)
+    cache, created = EncodingCache.objects.get_or_create(video=video)
+    if (
+        created
+        or not cache.source_hash
+        or cache.source_size != stat.st_size
+        or cache.source_mtime != stat.st_mtime
+    ):
+        cache.source_hash = get_file_hash(video.video.path)
+        cache.source_size = stat.st_size
+        cache.source_mtime = stat.st_mtime
+        cache.key = ""
+        cache.save()
+    return cache.source_hash
+
+
+def get_encoding_key(video, encoding_video) -> str:
+    """
+    Get the key of the encoding of a video.
+
+    The key depends on everything that changes the encoded files: the source
+    file content, the cut, the dressing and the renditions.
+    """
+    dressing = encoding_video.json_dressing
+    if dressing:
+        dressing = {
+            key: value
+            for key, value in dressing.items()
+            if key not in DRESSING_KEY_EXCLUDE
+        }
+    renditions = [
+        {key: value for key, value in rendition.items() if key != "sites"}
+        for rendition in get_list_rendition().values()
+    ]
+    data = {
+        "source": get_source_hash(video),
+        "cut": [encoding_video.cutting_start, encoding_video.cutting_stop],
+        "dressing": dressing,
+        "renditions": renditions,
+    }
+    data_json = json.dumps(data, sort_keys=True, default=str)
+    return hashlib.sha256(data_json.encode("utf-8")).hexdigest()
+
+
+def set_encoding_key(video, key) -> None:
+    """Store the key of the last successful encoding of a video."""
+    EncodingCache.objects.filter(video=video).update(key=key)
+
+
+def has_encoding_files(video) -> bool:
+    """Check if the encoded files of a video are all present."""
+    encodings = (
+        list(EncodingVideo.objects.filter(video=video))
+        + list(EncodingAudio.objects.filter(video=video))
+        + list(PlaylistVideo.objects.filter(video=video))
+    )
+    return len(encodings) > 0 and all(
+        check_file(encoding.source_file.path) for encoding in encodings
+    )
+
+
+def get_cached_video(video, key):
+    """
+    Get a video already encoded with the same key.
+
+    The video itself is returned first if its encoding is still valid.
+    """
+    if not key:
+        return None
+    caches = (
+        EncodingCache.objects.filter(key=key)
+        .filter(Q(video=video) | Q(video__encoding_in_progress=False))
+        .select_related("video")
+    )
+    for cache in sorted(caches, key=lambda cache: cache.video_id != video.id):
+        if has_encoding_files(cache.video):
+            return cache.video
+    return None
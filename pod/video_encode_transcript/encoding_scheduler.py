@@ -0,0 +1,210 @@
+"""
+Esup-Pod encoding scheduler.
+
+Videos to encode are queued in their EncodingStep, then started by priority
+class and shortest source first, within a maximum number of concurrent
+encodings per node.
+"""
+
+import inspect
+import logging
+import socket
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from pod.main.tasks import task_start_encode
+from pod.video.models import Video
+from .encoding_settings import FFPROBE_CMD, FFPROBE_GET_INFO
+from .encoding_utils import get_info_from_video
+from .models import EncodingLog, EncodingStep
+from .models import ENCODING_PRIORITY_INTERACTIVE, ENCODING_PRIORITY_REENCODE
+
+__license__ = "LGPL v3"
+
+DEBUG = getattr(settings, "DEBUG", True)
+logger = logging.getLogger(__name__)
+if DEBUG:
+    logger.setLevel(logging.DEBUG)
+
+CELERY_TO_ENCODE = getattr(settings, "CELERY_TO_ENCODE", False)
+USE_ENCODING_SCHEDULER = getattr(settings, "USE_ENCODING_SCHEDULER", False)
+ENCODING_MAX_CONCURRENT = getattr(settings, "ENCODING_MAX_CONCURRENT", 2)
+ENCODING_NODE_NAME = getattr(settings, "ENCODING_NODE_NAME", socket.gethostname())
+ENCODING_SLOT_TIMEOUT = getattr(settings, "ENCODING_SLOT_TIMEOUT", 6 * 3600)
+FFPROBE_CMD = getattr(settings, "FFPROBE_CMD", FFPROBE_CMD)
+
+
+def get_node_name() -> str:
+    """Get the name of the node running the encodings."""
+    # with Celery, the encodings of every worker share the same limit
+    return "celery" if CELERY_TO_ENCODE else ENCODING_NODE_NAME
+
+
+def get_encoding_priority(video) -> int:
+    """Get the default encoding priority of a video."""
+    if EncodingLog.objects.filter(video=video).exists():
+        return ENCODING_PRIORITY_REENCODE
+    return ENCODING_PRIORITY_INTERACTIVE
+
+
+def get_source_duration(video) -> int:
+    """Get the duration of the video source, in seconds."""
+    if video.duration:
+        return video.duration
+    probe_cmd = FFPROBE_GET_INFO % {
+        "ffprobe": FFPROBE_CMD,
+        "select_streams": "",
+        "source": '"' + video.video.path + '" ',
+    }
+    info, msg = get_info_from_video(probe_cmd)
+    try:
+        return int(float(info["format"]["duration"]))
+    except (KeyError, TypeError, ValueError):
+        logger.warning("Unable to get duration of video %s: %s" % (video.id, msg))
+        return 0
+
+
+def get_encoding_queue():
+    """Get the encodings waiting to start, in the order they will start."""
+    return (
+        EncodingStep.objects.filter(date_queued__isnull=False, date_started__isnull=True)
+        .select_related("video")
+        .order_by("priority", "duration", "date_queued")
+    )
+
+
+def get_running_encodings(node=None):
+    """Get the encodings started by the scheduler, on a node if given."""
+    running = EncodingStep.objects.filter(date_started__isnull=False).select_related(
+        "video"
+    )
+    if node is not None:
+        running = running.filter(node=node)
+    return running.order_by("date_started")
+
+
+def get_encoding_queue_info() -> dict:
+    """Get the running and waiting encodings, for the queue inspection API."""
+    return {
+        "max_concurrent": ENCODING_MAX_CONCURRENT,
+        "running": [get_step_info(step) for step in get_running_encodings()],
+        "waiting": [
+            dict(get_step_info(step), position=position)
+            for position, step in enumerate(get_encoding_queue(), start=1)
+        ],
+    }
+
+
+def get_step_info(step) -> dict:
+    """Get the scheduling information of an encoding step."""
+    return {
+        "video_id": step.video.id,
+        "slug": step.video.slug,
+        "title": step.video.title,
+        "priority": step.priority,
+        "priority_label": str(step.get_priority_display()),
+        "duration": step.duration,
+        "node": step.node,
+        "date_queued": step.date_queued,
+        "date_started": step.date_started,
+        "num_step": step.num_step,
+        "desc_step": step.desc_step,
+    }
+
+
+def queue_encode(video_id: int, priority=None) -> None:
+    """Add a video to the encoding queue, then start the encodings that can."""
+    video = Video.objects.get(id=video_id)
+    encoding_step, created = EncodingStep.objects.get_or_create(video=video)
+    encoding_step.priority = (
+        get_encoding_priority(video) if priority is None else priority
+    )
+    encoding_step.duration = get_source_duration(video)
+    encoding_step.node = ""
+    encoding_step.date_queued = timezone.now()
+    encoding_step.date_started = None
+    encoding_step.num_step = 0
+    encoding_step.desc_step = "waiting in encoding queue"
+    encoding_step.save()
+    logger.info(
+        "QUEUE ENCODE VIDEO ID %s (priority: %s, duration: %s)"
+        % (video_id, encoding_step.priority, encoding_step.duration)
+    )
+    dispatch_encode()
+
+
+def call_encode(encode_function, video_id: int, priority=None) -> None:
+    """Call an encoding function, with the priority only if it accepts one."""
+    if "priority" in inspect.signature(encode_function).parameters:
+        encode_function(video_id, priority=priority)
+    else:
+        encode_function(video_id)
+
+
+def release_stale_encodings() -> int:
+    """
+    Queue again the encodings started more than ENCODING_SLOT_TIMEOUT ago.
+
+    Their worker or thread is considered dead, their place is given back.
+    Return the number of encodings queued again.
+    """
+    stale = EncodingStep.objects.filter(
+        date_started__lt=timezone.now() - timedelta(seconds=ENCODING_SLOT_TIMEOUT)
+    )
+    for encoding_step in stale:
+        logger.warning(
+            "Encoding of video %s started on %s at %s timed out, queued again"
+            % (encoding_step.video_id, encoding_step.node, encoding_step.date_started)
+        )
+    return stale.update(date_started=None, node="")
+
+
+def dispatch_encode() -> None:
+    """Start the next queued encodings within the limit of the node."""
+    release_stale_encodings()
+    node = get_node_name()
+    nb_free = ENCODING_MAX_CONCURRENT - get_running_encodings(node).count()
+    if nb_free <= 0:
+        return
+    for encoding_step in get_encoding_queue()[:nb_free]:
+        # the update only succeeds for one process if several dispatch at once
+        started = EncodingStep.objects.filter(
+            id=encoding_step.id, date_started__isnull=True
+        ).update(node=node, date_started=timezone.now())
+        if started:
+            launch_encoding_job(encoding_step.video.id)
+
+
+def launch_encoding_job(video_id: int) -> None:
+    """Launch the encoding of a video taken from the queue."""
+    if CELERY_TO_ENCODE:
+        task_start_encode.delay(video_id)
+    else:
+        logger.info("START ENCODE VIDEO ID %s" % video_id)
+        t = threading.Thread(target=run_encoding_job, args=[video_id])
+        t.daemon = True
+        t.start()
+
+
+def run_encoding_job(video_id: int) -> None:
+    """Encode a video, then release its place in the queue."""
+    from .encode import encode_video
+
+    date_started = (
+        EncodingStep.objects.filter(video__id=video_id)
+        .values_list("date_started", flat=True)
+        .first()
+    )
+    try:
+        encode_video(video_id)
+    finally:
+        if date_started is not None:
+            # the video may have been queued again during its encoding
+            EncodingStep.objects.filter(
+                video__id=video_id, date_started=date_started
+            ).update(date_queued=None, date_started=None, node="")
+        if USE_ENCODING_SCHEDULER:
+            dispatch_encode()
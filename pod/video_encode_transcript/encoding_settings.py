@@ -72,6 +72,52 @@ FFMPEG_CREATE_OVERVIEW = (
     "-frames:v 1 -y '%(output)s' "
 )
 
+# Single decode: the source is decoded once for every output (renditions, audio,
+# thumbnails and overview) by running them in the same ffmpeg command.
+FFMPEG_SINGLE_DECODE = False
+
+# Segment-parallel encoding: long sources are split at keyframes into time ranges
+# encoded at the same time, then joined back into the usual MP4 and HLS outputs.
+FFMPEG_SEGMENT_ENCODING = False
+FFMPEG_SEGMENT_MIN_DURATION = 600  # in seconds
+FFMPEG_SEGMENT_NB_WORKERS = 0  # 0 to use the number of CPU
+FFPROBE_GET_KEYFRAME = (
+    "%(ffprobe)s -v quiet -select_streams v:0 -skip_frame nokey "
+    + "-show_entries frame=pts_time,pkt_pts_time,best_effort_timestamp_time "
+    + "-read_intervals %(interval)s -print_format json -i %(source)s"
+)
+FFMPEG_SEGMENT_INPUT = '-hide_banner -threads %(nb_threads)s %(cut)s -i "%(input)s" '
+FFMPEG_SEGMENT_ENCODE = (
+    '-map 0:v:0 -an -c:v %(libx)s -vf "scale=-2:%(height)s" '
+    + "-preset %(preset)s -profile:v %(profile)s "
+    + "-pix_fmt yuv420p -level %(level)s -crf %(crf)s "
+    + "-maxrate %(maxrate)s -bufsize %(bufsize)s "
+    + '-sc_threshold 0 -force_key_frames "expr:gte(t,n_forced*1)" '
+    + '-max_muxing_queue_size 4000 -y -vsync 0 "%(output)s" '
+)
+FFMPEG_SEGMENT_JOIN = (
+    '-hide_banner -f concat -safe 0 -i "%(list)s" %(input_audio)s '
+    + "-map 0:v:0 %(map_audio)s -c:v copy -c:a aac -ar 48000 -b:a %(ba)s "
+    + '-movflags faststart -y "%(output)s" '
+)
+FFMPEG_SEGMENT_HLS = (
+    '-hide_banner -i "%(input)s" -map 0 -c copy '
+    + "-hls_playlist_type vod -hls_time %(hls_time)s  -hls_flags single_file "
+    + '-master_pl_name "livestream%(height)s.m3u8" '
+    + '-y "%(output)s" '
+)
+
+# Incremental encoding: a cut-only edit is applied to the previous outputs by stream
+# copy, the cut points being on the keyframes forced every second.
+FFMPEG_CUT_COPY = (
+    '-hide_banner -ss %(start)s -t %(duration)s -i "%(input)s" -map 0 -c copy '
+    + '%(params)s -y "%(output)s" '
+)
+FFMPEG_CUT_COPY_HLS = (
+    "-hls_playlist_type vod -hls_time %(hls_time)s  -hls_flags single_file "
+    + '-master_pl_name "livestream%(height)s.m3u8"'
+)
+
 FFMPEG_DRESSING_OUTPUT = ' -c:v libx264 -y -vsync 0 "%(output)s" '
 FFMPEG_DRESSING_INPUT = ' -i "%(input)s"'
 FFMPEG_DRESSING_FILTER_COMPLEX = ' -filter_complex "%(filter)s" '
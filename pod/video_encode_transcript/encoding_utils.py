@@ -88,6 +88,36 @@ def get_list_rendition():
     return list_rendition
 
 
+def get_segment_ranges(start, duration, nb_segments, get_keyframe=None) -> list:
+    """
+    Split a time range into consecutive segments.
+
+    Args:
+        start (float): start of the range, in seconds.
+        duration (float): duration of the range, in seconds.
+        nb_segments (int): number of segments wanted.
+        get_keyframe (callable): optional function returning the keyframe time
+            nearest to a given time, used to align the cut points.
+
+    Returns:
+        list: (start, duration) tuples covering the whole range.
+    """
+    stop = start + duration
+    nb_segments = max(1, int(nb_segments))
+    cut_points = [start]
+    for index in range(1, nb_segments):
+        point = start + duration * index / nb_segments
+        if get_keyframe:
+            point = get_keyframe(point)
+        if point is not None and cut_points[-1] < point < stop:
+            cut_points.append(point)
+    cut_points.append(stop)
+    return [
+        (cut_points[index], cut_points[index + 1] - cut_points[index])
+        for index in range(len(cut_points) - 1)
+    ]
+
+
 def get_info_from_video(probe_cmd):
     info = None
     msg = ""
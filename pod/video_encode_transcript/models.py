@@ -9,7 +9,7 @@ from django.core.exceptions import ValidationError
 from django.core.validators import MaxValueValidator
 from django.contrib.sites.models import Site
 from django.dispatch import receiver
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from pod.video.models import Video, get_storage_path_video
 
 ENCODING_CHOICES = getattr(
@@ -38,6 +38,16 @@ FORMAT_CHOICES = getattr(
     ),
 )
 
+# Encoding priority classes, the lowest value is encoded first
+ENCODING_PRIORITY_INTERACTIVE = 0
+ENCODING_PRIORITY_BATCH = 1
+ENCODING_PRIORITY_REENCODE = 2
+ENCODING_PRIORITY_CHOICES = (
+    (ENCODING_PRIORITY_INTERACTIVE, _("Interactive upload")),
+    (ENCODING_PRIORITY_BATCH, _("Batch import")),
+    (ENCODING_PRIORITY_REENCODE, _("Re-encoding")),
+)
+
 
 class VideoRendition(models.Model):
     """Model representing the rendition video."""
@@ -354,6 +364,17 @@ class EncodingStep(models.Model):
     )
     num_step = models.IntegerField(default=0, editable=False)
     desc_step = models.CharField(null=True, max_length=255, blank=True, editable=False)
+    priority = models.IntegerField(
+        _("Priority"), choices=ENCODING_PRIORITY_CHOICES, default=0, editable=False
+    )
+    duration = models.IntegerField(_("Source duration"), default=0, editable=False)
+    node = models.CharField(_("Node"), max_length=255, blank=True, editable=False)
+    date_queued = models.DateTimeField(
+        _("Date queued"), null=True, blank=True, editable=False
+    )
+    date_started = models.DateTimeField(
+        _("Date started"), null=True, blank=True, editable=False
+    )
 
     @property
     def sites(self):
@@ -374,6 +395,36 @@ class EncodingStep(models.Model):
         return "Step for encoding video %s" % (self.video.id)
 
 
+class EncodingCache(models.Model):
+    """Model representing the key of the last encoding of a video."""
+
+    video = models.OneToOneField(
+        Video, verbose_name=_("Video"), editable=False, on_delete=models.CASCADE
+    )
+    source_hash = models.CharField(max_length=64, blank=True, editable=False)
+    source_size = models.BigIntegerField(default=0, editable=False)
+    source_mtime = models.FloatField(default=0, editable=False)
+    key = models.CharField(max_length=64, blank=True, db_index=True, editable=False)
+
+    @property
+    def sites(self):
+        """Property representing the sites associated with the video."""
+        return self.video.sites
+
+    @property
+    def sites_all(self):
+        """Property representing all the sites associated with the video."""
+        return self.video.sites_set.all()
+
+    class Meta:
+        ordering = ["video"]
+        verbose_name = _("Encoding cache")
+        verbose_name_plural = _("Encoding caches")
+
+    def __str__(self):
+        return "Encoding cache for video %s" % (self.video.id)
+
+
 class PlaylistVideo(models.Model):
     name = models.CharField(
         _("Name"),
@@ -440,3 +491,21 @@ class PlaylistVideo(models.Model):
             if os.path.isfile(self.source_file.path):
                 os.remove(self.source_file.path)
         super(PlaylistVideo, self).delete()
+
+
+@receiver(post_save, sender=EncodingVideo)
+@receiver(post_save, sender=EncodingAudio)
+@receiver(post_save, sender=PlaylistVideo)
+@receiver(post_delete, sender=EncodingVideo)
+@receiver(post_delete, sender=EncodingAudio)
+@receiver(post_delete, sender=PlaylistVideo)
+def update_video_media_flags(sender, instance, **kwargs) -> None:
+    """Update the media availability flags of the video of an encoding."""
+    from pod.video.context_processors import clear_video_data
+
+    if isinstance(kwargs.get("origin"), Video):
+        # the encodings are deleted with their video
+        return
+    instance.video.update_media_flags()
+    # the available videos are counted from these flags
+    clear_video_data("VIDEOS_COUNT")
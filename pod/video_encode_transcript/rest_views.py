@@ -172,6 +172,14 @@ def launch_encode_view(request):
     return Response(VideoSerializer(instance=video, context={"request": request}).data)
 
 
+@api_view(["GET"])
+def encoding_queue_view(request):
+    """View API for inspecting the encoding queue."""
+    from .encoding_scheduler import get_encoding_queue_info
+
+    return Response(get_encoding_queue_info())
+
+
 @api_view(["GET"])
 def launch_transcript_view(request):
     """View API for launching transcript."""
@@ -0,0 +1,122 @@
+"""
+Encoding cache test cases.
+
+*  run with `python manage.py test pod.video_encode_transcript.tests.test_encoding_cache`
+"""
+
+from django.conf import settings
+from django.test import TestCase
+from django.core.files import File
+from django.core.files.temp import NamedTemporaryFile
+from django.contrib.auth.models import User
+from unittest import mock
+
+from pod.video.models import Video, Type
+from pod.video_encode_transcript import encode
+from pod.video_encode_transcript.encode import get_encoding_video
+from pod.video_encode_transcript.encoding_cache import (
+    get_cached_video,
+    get_encoding_key,
+    set_encoding_key,
+)
+from pod.video_encode_transcript.models import EncodingCache, EncodingStep
+
+import shutil
+import os
+
+if getattr(settings, "USE_PODFILE", False):
+    __FILEPICKER__ = True
+    from pod.podfile.models import CustomImageModel
+else:
+    __FILEPICKER__ = False
+    from pod.main.models import CustomImageModel
+
+VIDEO_TEST = getattr(settings, "VIDEO_TEST", "pod/main/static/video_test/pod.mp4")
+IMAGE_TEST = "pod/video_encode_transcript/tests/testimage.jpg"
+
+
+class EncodingCacheTestCase(TestCase):
+    """Encoding cache tests."""
+
+    fixtures = [
+        "initial_data.json",
+    ]
+
+    def setUp(self):
+        """Set up encoding cache tests."""
+        user = User.objects.create(username="pod", password="pod1234pod")
+        for index in range(2):
+            video = Video.objects.create(
+                title="Video%s" % index,
+                owner=user,
+                video="test.mp4",
+                type=Type.objects.get(id=1),
+            )
+            tempfile = NamedTemporaryFile(delete=True)
+            video.video.save("test.mp4", tempfile)
+            dest = os.path.join(settings.MEDIA_ROOT, video.video.name)
+            shutil.copyfile(VIDEO_TEST, dest)
+        print(" --->  SetUp of EncodingCacheTestCase: OK!")
+
+    def test_encoding_key(self):
+        """Check that the key only depends on the encoding parameters."""
+        video, other = Video.objects.all().order_by("id")
+        encoding_video = get_encoding_video(video)
+        key = get_encoding_key(video, encoding_video)
+        self.assertEqual(len(key), 64)
+        self.assertEqual(key, get_encoding_key(other, get_encoding_video(other)))
+        cache = EncodingCache.objects.get(video=video)
+        self.assertEqual(cache.source_size, os.path.getsize(video.video.path))
+        encoding_video.cutting_start = 2
+        self.assertNotEqual(key, get_encoding_key(video, encoding_video))
+        print(" --->  test_encoding_key of EncodingCacheTestCase: OK!")
+
+    def test_cached_video_without_files(self):
+        """Check that a video without encoded files is not reused."""
+        video, other = Video.objects.all().order_by("id")
+        key = get_encoding_key(video, get_encoding_video(video))
+        set_encoding_key(video, key)
+        self.assertIsNone(get_cached_video(other, key))
+        self.assertIsNone(get_cached_video(other, ""))
+        print(" --->  test_cached_video_without_files of EncodingCacheTestCase: OK!")
+
+    def test_encoding_already_up_to_date(self):
+        """Check that a video encoded with the same key is not encoded again."""
+        video = Video.objects.all().order_by("id").first()
+        encoding_video = get_encoding_video(video)
+        key = get_encoding_key(video, encoding_video)
+        set_encoding_key(video, key)
+        with mock.patch.object(
+            encode, "get_cached_video", return_value=video
+        ), mock.patch.object(encode, "end_of_encoding") as end_of_encoding:
+            self.assertTrue(encode.encode_video_from_cache(video, encoding_video))
+        end_of_encoding.assert_not_called()
+        self.assertEqual(EncodingCache.objects.get(video=video).key, key)
+        self.assertEqual(EncodingStep.objects.get(video=video).num_step, 0)
+        self.assertFalse(Video.objects.get(id=video.id).encoding_in_progress)
+        print(" --->  test_encoding_already_up_to_date of EncodingCacheTestCase: OK!")
+
+    def test_store_cached_thumbnail(self):
+        """Check that the thumbnail of the cached video is copied, not shared."""
+        video, other = Video.objects.all().order_by("id")
+        thumbnail = CustomImageModel()
+        if __FILEPICKER__:
+            thumbnail = CustomImageModel(
+                folder=other.get_or_create_video_folder(), created_by=other.owner
+            )
+        with open(IMAGE_TEST, "rb") as image_file:
+            thumbnail.file.save("other.jpg", File(image_file), save=True)
+        other.thumbnail = thumbnail
+        other.save()
+        video = get_encoding_video(video).store_cached_thumbnail(other)
+        self.assertNotEqual(video.thumbnail.id, thumbnail.id)
+        self.assertNotEqual(video.thumbnail.file.path, thumbnail.file.path)
+        self.assertTrue(video.thumbnail.file.name.endswith(".jpg"))
+        if __FILEPICKER__:
+            self.assertEqual(video.thumbnail.folder, video.get_or_create_video_folder())
+        # the thumbnail is kept when the cached video is deleted
+        other.delete()
+        thumbnail.delete()
+        video = Video.objects.get(id=video.id)
+        self.assertTrue(os.path.exists(video.thumbnail.file.path))
+        print(" --->  test_store_cached_thumbnail of EncodingCacheTestCase: OK!")
@@ -0,0 +1,133 @@
+"""
+Encoding scheduler test cases.
+
+*  run with `python manage.py test pod.video_encode_transcript.tests.test_encoding_scheduler`
+"""
+
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.utils import timezone
+
+from pod.video.models import Video, Type
+from pod.video_encode_transcript import encoding_scheduler
+from pod.video_encode_transcript.models import (
+    EncodingLog,
+    EncodingStep,
+    ENCODING_PRIORITY_BATCH,
+    ENCODING_PRIORITY_INTERACTIVE,
+    ENCODING_PRIORITY_REENCODE,
+)
+
+
+class EncodingSchedulerTestCase(TestCase):
+    """Encoding scheduler tests."""
+
+    fixtures = [
+        "initial_data.json",
+    ]
+
+    def setUp(self):
+        """Set up encoding scheduler tests."""
+        user = User.objects.create(username="pod", password="pod1234pod")
+        for index, (priority, duration) in enumerate(
+            [
+                (ENCODING_PRIORITY_REENCODE, 60),
+                (ENCODING_PRIORITY_INTERACTIVE, 7200),
+                (ENCODING_PRIORITY_INTERACTIVE, 300),
+                (ENCODING_PRIORITY_BATCH, 10),
+            ]
+        ):
+            video = Video.objects.create(
+                title="Video%s" % index,
+                owner=user,
+                video="test%s.mp4" % index,
+                type=Type.objects.get(id=1),
+                duration=duration,
+            )
+            EncodingStep.objects.create(
+                video=video,
+                priority=priority,
+                duration=duration,
+                date_queued=timezone.now(),
+            )
+        print(" --->  SetUp of EncodingSchedulerTestCase: OK!")
+
+    def test_encoding_queue_order(self):
+        """Check that the queue is ordered by priority then duration."""
+        queue = [step.video.title for step in encoding_scheduler.get_encoding_queue()]
+        self.assertEqual(queue, ["Video2", "Video1", "Video3", "Video0"])
+        info = encoding_scheduler.get_encoding_queue_info()
+        self.assertEqual(info["running"], [])
+        self.assertEqual(info["waiting"][0]["position"], 1)
+        self.assertEqual(info["waiting"][0]["title"], "Video2")
+        print(" --->  test_encoding_queue_order of EncodingSchedulerTestCase: OK!")
+
+    def test_encoding_priority(self):
+        """Check the default priority of a video."""
+        video = Video.objects.get(title="Video0")
+        self.assertEqual(
+            encoding_scheduler.get_encoding_priority(video),
+            ENCODING_PRIORITY_INTERACTIVE,
+        )
+        EncodingLog.objects.create(video=video)
+        self.assertEqual(
+            encoding_scheduler.get_encoding_priority(video),
+            ENCODING_PRIORITY_REENCODE,
+        )
+        print(" --->  test_encoding_priority of EncodingSchedulerTestCase: OK!")
+
+    @patch.object(encoding_scheduler, "ENCODING_MAX_CONCURRENT", 2)
+    @patch.object(encoding_scheduler, "launch_encoding_job")
+    def test_dispatch_encode(self, launch_encoding_job):
+        """Check that no more encodings than allowed are started on a node."""
+        encoding_scheduler.dispatch_encode()
+        started = [call.args[0] for call in launch_encoding_job.call_args_list]
+        self.assertEqual(
+            started,
+            [
+                Video.objects.get(title="Video2").id,
+                Video.objects.get(title="Video1").id,
+            ],
+        )
+        self.assertEqual(encoding_scheduler.get_running_encodings().count(), 2)
+        encoding_scheduler.dispatch_encode()
+        self.assertEqual(launch_encoding_job.call_count, 2)
+        print(" --->  test_dispatch_encode of EncodingSchedulerTestCase: OK!")
+
+    @patch.object(encoding_scheduler, "ENCODING_SLOT_TIMEOUT", 3600)
+    def test_release_stale_encodings(self):
+        """Check that an encoding started too long ago gives its place back."""
+        stale = EncodingStep.objects.get(video__title="Video0")
+        stale.node = "node1"
+        stale.date_started = timezone.now() - timedelta(hours=2)
+        stale.save()
+        running = EncodingStep.objects.get(video__title="Video1")
+        running.date_started = timezone.now()
+        running.save()
+        self.assertEqual(encoding_scheduler.release_stale_encodings(), 1)
+        stale.refresh_from_db()
+        self.assertIsNone(stale.date_started)
+        self.assertEqual(stale.node, "")
+        self.assertIsNotNone(stale.date_queued)
+        self.assertEqual(list(encoding_scheduler.get_running_encodings()), [running])
+        print(" --->  test_release_stale_encodings of EncodingSchedulerTestCase: OK!")
+
+    def test_call_encode(self):
+        """Check that the priority is only given to the functions accepting it."""
+        calls = []
+
+        def encode_with_priority(video_id, priority=None):
+            calls.append((video_id, priority))
+
+        def encode_without_priority(video_id):
+            calls.append((video_id,))
+
+        encoding_scheduler.call_encode(encode_with_priority, 1, ENCODING_PRIORITY_BATCH)
+        encoding_scheduler.call_encode(
+            encode_without_priority, 2, ENCODING_PRIORITY_BATCH
+        )
+        self.assertEqual(calls, [(1, ENCODING_PRIORITY_BATCH), (2,)])
+        print(" --->  test_call_encode of EncodingSchedulerTestCase: OK!")
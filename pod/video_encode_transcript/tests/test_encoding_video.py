@@ -0,0 +1,232 @@
+"""
+Encoding_video command test cases.
+
+*  run with `python manage.py test pod.video_encode_transcript.tests.test_encoding_video`
+"""
+
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from pod.video_encode_transcript import Encoding_video, encoding_utils
+from pod.video_encode_transcript.encoding_settings import VIDEO_RENDITIONS
+
+
+@mock.patch.object(encoding_utils, "get_renditions", return_value=VIDEO_RENDITIONS)
+class SegmentEncodingTestCase(SimpleTestCase):
+    """Segment-parallel encoding tests."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.encoding_video = Encoding_video.Encoding_video(
+            1, os.path.join(self.directory, "test.mp4")
+        )
+        self.encoding_video.create_output_dir()
+        self.output_dir = self.encoding_video.output_dir
+        self.segment_dir = os.path.join(self.output_dir, "segments")
+        os.mkdir(self.segment_dir)
+        self.encoding_video.duration = 1200
+        self.encoding_video.list_video_track = {"0": {"width": 1280, "height": 720}}
+        self.encoding_video.list_audio_track = {"1": {"sample_rate": 48000}}
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_get_segment_outputs(self, get_renditions):
+        """Check that the renditions are the ones of the MP4 and HLS commands."""
+        self.assertEqual(
+            self.encoding_video.get_segment_outputs(),
+            {
+                (360, 360): {"mp4": True, "hls": True},
+                (720, 720): {"mp4": True, "hls": True},
+            },
+        )
+        # the renditions higher than the source are not encoded
+        self.encoding_video.list_video_track = {"0": {"width": 854, "height": 480}}
+        self.assertEqual(
+            self.encoding_video.get_segment_outputs(),
+            {(360, 360): {"mp4": True, "hls": True}},
+        )
+        print(" --->  test_get_segment_outputs of SegmentEncodingTestCase: OK!")
+
+    def test_get_segment_command(self, get_renditions):
+        """Check that a segment is cut on the input and encoded in all renditions."""
+        outputs = self.encoding_video.get_segment_outputs()
+        command = self.encoding_video.get_segment_command(
+            2, (600.5, 300, False), outputs, self.segment_dir
+        )
+        self.assertTrue(command.startswith("ffmpeg -hide_banner"))
+        cut, input_file = command.split(" -i ")[:2]
+        self.assertIn("-ss 600.5 -t 300 ", cut)
+        self.assertTrue(input_file.startswith('"%s"' % self.encoding_video.video_file))
+        self.assertEqual(command.count("-map 0:v:0 -an"), 2)
+        self.assertIn(os.path.join(self.segment_dir, "360p_360_002.mp4"), command)
+        self.assertIn(os.path.join(self.segment_dir, "720p_720_002.mp4"), command)
+        # the last segment is read until the end of the source
+        command = self.encoding_video.get_segment_command(
+            3, (900.5, 299.5, True), outputs, self.segment_dir
+        )
+        cut = command.split(" -i ")[0]
+        self.assertIn("-ss 900.5 ", cut)
+        self.assertNotIn("-t ", cut)
+        # unless the video is cut
+        self.encoding_video.cutting_stop = 1100
+        command = self.encoding_video.get_segment_command(
+            3, (900.5, 199.5, True), outputs, self.segment_dir
+        )
+        self.assertIn("-ss 900.5 -t 199.5 ", command.split(" -i ")[0])
+        print(" --->  test_get_segment_command of SegmentEncodingTestCase: OK!")
+
+    def test_get_segment_join_command(self, get_renditions):
+        """Check that the segments are listed and joined with the audio."""
+        output = os.path.join(self.output_dir, "720p.mp4")
+        command = self.encoding_video.get_segment_join_command(
+            720, 720, 3, self.segment_dir, output
+        )
+        list_file = os.path.join(self.segment_dir, "720p_720.txt")
+        with open(list_file) as f:
+            self.assertEqual(
+                f.read().splitlines(),
+                [
+                    "file '%s'" % os.path.join(self.segment_dir, "720p_720_%03d.mp4" % i)
+                    for i in range(3)
+                ],
+            )
+        self.assertIn('-f concat -safe 0 -i "%s"' % list_file, command)
+        self.assertIn(
+            '-i "%s" -map 0:v:0 -map 1:a:0' % self.encoding_video.video_file, command
+        )
+        self.assertIn("-b:a 128k", command)
+        self.assertTrue(command.strip().endswith('"%s"' % output))
+        # the audio is cut as the video
+        self.encoding_video.cutting_start = 10
+        self.encoding_video.cutting_stop = 1010
+        self.encoding_video.duration = 1000
+        command = self.encoding_video.get_segment_join_command(
+            720, 720, 3, self.segment_dir, output
+        )
+        self.assertIn("-ss 10 -t 1000 -i", command)
+        # without audio track
+        self.encoding_video.list_audio_track = {}
+        command = self.encoding_video.get_segment_join_command(
+            720, 720, 3, self.segment_dir, output
+        )
+        self.assertNotIn("-map 1:a:0", command)
+        print(" --->  test_get_segment_join_command of SegmentEncodingTestCase: OK!")
+
+    def test_segment_encoding_fallback(self, get_renditions):
+        """Check that a failed segment encoding is made again in one process."""
+
+        def launch_cmd(cmd):
+            if failed_command in cmd:
+                return False, "error"
+            return True, ""
+
+        with mock.patch.object(
+            Encoding_video, "FFMPEG_SEGMENT_ENCODING", True
+        ), mock.patch.object(
+            Encoding_video, "FFMPEG_SEGMENT_NB_WORKERS", 2
+        ), mock.patch.object(
+            Encoding_video, "launch_cmd", side_effect=launch_cmd
+        ), mock.patch.object(
+            Encoding_video.Encoding_video, "get_keyframe", side_effect=lambda t: t
+        ):
+            # a failed join of the segments
+            failed_command = "-f concat"
+            self.assertFalse(self.encoding_video.encode_video_segments())
+            self.assertTrue(self.encoding_video.error_encoding)
+            self.encoding_video.error_encoding = False
+            # a failed segment
+            failed_command = "_000.mp4"
+            self.encoding_video.encode_video_part()
+        self.assertFalse(self.encoding_video.error_encoding)
+        self.assertIn("segment_command_000", self.encoding_video.encoding_log)
+        self.assertIn("mp4_command", self.encoding_video.encoding_log)
+        self.assertEqual(
+            self.encoding_video.list_mp4_files,
+            {
+                360: os.path.join(self.output_dir, "360p.mp4"),
+                720: os.path.join(self.output_dir, "720p.mp4"),
+            },
+        )
+        print(" --->  test_segment_encoding_fallback of SegmentEncodingTestCase: OK!")
+
+
+@mock.patch.object(encoding_utils, "get_renditions", return_value=VIDEO_RENDITIONS)
+class SingleDecodeTestCase(SimpleTestCase):
+    """Single decode encoding tests."""
+
+    def setUp(self):
+        self.encoding_video = Encoding_video.Encoding_video(1, "/videos/test.mp4")
+        self.encoding_video.output_dir = "/videos/0001"
+        self.encoding_video.duration = 60
+        self.encoding_video.list_video_track = {"0": {"width": 1280, "height": 720}}
+        self.encoding_video.list_audio_track = {"1": {"sample_rate": 48000}}
+
+    def check_outputs(self, outputs):
+        """Check that the outputs have neither input nor cut."""
+        self.assertEqual(
+            list(outputs),
+            [
+                "mp4_command",
+                "hls_command",
+                "mp3_command",
+                "create_thumbnail_command",
+                "overview_command",
+            ],
+        )
+        for command in outputs.values():
+            self.assertNotIn("ffmpeg", command)
+            self.assertNotIn(" -i ", command)
+            self.assertNotIn("-ss ", command)
+            self.assertNotIn("-to ", command)
+        self.assertIn('"/videos/0001/720p.mp4"', outputs["mp4_command"])
+
+    def test_single_decode_without_cut(self, get_renditions):
+        """Check the command of a video without cut."""
+        self.check_outputs(self.encoding_video.get_single_decode_outputs())
+        self.assertEqual(
+            self.encoding_video.get_single_decode_input(),
+            'ffmpeg -hide_banner -threads 0 -i "/videos/test.mp4" ',
+        )
+        print(" --->  test_single_decode_without_cut of SingleDecodeTestCase: OK!")
+
+    def test_single_decode_with_cut(self, get_renditions):
+        """Check that the cut is moved from the outputs to the input."""
+        self.encoding_video.cutting_start = 10
+        self.encoding_video.cutting_stop = 70
+        self.check_outputs(self.encoding_video.get_single_decode_outputs())
+        # the cut of the video is kept
+        self.assertEqual(self.encoding_video.cutting_start, 10)
+        self.assertEqual(self.encoding_video.cutting_stop, 70)
+        self.assertEqual(
+            self.encoding_video.get_single_decode_input(),
+            'ffmpeg -ss 10 -t 60 -hide_banner -threads 0 -i "/videos/test.mp4" ',
+        )
+        print(" --->  test_single_decode_with_cut of SingleDecodeTestCase: OK!")
+
+    def test_encode_single_decode(self, get_renditions):
+        """Check that the source is read once for all outputs."""
+        self.encoding_video.cutting_start = 10
+        self.encoding_video.cutting_stop = 70
+        with mock.patch.object(
+            Encoding_video, "launch_cmd", return_value=(True, "")
+        ) as launch_cmd, mock.patch.object(
+            Encoding_video.Encoding_video, "create_main_livestream"
+        ), mock.patch.object(
+            Encoding_video.Encoding_video, "create_overview_vtt"
+        ):
+            self.assertTrue(self.encoding_video.encode_single_decode())
+        command = launch_cmd.call_args.args[0]
+        self.assertEqual(command.count("ffmpeg"), 1)
+        self.assertEqual(command.count(" -i "), 1)
+        self.assertTrue(command.startswith("ffmpeg -ss 10 -t 60 "))
+        self.assertEqual(list(self.encoding_video.list_mp4_files), [360, 720])
+        self.assertEqual(
+            self.encoding_video.encoding_log["mp4_command"]["msg"],
+            "See single_decode_command",
+        )
+        print(" --->  test_encode_single_decode of SingleDecodeTestCase: OK!")
@@ -0,0 +1,64 @@
+"""
+Incremental encoding test cases.
+
+*  run with `python manage.py test pod.video_encode_transcript.tests.test_incremental_encoding`
+"""
+
+from django.test import SimpleTestCase
+
+from pod.video_encode_transcript.Encoding_video_model import Encoding_video_model
+
+WATERMARK = {"watermark_path": "/logo.png", "position_orig": "top_right", "opacity": 50}
+
+
+class IncrementalEncodingTestCase(SimpleTestCase):
+    """Incremental encoding tests."""
+
+    def get_previous(self, start=0, stop=0, duration=600, json_dressing=None):
+        """Get the data of a previous encoding."""
+        return {
+            "cutting_start": start,
+            "cutting_stop": stop,
+            "duration": duration,
+            "json_dressing": json_dressing,
+            "list_video_track": {"0": {"width": 1280, "height": 720}},
+        }
+
+    def test_incremental_mode_cut(self):
+        """Check that a cut inside the previous one is made by stream copy."""
+        encoding_video = Encoding_video_model(1, "/test.mp4", 10, 100)
+        mode = encoding_video.get_incremental_mode(self.get_previous())
+        self.assertEqual(mode, "cut")
+        mode = encoding_video.get_incremental_mode(self.get_previous(5, 200, 195))
+        self.assertEqual(mode, "cut")
+        # the new cut is outside the previous one
+        mode = encoding_video.get_incremental_mode(self.get_previous(20, 200, 180))
+        self.assertEqual(mode, "")
+        # the cut is removed
+        encoding_video = Encoding_video_model(1, "/test.mp4", 0, 0)
+        mode = encoding_video.get_incremental_mode(self.get_previous(20, 200, 180))
+        self.assertEqual(mode, "")
+        print(" --->  test_incremental_mode_cut of IncrementalEncodingTestCase: OK!")
+
+    def test_incremental_mode_dressing(self):
+        """Check that a watermark change keeps the audio."""
+        encoding_video = Encoding_video_model(1, "/test.mp4", json_dressing=WATERMARK)
+        mode = encoding_video.get_incremental_mode(self.get_previous())
+        self.assertEqual(mode, "dressing")
+        # nothing changed
+        mode = encoding_video.get_incremental_mode(
+            self.get_previous(json_dressing=WATERMARK)
+        )
+        self.assertEqual(mode, "")
+        # cut and dressing changed
+        encoding_video.cutting_stop = 100
+        mode = encoding_video.get_incremental_mode(self.get_previous())
+        self.assertEqual(mode, "")
+        # credits change the audio too
+        encoding_video = Encoding_video_model(
+            1, "/test.mp4", json_dressing=dict(WATERMARK, opening_credits="intro")
+        )
+        mode = encoding_video.get_incremental_mode(self.get_previous())
+        self.assertEqual(mode, "")
+        self.assertEqual(encoding_video.get_incremental_mode({}), "")
+        print(" --->  test_incremental_mode_dressing of IncrementalEncodingTestCase: OK!")
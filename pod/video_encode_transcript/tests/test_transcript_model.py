@@ -0,0 +1,144 @@
+"""
+Unit tests for Esup-Pod transcription by chunks.
+
+Run with `python manage.py test pod.video_encode_transcript.tests.test_transcript_model`
+"""
+
+import json
+import unittest
+from concurrent.futures.process import BrokenProcessPool
+from unittest import mock
+from .. import transcript_model
+from ..transcript_model import AudioStream, pcm_to_float
+from ..transcript_model import get_vosk_captions, shift_whisper_transcription
+
+
+class TranscriptChunksTests(unittest.TestCase):
+    """TestCase for the join of the transcribed chunks."""
+
+    def test_shift_whisper_transcription(self) -> None:
+        """Test for the shift_whisper_transcription function."""
+        transcription = {
+            "text": " Bonjour",
+            "language": "fr",
+            "segments": [
+                {
+                    "start": 1.5,
+                    "end": 2.0,
+                    "text": " Bonjour",
+                    "words": [{"word": " Bonjour", "start": 1.5, "end": 2.0}],
+                }
+            ],
+        }
+        result = shift_whisper_transcription(transcription, 600)
+        self.assertEqual(result["text"], " Bonjour")
+        self.assertEqual(result["segments"][0]["start"], 601.5)
+        self.assertEqual(result["segments"][0]["end"], 602.0)
+        self.assertEqual(result["segments"][0]["words"][0]["start"], 601.5)
+        print(" --->  test_shift_whisper_transcription: OK!")
+
+    def test_get_vosk_captions(self) -> None:
+        """Test for the get_vosk_captions function."""
+        results = [
+            json.dumps(
+                {
+                    "result": [
+                        {"word": "bonjour", "start": 0.5, "end": 1.0},
+                        {"word": "à", "start": 1.1, "end": 1.2},
+                        {"word": "tous", "start": 1.3, "end": 1.6},
+                    ],
+                    "text": "bonjour à tous",
+                }
+            ),
+            json.dumps({"text": ""}),
+        ]
+        self.assertEqual(get_vosk_captions(results), [(0.5, 1.6, "bonjour à tous")])
+        self.assertEqual(
+            get_vosk_captions(results, 600), [(600.5, 601.6, "bonjour à tous")]
+        )
+        print(" --->  test_get_vosk_captions: OK!")
+
+    def test_pcm_to_float(self) -> None:
+        """Test for the pcm_to_float function."""
+        data = b"\x00\x00\x00\x40\x00\xc0"
+        self.assertEqual(list(pcm_to_float(data)), [0.0, 0.5, -0.5])
+        print(" --->  test_pcm_to_float: OK!")
+
+    def test_audio_stream_command(self) -> None:
+        """Test for the commands decoding the audio of an AudioStream."""
+        audio = AudioStream.__new__(AudioStream)
+        audio.sample_rate = 16000
+        command = audio.get_command("/audio.mp3", 0, None)
+        self.assertTrue(command.startswith("sox /audio.mp3 "))
+        self.assertTrue(command.endswith("--no-dither - trim 0"))
+        command = audio.get_command("/audio.mp3", 600, 300)
+        self.assertTrue(command.endswith("--no-dither - trim 600 300"))
+        command = audio.get_normalize_command("/audio.mp3", 600, 300)
+        self.assertIn("-ss 600 -t 300 -i /audio.mp3 -af loudnorm", command)
+        self.assertTrue(command.endswith("-ac 1 -ar 16000 -f s16le -"))
+        print(" --->  test_audio_stream_command: OK!")
+
+
+class ProcessPoolTests(unittest.TestCase):
+    """TestCase for the pool of transcription processes."""
+
+    def test_broken_process_pool(self) -> None:
+        """Test that a broken pool is replaced at the next transcription."""
+        pool = mock.Mock()
+        pool.map.side_effect = BrokenProcessPool("A process terminated abruptly")
+        with mock.patch.object(
+            transcript_model, "__PROCESS_POOL__", pool
+        ), mock.patch.object(
+            transcript_model, "TRANSCRIPTION_TYPE", "VOSK", create=True
+        ), mock.patch.object(
+            transcript_model, "get_transcription_chunks", return_value=[(0, 60)]
+        ), mock.patch.object(
+            transcript_model, "transcribe_chunk", return_value=[(0.5, 1.6, "bonjour")]
+        ) as transcribe_chunk:
+            msg, wvtt, all_text = transcript_model.main_parallel_transcript(
+                "/audio.mp3", 60, "fr"
+            )
+            pool.shutdown.assert_called_once()
+            self.assertIsNone(getattr(transcript_model, "__PROCESS_POOL__"))
+        # the chunks are transcribed in the current process
+        transcribe_chunk.assert_called_once_with("/audio.mp3", "fr", 0, 60)
+        self.assertEqual(wvtt.captions[0].text, "bonjour")
+        print(" --->  test_broken_process_pool: OK!")
+
+
+class WhisperTranscriptTests(unittest.TestCase):
+    """TestCase for the transcription of the audio window by window."""
+
+    def test_main_whisper_transcript(self) -> None:
+        """Test that the audio is read until its end, without silence detection."""
+        audio = mock.MagicMock()
+        audio.__enter__.return_value = audio
+        data = [b"\x00" * 32000, b"\x00" * 32000, b"\x00" * 16000, b""]
+        audio.read_seconds.side_effect = data
+        model = mock.Mock()
+        model.transcribe.side_effect = lambda *args, **kwargs: {
+            "text": " mot",
+            "segments": [{"start": 0.0, "end": 0.5, "words": []}],
+        }
+        with mock.patch.object(
+            transcript_model, "AudioStream", return_value=audio
+        ), mock.patch.object(
+            transcript_model, "TRANSCRIPTION_AUDIO_SPLIT_TIME", 1
+        ), mock.patch.object(
+            transcript_model, "get_model", return_value=model
+        ), mock.patch.object(
+            transcript_model, "get_silences"
+        ) as get_silences, mock.patch.object(
+            transcript_model, "whisper_transcription_to_vtt"
+        ) as to_vtt:
+            # the duration is rounded down
+            transcript_model.main_whisper_transcript("/audio.mp3", 2, "fr")
+        get_silences.assert_not_called()
+        audio.read_seconds.assert_called_with(1)
+        self.assertEqual(audio.read_seconds.call_count, 4)
+        transcription = to_vtt.call_args.args[0]
+        self.assertEqual(transcription["text"], " mot mot mot")
+        self.assertEqual(
+            [segment["start"] for segment in transcription["segments"]], [0, 1, 2]
+        )
+        print(" --->  test_main_whisper_transcript: OK!")
@@ -5,7 +5,11 @@ Run with `python manage.py test pod.video_encode_transcript.tests.EncodingUtilit
 """
 
 import unittest
-from ..encoding_utils import get_dressing_position_value, sec_to_timestamp
+from ..encoding_utils import (
+    get_dressing_position_value,
+    get_segment_ranges,
+    sec_to_timestamp,
+)
 
 
 class EncodingUtilitiesTests(unittest.TestCase):
@@ -32,3 +36,15 @@ class EncodingUtilitiesTests(unittest.TestCase):
         self.assertEqual(sec_to_timestamp(-1), "00:00:00.000")
         self.assertEqual(sec_to_timestamp(60.000), "00:01:00.000")
         print(" ---> sec_to_timestamp: OK! --- EncodginUtilsTest")
+
+    def test_get_segment_ranges(self) -> None:
+        """Test get_segment_ranges return values."""
+        self.assertEqual(get_segment_ranges(0, 30, 3), [(0, 10), (10, 10), (20, 10)])
+        self.assertEqual(get_segment_ranges(5, 10, 1), [(5, 10)])
+        # cut points are moved to the next keyframe
+        ranges = get_segment_ranges(0, 30, 3, lambda position: position + 2)
+        self.assertEqual(ranges, [(0, 12), (12, 10), (22, 8)])
+        # cut points out of the range are ignored
+        ranges = get_segment_ranges(0, 30, 3, lambda position: position + 20)
+        self.assertEqual(ranges, [(0, 30)])
+        print(" ---> get_segment_ranges: OK! --- EncodginUtilsTest")
@@ -3,7 +3,12 @@ import shlex
 import subprocess
 import json
 
+import math
 import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
 from timeit import default_timer as timer
 import datetime as dt
 from datetime import timedelta
@@ -18,7 +23,7 @@ try:
 except ImportError:
     from .. import settings as settings_local
 
-from .encoding_utils import sec_to_timestamp
+from .encoding_utils import get_segment_ranges, sec_to_timestamp
 
 DEBUG = getattr(settings_local, "DEBUG", False)
 
@@ -47,24 +52,73 @@ TRANSCRIPTION_STT_SENTENCE_MAX_LENGTH = getattr(
 TRANSCRIPTION_STT_SENTENCE_BLANK_SPLIT_TIME = getattr(
     settings_local, "TRANSCRIPTION_STT_SENTENCE_BLANK_SPLIT_TIME", 0.5
 )
+# number of processes transcribing the audio chunks at the same time, 0 to disable
+TRANSCRIPTION_NB_WORKERS = getattr(settings_local, "TRANSCRIPTION_NB_WORKERS", 0)
+# silences used to split the audio in chunks
+TRANSCRIPTION_SILENCE_NOISE = getattr(
+    settings_local, "TRANSCRIPTION_SILENCE_NOISE", "-30dB"
+)
+TRANSCRIPTION_SILENCE_DURATION = getattr(
+    settings_local, "TRANSCRIPTION_SILENCE_DURATION", 0.5
+)
 log = logging.getLogger(__name__)
 
+# models loaded by lang, kept for the life of the process
+__MODEL_POOL__ = {}
+__PROCESS_POOL__ = None
+
 
 def get_model(lang):
     """Get model for Whisper or Vosk software to transcript audio."""
-    transript_model = Model(TRANSCRIPTION_MODEL_PARAM[TRANSCRIPTION_TYPE][lang]["model"])
-    return transript_model
+    if lang not in __MODEL_POOL__:
+        model_param = TRANSCRIPTION_MODEL_PARAM[TRANSCRIPTION_TYPE][lang]
+        if TRANSCRIPTION_TYPE == "WHISPER":
+            __MODEL_POOL__[lang] = whisper.load_model(
+                model_param["model"], download_root=model_param["download_root"]
+            )
+        else:
+            __MODEL_POOL__[lang] = Model(model_param["model"])
+    return __MODEL_POOL__[lang]
+
+
+def init_transcription_worker():
+    """Share the CPU between the transcription processes."""
+    if TRANSCRIPTION_TYPE == "WHISPER":
+        import torch
+
+        torch.set_num_threads(max(1, (os.cpu_count() or 1) // TRANSCRIPTION_NB_WORKERS))
+
+
+def get_process_pool():
+    """Get the pool of processes transcribing the audio chunks."""
+    global __PROCESS_POOL__
+    if __PROCESS_POOL__ is None:
+        __PROCESS_POOL__ = ProcessPoolExecutor(
+            max_workers=TRANSCRIPTION_NB_WORKERS,
+            mp_context=get_context("spawn"),
+            initializer=init_transcription_worker,
+        )
+    return __PROCESS_POOL__
+
+
+def shutdown_process_pool():
+    """Shut down the pool of processes, created again by the next transcription."""
+    global __PROCESS_POOL__
+    if __PROCESS_POOL__ is not None:
+        __PROCESS_POOL__.shutdown(wait=False, cancel_futures=True)
+        __PROCESS_POOL__ = None
 
 
 def start_transcripting(mp3filepath, duration, lang):
     """
     Start direct transcription.
 
-    Normalize the audio if set, get the model according to the lang and start transcript.
+    Get the model according to the lang and start transcript, the audio being
+    normalized while it is decoded if set.
     """
-    if TRANSCRIPTION_NORMALIZE:
-        mp3filepath = normalize_mp3(mp3filepath)
-    if TRANSCRIPTION_TYPE == "WHISPER":
+    if TRANSCRIPTION_NB_WORKERS > 0:
+        msg, webvtt, all_text = main_parallel_transcript(mp3filepath, duration, lang)
+    elif TRANSCRIPTION_TYPE == "WHISPER":
         msg, webvtt, all_text = main_whisper_transcript(mp3filepath, duration, lang)
     else:
         transript_model = get_model(lang)
@@ -88,57 +142,115 @@ def start_main_transcript(mp3filepath, duration, transript_model):
     return msg, webvtt, all_text
 
 
-def convert_samplerate(audio_path, desired_sample_rate, trim_start, duration):
-    """Convert audio to subaudio and add good sample rate."""
-    sox_cmd = "sox {} --type raw --bits 16 --channels 1 --rate {} ".format(
-        quote(audio_path), desired_sample_rate
-    )
-    sox_cmd += "--encoding signed-integer --endian little --compression 0.0 "
-    sox_cmd += "--no-dither - trim {} {}".format(trim_start, duration)
+class AudioStream:
+    """
+    Audio decoded to 16 bits mono PCM by a child process, then read by frames.
 
-    try:
-        output = subprocess.check_output(shlex.split(sox_cmd), stderr=subprocess.PIPE)
+    Only the frames being read are in memory, whatever the duration of the audio.
+    The audio is decoded by SoX, or by ffmpeg with an EBU R128 loudness
+    normalization if normalize is set.
+    """
 
-    except subprocess.CalledProcessError as e:
-        raise RuntimeError("SoX returned non-zero status: {}".format(e.stderr))
-    except OSError as e:
-        raise OSError(
-            e.errno,
-            "SoX not found, use {}hz files or install it: {}".format(
-                desired_sample_rate, e.strerror
-            ),
+    def __init__(
+        self, audio_path, sample_rate, trim_start=0, duration=None, normalize=False
+    ):
+        """Start decoding audio_path from trim_start, for duration seconds if set."""
+        self.sample_rate = sample_rate
+        self.nb_bytes_read = 0
+        if normalize:
+            command = self.get_normalize_command(audio_path, trim_start, duration)
+        else:
+            command = self.get_command(audio_path, trim_start, duration)
+        try:
+            self.process = subprocess.Popen(
+                shlex.split(command), stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+            )
+        except OSError as e:
+            raise OSError(
+                e.errno,
+                "{} not found, install it: {}".format(command.split()[0], e.strerror),
+            )
+
+    def get_command(self, audio_path, trim_start, duration) -> str:
+        """Get the SoX command decoding the audio."""
+        sox_cmd = "sox {} --type raw --bits 16 --channels 1 --rate {} ".format(
+            quote(audio_path), self.sample_rate
+        )
+        sox_cmd += "--encoding signed-integer --endian little --compression 0.0 "
+        sox_cmd += "--no-dither - trim {}".format(trim_start)
+        if duration is not None:
+            sox_cmd += " {}".format(duration)
+        return sox_cmd
+
+    def get_normalize_command(self, audio_path, trim_start, duration) -> str:
+        """Get the ffmpeg command decoding and normalizing the audio."""
+        ffmpeg_cmd = "ffmpeg -hide_banner -nostats -loglevel error -ss {} ".format(
+            trim_start
+        )
+        if duration is not None:
+            ffmpeg_cmd += "-t {} ".format(duration)
+        ffmpeg_cmd += "-i {} -af loudnorm=I={} ".format(
+            quote(audio_path), TRANSCRIPTION_NORMALIZE_TARGET_LEVEL
         )
+        ffmpeg_cmd += "-ac 1 -ar {} -f s16le -".format(self.sample_rate)
+        return ffmpeg_cmd
+
+    def read(self, nb_bytes) -> bytes:
+        """Read nb_bytes of audio, or less at the end of the audio."""
+        data = b""
+        while len(data) < nb_bytes:
+            block = self.process.stdout.read(nb_bytes - len(data))
+            if not block:
+                break
+            data += block
+        self.nb_bytes_read += len(data)
+        return data
+
+    def read_seconds(self, seconds) -> bytes:
+        """Read the given number of seconds of audio."""
+        return self.read(int(seconds * self.sample_rate) * 2)
+
+    def frames(self, frame_size=4000):
+        """Iterate over the audio by frames of frame_size bytes."""
+        while True:
+            data = self.read(frame_size)
+            if len(data) == 0:
+                break
+            yield data
+
+    def close(self) -> None:
+        """Stop the decoding process."""
+        self.process.stdout.close()
+        return_code = self.process.wait()
+        if return_code > 0 and self.nb_bytes_read == 0:
+            raise RuntimeError(
+                "Audio decoding returned non-zero status: %s" % return_code
+            )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
 
+
+def pcm_to_float(data):
+    """Convert 16 bits PCM audio to the float32 samples used by Whisper."""
+    return np.frombuffer(data, np.int16).astype(np.float32) / 32768.0
+
+
+def convert_samplerate(audio_path, desired_sample_rate, trim_start, duration):
+    """Convert audio to subaudio and add good sample rate."""
+    with AudioStream(
+        audio_path, desired_sample_rate, trim_start, duration, TRANSCRIPTION_NORMALIZE
+    ) as audio:
+        output = audio.read_seconds(duration)
     if TRANSCRIPTION_TYPE == "WHISPER":
-        return np.frombuffer(output, np.int16).flatten().astype(np.float32) / 32768.0
+        return pcm_to_float(output)
     else:
         return np.frombuffer(output, np.int16)
 
 
-def normalize_mp3(mp3filepath):
-    """Normalize the audio to good format and sound level."""
-    filename, file_extension = os.path.splitext(mp3filepath)
-    mp3normfile = "{}{}{}".format(filename, "_norm", file_extension)
-    normalize_cmd = "ffmpeg-normalize {} ".format(quote(mp3filepath))
-    normalize_cmd += "-c:a libmp3lame -b:a 192k --normalization-type ebu "
-    # normalize_cmd += \
-    # '--loudness-range-target 7.0 --true-peak 0.0 --offset 0.0 '
-    normalize_cmd += "--target-level {} -f -o {}".format(
-        TRANSCRIPTION_NORMALIZE_TARGET_LEVEL, quote(mp3normfile)
-    )
-    if DEBUG:
-        print(normalize_cmd)
-    try:
-        subprocess.check_output(shlex.split(normalize_cmd), stderr=subprocess.PIPE)
-        return mp3normfile
-    except subprocess.CalledProcessError as e:
-        log.error("ffmpeg-normalize returned non-zero status: {}".format(e.stderr))
-        return mp3filepath
-    except OSError as e:
-        log.error("ffmpeg-normalize not found {}".format(e.strerror))
-        return mp3filepath
-
-
 # #################################
 # TRANSCRIPT VIDEO: MAIN FUNCTION
 # #################################
@@ -146,35 +258,17 @@ def normalize_mp3(mp3filepath):
 
 def convert_vosk_samplerate(audio_path, desired_sample_rate, trim_start, duration):
     """Convert audio to the good sample rate."""
-    sox_cmd = "sox {} --type raw --bits 16 --channels 1 --rate {} ".format(
-        quote(audio_path), desired_sample_rate
+    return AudioStream(
+        audio_path, desired_sample_rate, trim_start, duration, TRANSCRIPTION_NORMALIZE
     )
-    sox_cmd += "--encoding signed-integer --endian little --compression 0.0 "
-    sox_cmd += "--no-dither - trim {} {}".format(trim_start, duration)
-
-    try:
-        output = subprocess.Popen(shlex.split(sox_cmd), stdout=subprocess.PIPE)
-
-    except subprocess.CalledProcessError as e:
-        raise RuntimeError("SoX returned non-zero status: {}".format(e.stderr))
-    except OSError as e:
-        raise OSError(
-            e.errno,
-            "SoX not found, use {}hz files or install it: {}".format(
-                desired_sample_rate, e.strerror
-            ),
-        )
-    return output
 
 
 def get_word_result_from_data(results, audio, rec):
     """Get subsound from audio and add transcription to result parameter."""
-    while True:
-        data = audio.stdout.read(4000)
-        if len(data) == 0:
-            break
-        if rec.AcceptWaveform(data):
-            results.append(rec.Result())
+    with audio:
+        for data in audio.frames():
+            if rec.AcceptWaveform(data):
+                results.append(rec.Result())
     results.append(rec.Result())
 
 
@@ -266,23 +360,13 @@ def main_vosk_transcript(norm_mp3_file, duration, transript_model):
 
     webvtt = WebVTT()
     all_text = ""
-    for start_trim in range(0, duration, TRANSCRIPTION_AUDIO_SPLIT_TIME):
-        audio = convert_vosk_samplerate(
-            norm_mp3_file,
-            desired_sample_rate,
-            start_trim,
-            TRANSCRIPTION_AUDIO_SPLIT_TIME,  # dur
-        )
-        msg += "\nRunning inference."
-        results = []
-        get_word_result_from_data(results, audio, rec)
-        for res in results:
-            words = json.loads(res).get("result")
-            text = json.loads(res).get("text")
-            if not words:
-                continue
-            start_caption = words[0]["start"]
-            stop_caption = words[-1]["end"]
+    # the whole audio is streamed to the recognizer
+    audio = convert_vosk_samplerate(norm_mp3_file, desired_sample_rate, 0, None)
+    msg += "\nRunning inference."
+    results = []
+    get_word_result_from_data(results, audio, rec)
+    if results:
+        for start_caption, stop_caption, text in get_vosk_captions(results):
             caption = Caption(
                 sec_to_timestamp(start_caption),
                 sec_to_timestamp(stop_caption),
@@ -310,6 +394,18 @@ def main_vosk_transcript(norm_mp3_file, duration, transript_model):
     return msg, webvtt, all_text
 
 
+def get_vosk_captions(results, offset=0) -> list:
+    """Get the (start, end, text) captions from the Vosk results."""
+    captions = []
+    for res in results:
+        words = json.loads(res).get("result")
+        text = json.loads(res).get("text")
+        if not words:
+            continue
+        captions.append((offset + words[0]["start"], offset + words[-1]["end"], text))
+    return captions
+
+
 def main_whisper_transcript(norm_mp3_file, duration, lang):
     """Whisper transcription."""
     msg = ""
@@ -318,22 +414,162 @@ def main_whisper_transcript(norm_mp3_file, duration, lang):
     desired_sample_rate = 16000
     msg += "\nInference start %0.3fs." % inference_start
 
-    model = whisper.load_model(
-        TRANSCRIPTION_MODEL_PARAM[TRANSCRIPTION_TYPE][lang]["model"],
-        download_root=TRANSCRIPTION_MODEL_PARAM[TRANSCRIPTION_TYPE][lang][
-            "download_root"
-        ],
-    )
-    audio = convert_samplerate(norm_mp3_file, desired_sample_rate, 0, duration)
-    transcription = model.transcribe(
-        audio, language=lang, initial_prompt="prompt", word_timestamps=True
-    )
+    model = get_model(lang)
+    transcription = {"text": "", "segments": [], "language": lang}
+    # the audio is decoded once and transcribed window by window until its end
+    start = 0
+    with AudioStream(
+        norm_mp3_file, desired_sample_rate, normalize=TRANSCRIPTION_NORMALIZE
+    ) as audio:
+        while True:
+            data = audio.read_seconds(TRANSCRIPTION_AUDIO_SPLIT_TIME)
+            if len(data) == 0:
+                break
+            result = shift_whisper_transcription(
+                model.transcribe(
+                    pcm_to_float(data),
+                    language=lang,
+                    initial_prompt="prompt",
+                    word_timestamps=True,
+                ),
+                start,
+            )
+            transcription["text"] += result["text"]
+            transcription["segments"] += result["segments"]
+            start += len(data) / 2 / desired_sample_rate
+    wvtt = whisper_transcription_to_vtt(transcription, norm_mp3_file)
+    inference_end = timer() - inference_start
+    msg += "\nInference took %0.3fs." % inference_end
+    return msg, wvtt, all_text
+
+
+def whisper_transcription_to_vtt(transcription, norm_mp3_file):
+    """Write the Whisper transcription to a WebVTT file next to the audio file."""
     dirname = os.path.dirname(norm_mp3_file)
     filename = os.path.basename(norm_mp3_file).replace(".mp3", ".vtt")
     vtt_writer = get_writer("vtt", dirname)
     word_options = {"highlight_words": False, "max_line_count": 2, "max_line_width": 40}
     vtt_writer(transcription, filename, word_options)
-    wvtt = webvtt.read(os.path.join(dirname, filename))
+    return webvtt.read(os.path.join(dirname, filename))
+
+
+# #################################
+# PARALLEL TRANSCRIPTION BY CHUNKS
+# #################################
+
+
+def get_silences(audio_path) -> list:
+    """Get the middle time of the silences of an audio file."""
+    silence_cmd = "ffmpeg -hide_banner -nostats -i {} ".format(quote(audio_path))
+    silence_cmd += "-af silencedetect=noise={}:d={} -f null -".format(
+        TRANSCRIPTION_SILENCE_NOISE, TRANSCRIPTION_SILENCE_DURATION
+    )
+    try:
+        output = subprocess.run(
+            shlex.split(silence_cmd), stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+        ).stderr.decode("utf-8", "ignore")
+    except OSError as e:
+        log.error("ffmpeg not found to detect silences {}".format(e.strerror))
+        return []
+    starts = re.findall(r"silence_start: (-?[\d.]+)", output)
+    ends = re.findall(r"silence_end: ([\d.]+)", output)
+    return [(float(start) + float(end)) / 2 for start, end in zip(starts, ends)]
+
+
+def get_transcription_chunks(audio_path, duration) -> list:
+    """
+    Split the audio in chunks of about TRANSCRIPTION_AUDIO_SPLIT_TIME seconds.
+
+    The chunks are cut in the silence nearest to each split time, to avoid
+    cutting a word.
+    """
+    nb_chunks = max(1, math.ceil(duration / TRANSCRIPTION_AUDIO_SPLIT_TIME))
+    silences = get_silences(audio_path) if nb_chunks > 1 else []
+    max_shift = TRANSCRIPTION_AUDIO_SPLIT_TIME / 4
+
+    def get_nearest_silence(position):
+        nearest = min(silences, key=lambda silence: abs(silence - position), default=None)
+        if nearest is None or abs(nearest - position) > max_shift:
+            return position
+        return nearest
+
+    return get_segment_ranges(0, duration, nb_chunks, get_nearest_silence)
+
+
+def shift_whisper_transcription(transcription, offset) -> dict:
+    """Shift the times of a Whisper transcription by offset seconds."""
+    for segment in transcription["segments"]:
+        segment["start"] += offset
+        segment["end"] += offset
+        for word in segment.get("words", []):
+            word["start"] += offset
+            word["end"] += offset
+    return {"text": transcription["text"], "segments": transcription["segments"]}
+
+
+def transcribe_chunk(audio_path, lang, start, duration):
+    """Transcribe a chunk of the audio, with times from the start of the audio."""
+    desired_sample_rate = 16000
+    model = get_model(lang)
+    if TRANSCRIPTION_TYPE == "WHISPER":
+        audio = convert_samplerate(audio_path, desired_sample_rate, start, duration)
+        transcription = model.transcribe(
+            audio, language=lang, initial_prompt="prompt", word_timestamps=True
+        )
+        return shift_whisper_transcription(transcription, start)
+    rec = KaldiRecognizer(model, desired_sample_rate)
+    rec.SetWords(True)
+    audio = convert_vosk_samplerate(audio_path, desired_sample_rate, start, duration)
+    results = []
+    get_word_result_from_data(results, audio, rec)
+    return get_vosk_captions(results, start)
+
+
+def main_parallel_transcript(norm_mp3_file, duration, lang):
+    """Transcribe the audio by chunks on a pool of processes, then join them."""
+    msg = ""
+    all_text = ""
+    inference_start = timer()
+    msg += "\nInference start %0.3fs." % inference_start
+    chunks = get_transcription_chunks(norm_mp3_file, duration)
+    msg += "\nTranscribe %s chunks on %s processes." % (
+        len(chunks),
+        TRANSCRIPTION_NB_WORKERS,
+    )
+    args = (
+        [norm_mp3_file] * len(chunks),
+        [lang] * len(chunks),
+        [chunk[0] for chunk in chunks],
+        [chunk[1] for chunk in chunks],
+    )
+    try:
+        results = list(get_process_pool().map(transcribe_chunk, *args))
+    except (AssertionError, BrokenProcessPool, OSError) as e:
+        # e.g. in a daemonic Celery worker, which can not have child processes
+        log.warning("Unable to use the transcription processes: {}".format(e))
+        # a broken pool can not be used again
+        shutdown_process_pool()
+        msg += "\nTranscribe chunks in the current process."
+        results = list(map(transcribe_chunk, *args))
+    if TRANSCRIPTION_TYPE == "WHISPER":
+        transcription = {
+            "text": "".join(result["text"] for result in results),
+            "segments": [segment for result in results for segment in result["segments"]],
+            "language": lang,
+        }
+        wvtt = whisper_transcription_to_vtt(transcription, norm_mp3_file)
+    else:
+        wvtt = WebVTT()
+        for start_caption, stop_caption, text in [
+            caption for result in results for caption in result
+        ]:
+            wvtt.captions.append(
+                Caption(
+                    sec_to_timestamp(start_caption),
+                    sec_to_timestamp(stop_caption),
+                    text,
+                )
+            )
     inference_end = timer() - inference_start
     msg += "\nInference took %0.3fs." % inference_end
     return msg, wvtt, all_text
@@ -1,8 +1,10 @@
 """Esup-Pod video encoding and transcripting utilities."""
 
 import bleach
+import fcntl
 import logging
 import os
+import shutil
 import time
 
 from django.urls import reverse
@@ -17,6 +19,9 @@ from pod.progressive_web_app.utils import notify_user
 from .models import EncodingStep
 from .models import EncodingLog
 
+# ioctl of Linux to clone a file copy-on-write (reflink)
+FICLONE = 0x40049409
+
 DEBUG = getattr(settings, "DEBUG", True)
 logger = logging.getLogger(__name__)
 if DEBUG:
@@ -70,7 +75,7 @@ def change_encoding_step(video_id: int, num_step: int, desc: str) -> None:
     )
     encoding_step.num_step = num_step
     encoding_step.desc_step = desc[:255]
-    encoding_step.save()
+    encoding_step.save(update_fields=["num_step", "desc_step"])
     logger.debug("Video: %s - step: %d - desc: %s" % (video_id, num_step, desc))
 
 
@@ -103,6 +108,34 @@ def create_outputdir(video_id, video_path):
     return output_dir
 
 
+def reflink_file(source_path, dest_path) -> bool:
+    """Clone source_path to dest_path copy-on-write, if the filesystem allows it."""
+    try:
+        with open(source_path, "rb") as source, open(dest_path, "wb") as dest:
+            fcntl.ioctl(dest.fileno(), FICLONE, source.fileno())
+        return True
+    except OSError:
+        if os.path.exists(dest_path):
+            os.remove(dest_path)
+        return False
+
+
+def link_file(source_path, dest_path) -> None:
+    """
+    Clone source_path to dest_path without copying its data if possible.
+
+    The file is cloned copy-on-write (reflink), else hard linked, else copied.
+    """
+    if os.path.exists(dest_path):
+        os.remove(dest_path)
+    if reflink_file(source_path, dest_path):
+        return
+    try:
+        os.link(source_path, dest_path)
+    except OSError:
+        shutil.copyfile(source_path, dest_path)
+
+
 ###############################################################
 # EMAIL
 ###############################################################
@@ -6,14 +6,13 @@ from pod.video.models import Video
 from django.conf import settings
 from pod.video.context_processors import get_available_videos
 from pod.video_search.utils import index_es, delete_es
-from pod.video_search.utils import delete_index_es, create_index_es
-import time
+from pod.video_search.utils import reindex_es, rollback_index_es
 
 
 class Command(BaseCommand):
     """Indexes all or specified video in Elasticsearch."""
 
-    args = "--all or -id <video_id video_id ...>"
+    args = "--all, --rollback or -id <video_id video_id ...>"
     help = "Indexes the specified video in Elasticsearch."
 
     def add_arguments(self, parser) -> None:
@@ -25,22 +24,28 @@ class Command(BaseCommand):
             dest="all",
             help="index all video",
         )
+        parser.add_argument(
+            "--rollback",
+            action="store_true",
+            dest="rollback",
+            help="use the previous index again",
+        )
 
     def handle(self, *args, **options) -> None:
         """Handle an index_videos command call."""
         translation.activate(settings.LANGUAGE_CODE)
         if options["all"]:
-            delete_index_es()
-            time.sleep(10)
-            create_index_es()
-            time.sleep(10)
-            iteration = 0
-            videos = get_available_videos()
-            for video in videos:
-                if iteration % 1000 == 0:
-                    time.sleep(10)
-                iteration += 1
-                index_es(video)
+            # the search uses the current index until the new one is filled
+            index, nb_indexed, errors = reindex_es(get_available_videos())
+            self.stdout.write(
+                self.style.SUCCESS(
+                    'Successfully index %s videos in "%s"' % (nb_indexed, index)
+                )
+            )
+            if errors:
+                self.stdout.write(self.style.ERROR("%s videos not indexed" % len(errors)))
+        elif options["rollback"]:
+            self.rollback()
         elif options["video_id"]:
             for video_id in options["video_id"]:
                 self.manage_es(video_id)
@@ -65,3 +70,11 @@ class Command(BaseCommand):
                 delete_es(video.id)
         except Video.DoesNotExist:
             self.stdout.write(self.style.ERROR('Video "%s" does not exist' % video_id))
+
+    def rollback(self) -> None:
+        """Point the index alias back to the previous index."""
+        index = rollback_index_es()
+        if index:
+            self.stdout.write(self.style.SUCCESS('Index "%s" used again' % index))
+        else:
+            self.stdout.write(self.style.ERROR("No previous index to roll back to"))
@@ -4,10 +4,14 @@
 """
 
 from django.test import TestCase
+from django.utils import timezone
 from django.contrib.auth.models import User
 
 from pod.video.models import Video, Type
-from ..utils import index_es, delete_es
+from ..utils import index_es, delete_es, bulk_index_es
+from ..utils import get_alias_indices, get_index_versions
+from ..utils import reindex_es, rollback_index_es
+from ..utils import catch_up_index_es, create_index_es, get_es_client
 
 
 class VideoSearchTestUtils(TestCase):
@@ -36,3 +40,56 @@ class VideoSearchTestUtils(TestCase):
         self.assertEqual(delete["result"], "deleted")
         self.assertEqual(delete["_id"], str(self.v.id))
         print("--> test_index_and_delete_es ok! ")
+
+    def test_bulk_index_es(self) -> None:
+        nb_indexed, errors = bulk_index_es(Video.objects.filter(id=self.v.id))
+        self.assertEqual(nb_indexed, 1)
+        self.assertEqual(errors, [])
+        delete = delete_es(self.v.id)
+        self.assertEqual(delete["result"], "deleted")
+        print("--> test_bulk_index_es ok! ")
+
+    def test_reindex_and_rollback_es(self) -> None:
+        videos = Video.objects.filter(id=self.v.id)
+        first_index, nb_indexed, errors = reindex_es(videos)
+        self.assertEqual(nb_indexed, 1)
+        self.assertEqual(get_alias_indices(), [first_index])
+        new_index, nb_indexed, errors = reindex_es(videos)
+        self.assertEqual(get_alias_indices(), [new_index])
+        self.assertIn(first_index, get_index_versions())
+        self.assertEqual(rollback_index_es(), first_index)
+        self.assertEqual(get_alias_indices(), [first_index])
+        print("--> test_reindex_and_rollback_es ok! ")
+
+    def test_catch_up_index_es(self) -> None:
+        es = get_es_client()
+        index = create_index_es("pod_test_catch_up")["index"]
+        other = Video.objects.create(
+            title="Video2",
+            owner=self.user,
+            video="test2.mp4",
+            is_draft=False,
+            type=Type.objects.get(id=1),
+        )
+        videos = Video.objects.filter(is_draft=False)
+        indexed_ids = set()
+        bulk_index_es(videos, index, indexed_ids)
+        self.assertEqual(indexed_ids, {self.v.id, other.id})
+        since = timezone.now()
+        # a video saved as draft and a video deleted during the indexation
+        self.v.is_draft = True
+        self.v.save()
+        other.delete()
+        new = Video.objects.create(
+            title="Video3",
+            owner=self.user,
+            video="test3.mp4",
+            is_draft=False,
+            type=Type.objects.get(id=1),
+        )
+        catch_up_index_es(videos, index, since, indexed_ids)
+        self.assertEqual(indexed_ids, {new.id})
+        es.indices.refresh(index=index)
+        self.assertEqual(es.count(index=index)["count"], 1)
+        es.indices.delete(index=index)
+        print("--> test_catch_up_index_es ok! ")
@@ -2,11 +2,15 @@
 
 from django.conf import settings
 from elasticsearch import Elasticsearch
-from elasticsearch.exceptions import TransportError
+from elasticsearch.exceptions import NotFoundError, TransportError
+from elasticsearch.helpers import bulk, parallel_bulk
+from django.utils import timezone
 from django.utils import translation
+from pod.video.queryset.utils import prefetch_videos_to_index
 
 import json
 import logging
+import re
 
 logger = logging.getLogger(__name__)
 
@@ -18,18 +22,32 @@ ES_TIMEOUT = getattr(settings, "ES_TIMEOUT", 30)
 ES_MAX_RETRIES = getattr(settings, "ES_MAX_RETRIES", 10)
 ES_VERSION = getattr(settings, "ES_VERSION", 8)
 ES_OPTIONS = getattr(settings, "ES_OPTIONS", {})
+ES_BULK_CHUNK_SIZE = getattr(settings, "ES_BULK_CHUNK_SIZE", 500)
+ES_BULK_THREAD_COUNT = getattr(settings, "ES_BULK_THREAD_COUNT", 4)
+ES_INDEX_KEEP_PREVIOUS = getattr(settings, "ES_INDEX_KEEP_PREVIOUS", 1)
+
+# Elasticsearch client shared by the calls, with its pool of connections
+__ES_CLIENT__ = None
+
+
+def get_es_client():
+    """Get the Elasticsearch client, created at the first call."""
+    global __ES_CLIENT__
+    if __ES_CLIENT__ is None:
+        __ES_CLIENT__ = Elasticsearch(
+            ES_URL,
+            request_timeout=ES_TIMEOUT,
+            max_retries=ES_MAX_RETRIES,
+            retry_on_timeout=True,
+            **ES_OPTIONS,
+        )
+    return __ES_CLIENT__
 
 
 def index_es(video):
     """Get ElasticSearch index."""
     translation.activate(settings.LANGUAGE_CODE)
-    es = Elasticsearch(
-        ES_URL,
-        request_timeout=ES_TIMEOUT,
-        max_retries=ES_MAX_RETRIES,
-        retry_on_timeout=True,
-        **ES_OPTIONS,
-    )
+    es = get_es_client()
     if es.ping():
         try:
             data = video.get_json_to_index()
@@ -53,13 +71,7 @@ def index_es(video):
 
 def delete_es(video_id):
     """Delete an Elasticsearch video entry by video id."""
-    es = Elasticsearch(
-        ES_URL,
-        request_timeout=ES_TIMEOUT,
-        max_retries=ES_MAX_RETRIES,
-        retry_on_timeout=True,
-        **ES_OPTIONS,
-    )
+    es = get_es_client()
     if es.ping():
         try:
             # Pass transport options to elasticsearch
@@ -76,20 +88,23 @@ def delete_es(video_id):
             )
 
 
-def create_index_es():
-    """Create ElasticSearch index."""
-    es = Elasticsearch(
-        ES_URL,
-        request_timeout=ES_TIMEOUT,
-        max_retries=ES_MAX_RETRIES,
-        retry_on_timeout=True,
-        **ES_OPTIONS,
-    )
+def create_index_es(index=None):
+    """
+    Create ElasticSearch index.
+
+    Without index name, a new version of the index is created
+    and the ES_INDEX alias is switched to it.
+    """
+    es = get_es_client()
     template_file = "pod/video_search/search_template_fr.json"
     es_template = json.load(open(template_file))
     try:
-        create = es.indices.create(index=ES_INDEX, body=es_template)  # ignore=[400, 404]
+        create = es.indices.create(
+            index=index or get_new_index_name(), body=es_template
+        )  # ignore=[400, 404]
         logger.info(create)
+        if index is None:
+            switch_alias_es(create["index"])
         return create
     except TransportError as e:
         logger.error("An error occured during index creation: %s" % e.message)
@@ -97,18 +112,172 @@ def create_index_es():
 
 
 def delete_index_es():
-    """Delete ElasticSearch index."""
-    es = Elasticsearch(
-        ES_URL,
-        request_timeout=ES_TIMEOUT,
-        max_retries=ES_MAX_RETRIES,
-        retry_on_timeout=True,
-        **ES_OPTIONS,
-    )
+    """Delete ElasticSearch index, with all its versions."""
+    es = get_es_client()
+    indices = set(get_alias_indices() + get_index_versions()) or {ES_INDEX}
     try:
-        delete = es.indices.delete(index=ES_INDEX)
+        delete = es.indices.delete(index=",".join(sorted(indices)))
         logger.info(delete)
         return delete
     except TransportError as e:
         logger.error("An error occured during index video deletion: %s" % e.message)
         return False
+
+
+def get_new_index_name() -> str:
+    """Get the name of a new version of the index."""
+    return "%s_%s" % (ES_INDEX, timezone.now().strftime("%Y%m%d%H%M%S%f"))
+
+
+def get_index_versions() -> list:
+    """Get the versions of the index, from the most recent."""
+    indices = get_es_client().indices.get(index="%s_*" % ES_INDEX)
+    version_re = re.compile(r"^%s_\d{20}$" % re.escape(ES_INDEX))
+    return sorted([name for name in indices if version_re.match(name)], reverse=True)
+
+
+def get_alias_indices() -> list:
+    """Get the indices the ES_INDEX alias points to."""
+    try:
+        return list(get_es_client().indices.get_alias(name=ES_INDEX))
+    except NotFoundError:
+        return []
+
+
+def switch_alias_es(index) -> None:
+    """Point the ES_INDEX alias to the index, in a single atomic request."""
+    es = get_es_client()
+    alias_indices = get_alias_indices()
+    actions = [
+        {"remove": {"index": name, "alias": ES_INDEX}}
+        for name in alias_indices
+        if name != index
+    ]
+    if not alias_indices and es.indices.exists(index=ES_INDEX):
+        # an index created before the aliases is replaced by the alias
+        actions.append({"remove_index": {"index": ES_INDEX}})
+    actions.append({"add": {"index": index, "alias": ES_INDEX}})
+    res = es.indices.update_aliases(actions=actions)
+    logger.info(res)
+
+
+def reindex_es(videos) -> tuple:
+    """
+    Index the videos in a new version of the index, then switch the alias to it.
+
+    The search keeps using the current index until the switch.
+    The ES_INDEX_KEEP_PREVIOUS previous versions are kept to roll back.
+    Return the name of the new index, the number of indexed videos and the errors.
+    """
+    es = get_es_client()
+    new_index = get_new_index_name()
+    if not create_index_es(new_index):
+        raise RuntimeError("Unable to create the index %s" % new_index)
+    # the videos saved or deleted meanwhile only go to the current index
+    date_start = timezone.now()
+    indexed_ids = set()
+    try:
+        nb_indexed, errors = bulk_index_es(videos, new_index, indexed_ids)
+        date_catch_up = timezone.now()
+        catch_up_index_es(videos, new_index, date_start, indexed_ids)
+    except Exception:
+        es.indices.delete(index=new_index)
+        raise
+    switch_alias_es(new_index)
+    # the changes made during the catch up went to the previous index
+    catch_up_index_es(videos, new_index, date_catch_up, indexed_ids)
+    for old_index in get_index_versions()[ES_INDEX_KEEP_PREVIOUS + 1 :]:
+        logger.info(es.indices.delete(index=old_index))
+    return new_index, nb_indexed, errors
+
+
+def catch_up_index_es(videos, index, since, indexed_ids) -> None:
+    """
+    Apply to the index the changes of the videos made since a date.
+
+    The videos modified since then are indexed again, or deleted from the index
+    if they are no longer in videos, as are the indexed videos deleted since then.
+    """
+    all_ids = set(videos.model.objects.values_list("id", flat=True))
+    modified_ids = set(
+        videos.model.objects.filter(date_modified__gte=since).values_list("id", flat=True)
+    )
+    modified_videos = videos.filter(id__in=modified_ids)
+    if modified_ids:
+        bulk_index_es(modified_videos, index, indexed_ids)
+    deleted_ids = (indexed_ids - all_ids) | (
+        modified_ids - set(modified_videos.values_list("id", flat=True))
+    )
+    if deleted_ids:
+        # a video already missing from the index is not an error
+        bulk(
+            get_es_client().options(ignore_status=404),
+            [
+                {"_op_type": "delete", "_index": index, "_id": video_id}
+                for video_id in deleted_ids
+            ],
+            raise_on_error=False,
+            refresh=True,
+        )
+        indexed_ids -= deleted_ids
+
+
+def rollback_index_es():
+    """Point the ES_INDEX alias back to the previous version of the index."""
+    current = sorted(get_alias_indices())
+    if not current:
+        return None
+    previous = [name for name in get_index_versions() if name < current[0]]
+    if not previous:
+        return None
+    switch_alias_es(previous[0])
+    return previous[0]
+
+
+def get_videos_to_index(videos):
+    """Get the videos with the related objects used by their index document."""
+    return prefetch_videos_to_index(videos.defer(None))
+
+
+def get_bulk_actions(videos, index=ES_INDEX):
+    """Get the bulk index actions of the videos, built by chunks of videos."""
+    # the actions may be built in a thread of the bulk helper
+    translation.activate(settings.LANGUAGE_CODE)
+    for video in get_videos_to_index(videos).iterator(chunk_size=ES_BULK_CHUNK_SIZE):
+        data = video.get_json_to_index()
+        if data != "{}":
+            yield {"_index": index, "_id": video.id, "_source": data}
+
+
+def bulk_index_es(videos, index=ES_INDEX, indexed_ids=None):
+    """
+    Index the videos with the Elasticsearch bulk API.
+
+    The index is not refreshed during the indexation, but once at the end.
+    The ids of the indexed videos are added to indexed_ids if given.
+    Return the number of indexed videos and the list of errors.
+    """
+    es = get_es_client()
+    nb_indexed = 0
+    errors = []
+    es.indices.put_settings(index=index, settings={"refresh_interval": "-1"})
+    try:
+        for ok, item in parallel_bulk(
+            es,
+            get_bulk_actions(videos, index),
+            chunk_size=ES_BULK_CHUNK_SIZE,
+            thread_count=ES_BULK_THREAD_COUNT,
+            raise_on_error=False,
+        ):
+            if ok:
+                nb_indexed += 1
+                if indexed_ids is not None:
+                    indexed_ids.add(int(item["index"]["_id"]))
+            else:
+                errors.append(item)
+                logger.error("An error occured during bulk index: %s" % item)
+    finally:
+        # back to the default refresh interval
+        es.indices.put_settings(index=index, settings={"refresh_interval": None})
+        es.indices.refresh(index=index)
+    return nb_indexed, errors